@@ -1,51 +1,84 @@
 import pandas as pd
-import nfl_data_py as nfl
 from sqlalchemy import text
 from config import DB_SCHEMA
+from context import RunContext
+from db import copy_from_dataframe, legacy_key_sql
+from loadstate import in_partitions
+from logutil import get_logger
 
-def backfill_legacy_ids(engine, years: list[int]):
-    rost = nfl.import_seasonal_rosters(years, columns=['player_id','player_name','team','position','season']).dropna(subset=['player_id','player_name','team'])
-    rost['player_name_norm'] = rost['player_name'].str.lower().str.strip()
-    rost['k'] = rost['player_name_norm'] + '|' + rost['team'] + '|' + rost['position'].fillna('')
-    rmap = (rost.groupby('k')['player_id']
-                .agg(lambda s: s.mode().iat[0] if not s.mode().empty else s.iloc[0])
-                .reset_index())
+logger = get_logger()
 
-    with engine.begin() as con:
-        con.execute(text("CREATE TEMP TABLE temp_player_id_map (k text PRIMARY KEY, real_player_id text) ON COMMIT DROP;"))
-        rows = rmap.rename(columns={'player_id':'real_player_id'}).to_dict(orient='records')
-        for i in range(0, len(rows), 1000):
-            con.execute(text("INSERT INTO temp_player_id_map (k, real_player_id) VALUES (:k, :real_player_id) ON CONFLICT DO NOTHING;"), rows[i:i+1000])
+def legacy_seasons(fact: pd.DataFrame, parts: pd.DataFrame) -> list[int]:
+    """Seasons whose rows of ``fact`` in the (season, week) partitions ``parts`` a load rewrote carry ``legacy_`` ids."""
+    if fact.empty or parts.empty:
+        return []
+    legacy = fact['player_id'].astype(str).str.startswith('legacy_') & in_partitions(fact, parts)
+    return sorted(int(s) for s in fact.loc[legacy, 'season'].unique())
 
-        con.execute(text(f"""
-            WITH fact_keys AS (
-                SELECT
-                    game_id, season, week, team_abbr, opponent_abbr, time_slot, player_id, position, player_name,
-                    LOWER(TRIM(player_name)) || '|' || team_abbr || '|' || COALESCE(position,'') AS k
-                FROM {DB_SCHEMA}.fact_player_timeslot
-                WHERE player_id LIKE 'legacy_%'
-            )
-            UPDATE {DB_SCHEMA}.fact_player_timeslot f
-            SET player_id = m.real_player_id
-            FROM fact_keys fk
-            JOIN temp_player_id_map m ON m.k = fk.k
-            WHERE f.game_id=fk.game_id AND f.season=fk.season AND f.week=fk.week
-              AND f.team_abbr=fk.team_abbr AND f.opponent_abbr=fk.opponent_abbr
-              AND f.time_slot=fk.time_slot AND f.player_id=fk.player_id
-              AND f.position=fk.position;
-        """))
+def backfill_legacy_ids(engine, seasons: list[int], ctx: RunContext | None = None) -> tuple[int, pd.DataFrame]:
+    """Swap ``legacy_`` ids in ``seasons`` of the fact table for roster ids.
+
+    The ``name|team|pos`` map is COPYed into a temp table, the update only
+    looks at legacy rows of ``seasons`` (via the partial ix_fact_legacy_key
+    index) and skips rows whose real id is already stored for the same key,
+    and only the players it assigned are upserted into dim_player.
+    Returns the number of fact rows updated and the (player_id, season)
+    pairs that now carry a roster id.
+    """
+    rekeyed = pd.DataFrame(columns=['player_id', 'season'])
+    if not seasons:
+        return 0, rekeyed
+    ctx = ctx or RunContext(seasons)
+    players = (ctx.rosters.rename(columns={'team':'last_team','position':'primary_position'})
+                   [['player_id','player_name','primary_position','last_team']]
+                   .drop_duplicates('player_id'))
+    id_map = (ctx.roster_key_map.merge(players, on='player_id', how='left')
+                  .rename(columns={'player_id':'real_player_id'}))
+    same_row_with_real_id = " AND ".join(f"g.{c} = f.{c}" for c in
+                                         ['game_id','season','week','team_abbr','opponent_abbr','time_slot','position'])
 
-        dim_player = (rost.rename(columns={'team':'last_team','position':'primary_position'})
-                         [['player_id','player_name','primary_position','last_team']]
-                         .drop_duplicates('player_id'))
-        rows = dim_player.to_dict(orient='records')
-        sql = f"""
-            INSERT INTO {DB_SCHEMA}.dim_player (player_id, player_name, primary_position, last_team)
-            VALUES (:player_id, :player_name, :primary_position, :last_team)
-            ON CONFLICT (player_id) DO UPDATE SET
-                player_name = EXCLUDED.player_name,
-                primary_position = EXCLUDED.primary_position,
-                last_team = EXCLUDED.last_team;
-        """
-        for i in range(0, len(rows), 1000):
-            con.execute(text(sql), rows[i:i+1000])
+    with engine.begin() as con:
+        con.execute(text("""
+            CREATE TEMP TABLE temp_player_id_map (
+                k text PRIMARY KEY, real_player_id text,
+                player_name text, primary_position text, last_team text
+            ) ON COMMIT DROP;
+        """))
+        copy_from_dataframe(con, id_map[['k','real_player_id','player_name','primary_position','last_team']],
+                            "temp_player_id_map")
+        rows = con.execute(text(f"""
+            WITH upd AS (
+                UPDATE {DB_SCHEMA}.fact_player_timeslot f
+                SET player_id = m.real_player_id
+                FROM temp_player_id_map m
+                WHERE f.player_id LIKE 'legacy_%'
+                  AND f.season = ANY(:seasons)
+                  AND {legacy_key_sql("f.")} = m.k
+                  AND NOT EXISTS (
+                      SELECT 1 FROM {DB_SCHEMA}.fact_player_timeslot g
+                      WHERE g.player_id = m.real_player_id AND {same_row_with_real_id}
+                  )
+                RETURNING f.player_id, f.season
+            ), dim AS (
+                INSERT INTO {DB_SCHEMA}.dim_player AS d (player_id, player_name, primary_position, last_team)
+                SELECT DISTINCT ON (m.real_player_id) m.real_player_id, m.player_name, m.primary_position, m.last_team
+                FROM temp_player_id_map m
+                WHERE m.real_player_id IN (SELECT player_id FROM upd)
+                ORDER BY m.real_player_id
+                ON CONFLICT (player_id) DO UPDATE SET
+                    player_name = EXCLUDED.player_name,
+                    primary_position = EXCLUDED.primary_position,
+                    last_team = EXCLUDED.last_team
+                WHERE (d.player_name, d.primary_position, d.last_team)
+                      IS DISTINCT FROM (EXCLUDED.player_name, EXCLUDED.primary_position, EXCLUDED.last_team)
+                RETURNING 1
+            )
+            SELECT u.player_id, u.season, count(*), (SELECT count(*) FROM dim)
+            FROM upd u GROUP BY u.player_id, u.season;
+        """), {"seasons": [int(s) for s in seasons]}).fetchall()
+    if rows:
+        rekeyed = pd.DataFrame([r[:2] for r in rows], columns=['player_id', 'season'])
+    updated, players_upserted = sum(r[2] for r in rows), (rows[0][3] if rows else 0)
+    logger.info(f"Backfill: {updated:,} legacy fact rows in seasons {seasons} now carry roster ids "
+                f"({players_upserted:,} dim_player rows written)")
+    return updated, rekeyed
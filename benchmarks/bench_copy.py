@@ -0,0 +1,88 @@
+"""Peak memory and throughput of the COPY encoder.
+
+Compares the old whole-frame StringIO path with db.CsvCopyStream on a
+synthetic fact frame. With PGHOST set it also COPYs into a temp table.
+
+    python benchmarks/bench_copy.py --rows 500000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from db import CsvCopyStream  # noqa: E402
+
+def synth_fact(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    stats = {f"stat_{i}_avg": rng.normal(50, 20, rows).round(2) for i in range(15)}
+    return pd.DataFrame({
+        "game_id": [f"2024_{w:02d}_KC_LV" for w in rng.integers(1, 19, rows)],
+        "season": rng.integers(2015, 2025, rows),
+        "week": rng.integers(1, 19, rows),
+        "player_id": [f"00-{i:07d}" for i in rng.integers(0, 30000, rows)],
+        "player_name": "Some Player",
+        **stats,
+        "current_roster_only": rng.random(rows) < 0.5,
+    })
+
+def legacy_encode(df: pd.DataFrame) -> int:
+    buf = StringIO()
+    df_to_copy = df.copy()
+    df_to_copy["current_roster_only"] = df_to_copy["current_roster_only"].map({True: 't', False: 'f'})
+    df_to_copy.to_csv(buf, index=False, header=False, na_rep="\\N")
+    buf.seek(0)
+    return sum(len(c) for c in iter(lambda: buf.read(1 << 20), ""))
+
+def stream_encode(df: pd.DataFrame) -> int:
+    stream = CsvCopyStream(df)
+    while stream.read(1 << 20):
+        pass
+    return stream.bytes_read
+
+def measure(fn, df, trace_memory: bool = True) -> dict:
+    t0 = time.perf_counter()
+    nbytes = fn(df)
+    wall = time.perf_counter() - t0
+    peak = 0
+    if trace_memory:  # separate pass: tracemalloc slows allocation-heavy code too much to time under it
+        tracemalloc.start()
+        fn(df)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"wall_s": round(wall, 3), "peak_mb": round(peak / 2**20, 1),
+            "mb_per_s": round(nbytes / 2**20 / wall, 1), "rows_per_s": int(len(df) / wall)}
+
+def measure_db(df) -> dict | None:
+    if not os.getenv("PGHOST"):
+        return None
+    from sqlalchemy import text
+    from db import get_engine, copy_from_dataframe
+    cols = ", ".join(f"{c} {'numeric' if c.startswith('stat_') else 'text'}" for c in df.columns)
+    with get_engine().begin() as con:
+        con.execute(text(f"CREATE TEMP TABLE bench_copy ({cols}) ON COMMIT DROP;"))
+        return measure(lambda d: copy_from_dataframe(con, d, "bench_copy"), df, trace_memory=False)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    args = ap.parse_args()
+    df = synth_fact(args.rows)
+    print(f"frame: {len(df):,} rows, {df.memory_usage(deep=True).sum() / 2**20:.1f} MB in memory")
+    for name, fn in [("legacy StringIO", legacy_encode), ("streaming", stream_encode)]:
+        print(f"{name:>16}: {measure(fn, df)}")
+    db = measure_db(df)
+    if db:
+        print(f"{'COPY to Postgres':>16}: {db}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Offline benchmarks for the transform and load paths.
+
+nfl_data_py is replaced by seeded synthetic data (benchmarks/synth.py), the
+same way tests/conftest.py stubs it, so no network is needed. COPY goes to
+a temp table when PGHOST is set; otherwise only the CSV encoding is timed.
+
+    python benchmarks/run.py --seasons 10                      # writes benchmarks/results/<commit>.json
+    python benchmarks/run.py --seasons 10 --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "benchmarks"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import pandas as pd  # noqa: E402
+import synth  # noqa: E402
+
+def install_stubs(seasons: list[int], seed: int = 0) -> None:
+    """Serve synthetic frames through an nfl_data_py stand-in and bypass the Parquet cache."""
+    data = {
+        "weekly": synth.weekly(seasons, seed), "schedules": synth.schedules(seasons, seed),
+        "rosters": synth.rosters(seasons, seed), "lines": synth.betting_lines(seasons, seed),
+    }
+    def by_season(name):
+        def fetch(years, columns=None):
+            df = data[name][data[name]["season"].isin(years)]
+            return (df[[c for c in columns if c in df.columns]] if columns else df).copy()
+        return fetch
+    sys.modules["nfl_data_py"] = types.SimpleNamespace(
+        import_weekly_data=by_season("weekly"),
+        import_schedules=lambda years: by_season("schedules")(years),
+        import_seasonal_rosters=by_season("rosters"),
+        import_betting_lines=lambda years: by_season("lines")(years),
+        import_team_desc=synth.team_desc,
+    )
+    os.environ["NFL_CACHE_MODE"] = "off"
+
+def timeit(fn, repeat: int) -> tuple[list[float], object]:
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return times, out
+
+def _pg_type(s: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(s):
+        return "boolean"
+    return "double precision" if pd.api.types.is_numeric_dtype(s) else "text"
+
+def copy_to_postgres(df: pd.DataFrame, repeat: int) -> list[float] | None:
+    if not os.getenv("PGHOST"):
+        return None
+    from sqlalchemy import text
+    from db import get_engine, copy_from_dataframe
+    cols = ", ".join(f"{c} {_pg_type(df[c])}" for c in df.columns)
+    with get_engine().begin() as con:
+        con.execute(text(f"CREATE TEMP TABLE bench_fact ({cols}) ON COMMIT DROP;"))
+        def load():
+            con.execute(text("TRUNCATE bench_fact;"))
+            copy_from_dataframe(con, df, "bench_fact")
+        return timeit(load, repeat)[0]
+
+def run(seasons: list[int], repeat: int, seed: int = 0) -> dict:
+    install_stubs(seasons, seed)
+    # repo modules read config and nfl_data_py at import time, so import them only now
+    import props
+    from bench_copy import stream_encode
+    from context import RunContext
+    from db import FEATURE_STATS
+    from facts import build_fact_all
+    from features import build_features
+    from lines import load_vegas_lines
+    from weekly import load_weekly_with_timeslot, resolve_player_ids
+
+    cases: dict[str, dict] = {}
+    def record(name, times, rows):
+        med = statistics.median(times)
+        cases[name] = {"median_s": round(med, 4), "min_s": round(min(times), 4),
+                       "rows": int(rows), "rows_per_s": int(rows / med) if med else None}
+        print(f"{name:>28}: {med * 1000:9.1f} ms  {rows:>9,} rows")
+
+    times, weekly = timeit(lambda: load_weekly_with_timeslot(seasons, RunContext(seasons)), repeat)
+    record("load_weekly_with_timeslot", times, len(weekly))
+
+    ctx = RunContext(seasons)
+    times, _ = timeit(lambda: RunContext(seasons).resolver, repeat)
+    record("roster_resolver", times, len(ctx.rosters))
+
+    resolver = ctx.resolver
+    times, pid = timeit(lambda: resolve_player_ids(weekly, resolver), repeat)
+    record("resolve_player_ids", times, len(weekly))
+    weekly["player_id"] = pid
+
+    times, fact = timeit(lambda: build_fact_all(weekly), repeat)
+    record("build_fact_all", times, len(fact))
+
+    history = fact.rename(columns={f"{c}_avg": c for c in FEATURE_STATS})
+    allowed = history.groupby(["season", "week", "opponent_abbr", "position"], as_index=False)[FEATURE_STATS].sum()
+    times, _ = timeit(lambda: build_features(history, allowed, (seasons[0], 1)), repeat)
+    record("build_features", times, len(history))
+
+    games = ctx.games
+    times, lines = timeit(lambda: load_vegas_lines(seasons, games), repeat)
+    record("load_vegas_lines", times, len(lines))
+
+    # a full season of TheOdds payloads for the latest season, parsed as if just fetched
+    sched = synth.schedules(seasons, seed)
+    events = [e for w in range(1, synth.WEEKS + 1) for e in synth.theodds_events(sched, seasons[-1], w)]
+    payloads = {e["id"]: synth.theodds_event_odds(e, seed) for e in events}
+    team_map = {name.lower(): abbr for abbr, name in synth.TEAMS.items()}
+    props.THEODDS_API_KEY = props.THEODDS_API_KEY or "bench"
+    props._fetch_event_props = lambda ids, markets, quota: [payloads.get(i) for i in ids]
+    times, props_df = timeit(lambda: props.fetch_player_props_from_theodds(
+        seasons, games, ctx, events=events, team_map=team_map), repeat)
+    record("props_parse", times, len(props_df))
+
+    fact["current_roster_only"] = False
+    times, _ = timeit(lambda: stream_encode(fact), repeat)
+    record("copy_encode", times, len(fact))
+    db_times = copy_to_postgres(fact, repeat)
+    if db_times:
+        record("copy_from_dataframe", db_times, len(fact))
+
+    return cases
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Print per-case ratios against ``baseline``; True if any case slowed down past ``threshold``."""
+    slow = False
+    print(f"\n{'case':>28}  {'baseline ms':>11}  {'now ms':>9}  ratio")
+    for name, now in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            print(f"{name:>28}  {'-':>11}  {now['median_s'] * 1000:9.1f}  new")
+            continue
+        ratio = now["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        flag = "  <-- slower" if ratio > threshold else ""
+        slow |= ratio > threshold
+        print(f"{name:>28}  {base['median_s'] * 1000:11.1f}  {now['median_s'] * 1000:9.1f}  {ratio:5.2f}{flag}")
+    if baseline.get("meta", {}).get("seasons") != current["meta"]["seasons"]:
+        print("note: baseline was run with a different number of seasons")
+    return slow
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--seasons", type=int, default=5, help="number of synthetic seasons, 1-20 (default 5)")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per case; the median is reported")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="result file (default benchmarks/results/<commit>.json)")
+    ap.add_argument("--compare", help="baseline result file to diff against")
+    ap.add_argument("--threshold", type=float, default=1.25, help="ratio that counts as a regression (exit 1)")
+    args = ap.parse_args()
+    if not 1 <= args.seasons <= 20:
+        ap.error("--seasons must be between 1 and 20")
+
+    seasons = list(range(2025 - args.seasons, 2025))
+    commit = _commit()
+    result = {
+        "meta": {"commit": commit, "seasons": args.seasons, "seed": args.seed, "repeat": args.repeat,
+                 "python": platform.python_version(), "pandas": pd.__version__,
+                 "postgres": bool(os.getenv("PGHOST")), "ts": pd.Timestamp.now(tz="UTC").isoformat()},
+        "cases": run(seasons, args.repeat, args.seed),
+    }
+    out = Path(args.out) if args.out else ROOT / "benchmarks" / "results" / f"{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2) + "\n")
+    print(f"\nwrote {out}")
+
+    if args.compare and compare(result, json.loads(Path(args.compare).read_text()), args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
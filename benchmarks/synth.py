@@ -0,0 +1,131 @@
+"""Seeded synthetic nflverse / TheOdds data at realistic cardinality.
+
+Every generator takes the seasons to cover and a seed, so two runs (or two
+commits) benchmark exactly the same input. Sizes follow the real feeds:
+32 teams, 16 games per week, ~5k player-weeks per season.
+"""
+import numpy as np
+import pandas as pd
+
+TEAMS = {
+    "ARI": "Arizona Cardinals", "ATL": "Atlanta Falcons", "BAL": "Baltimore Ravens", "BUF": "Buffalo Bills",
+    "CAR": "Carolina Panthers", "CHI": "Chicago Bears", "CIN": "Cincinnati Bengals", "CLE": "Cleveland Browns",
+    "DAL": "Dallas Cowboys", "DEN": "Denver Broncos", "DET": "Detroit Lions", "GB": "Green Bay Packers",
+    "HOU": "Houston Texans", "IND": "Indianapolis Colts", "JAX": "Jacksonville Jaguars", "KC": "Kansas City Chiefs",
+    "LA": "Los Angeles Rams", "LAC": "Los Angeles Chargers", "LV": "Las Vegas Raiders", "MIA": "Miami Dolphins",
+    "MIN": "Minnesota Vikings", "NE": "New England Patriots", "NO": "New Orleans Saints", "NYG": "New York Giants",
+    "NYJ": "New York Jets", "PHI": "Philadelphia Eagles", "PIT": "Pittsburgh Steelers", "SEA": "Seattle Seahawks",
+    "SF": "San Francisco 49ers", "TB": "Tampa Bay Buccaneers", "TEN": "Tennessee Titans", "WAS": "Washington Commanders",
+}
+ABBRS = list(TEAMS)
+WEEKS = 18
+# (weekday offset from the week's Thursday, kickoff "HH:MM") for the 16 games of a week
+SLOTS = [(0, "20:15")] + [(3, "13:00")] * 9 + [(3, "16:25")] * 4 + [(3, "20:20"), (4, "20:15")]
+POSITIONS = ["QB", "RB", "WR", "TE"]
+POSITION_MIX = [1, 2, 4, 2]  # players with stats per team-game: 32 * 9 * 18 weeks ~ 5.2k rows per season
+
+def team_desc() -> pd.DataFrame:
+    return pd.DataFrame({"team_abbr": ABBRS, "team_name": [TEAMS[a] for a in ABBRS]})
+
+def schedules(seasons: list[int], seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for season in seasons:
+        first_thu = pd.Timestamp(f"{season}-09-01") + pd.offsets.Week(weekday=3)
+        for week in range(1, WEEKS + 1):
+            order = rng.permutation(32)
+            thu = first_thu + pd.Timedelta(weeks=week - 1)
+            for g, (off, ko) in enumerate(SLOTS):
+                day = (thu + pd.Timedelta(days=off)).strftime("%Y-%m-%d")
+                rows.append((season, week, ABBRS[order[2 * g]], ABBRS[order[2 * g + 1]], f"{day} {ko}"))
+    return pd.DataFrame(rows, columns=["season", "week", "home_team", "away_team", "gameday"])
+
+def _players(seed: int) -> pd.DataFrame:
+    """A fixed league of players: ``POSITION_MIX`` per team plus depth."""
+    rng = np.random.default_rng(seed + 1)
+    rows = []
+    for team in ABBRS:
+        for pos, n in zip(POSITIONS, POSITION_MIX):
+            for i in range(n + 1):  # one backup per position group
+                pid = f"00-{len(rows):07d}"
+                rows.append((pid, f"Player {pid[-5:]} {pos}{i}", pos, team))
+    df = pd.DataFrame(rows, columns=["player_id", "player_name", "position", "team"])
+    return df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+def rosters(seasons: list[int], seed: int = 0) -> pd.DataFrame:
+    players = _players(seed)
+    return pd.concat([players.assign(season=s) for s in seasons], ignore_index=True)
+
+def weekly(seasons: list[int], seed: int = 0, missing_id_rate: float = 0.03) -> pd.DataFrame:
+    """One row per player per game, ~5k per season; a few rows lack player_id like the real feed."""
+    rng = np.random.default_rng(seed + 2)
+    sched = schedules(seasons, seed)
+    sides = pd.concat([
+        sched.rename(columns={"home_team": "recent_team", "away_team": "opponent_team"}),
+        sched.rename(columns={"away_team": "recent_team", "home_team": "opponent_team"}),
+    ], ignore_index=True)[["season", "week", "recent_team", "opponent_team"]]
+    players = _players(seed)
+    starters = players[players.groupby(["team", "position"]).cumcount() < players["position"].map(dict(zip(POSITIONS, POSITION_MIX)))]
+    wk = sides.merge(starters, left_on="recent_team", right_on="team").drop(columns="team")
+    n = len(wk)
+    stat = lambda lam: rng.poisson(lam, n).astype(float)
+    is_pos = lambda *p: np.isin(wk["position"].to_numpy(), p)
+    wk = wk.assign(
+        passing_yards=np.where(is_pos("QB"), stat(240), 0.0), passing_tds=np.where(is_pos("QB"), stat(1.6), 0.0),
+        interceptions=np.where(is_pos("QB"), stat(0.8), 0.0), attempts=np.where(is_pos("QB"), stat(34), 0.0),
+        completions=np.where(is_pos("QB"), stat(22), 0.0),
+        rushing_yards=np.where(is_pos("RB", "QB"), stat(45), 0.0), rushing_tds=np.where(is_pos("RB"), stat(0.4), 0.0),
+        carries=np.where(is_pos("RB", "QB"), stat(11), 0.0),
+        receptions=np.where(is_pos("WR", "TE", "RB"), stat(4), 0.0),
+        receiving_yards=np.where(is_pos("WR", "TE", "RB"), stat(48), 0.0),
+        receiving_tds=np.where(is_pos("WR", "TE"), stat(0.35), 0.0),
+        sacks=np.where(is_pos("QB"), stat(2.5), 0.0), fumbles_recovered=stat(0.05),
+    )
+    wk["player_id"] = wk["player_id"].where(rng.random(n) >= missing_id_rate)
+    return wk.iloc[rng.permutation(n)].reset_index(drop=True)
+
+def betting_lines(seasons: list[int], seed: int = 0) -> pd.DataFrame:
+    """nflverse-style lines: one row per game and provider, a few off-list providers included."""
+    rng = np.random.default_rng(seed + 3)
+    sched = schedules(seasons, seed)
+    books = ["DraftKings", "fanduel", "Fanatics Sportsbook", "Caesars", "BetMGM"]
+    lines = sched.loc[sched.index.repeat(len(books))].reset_index(drop=True)
+    n = len(lines)
+    spread = rng.normal(0, 6, n).round() / 2
+    total = rng.normal(44, 4, n).round()
+    return pd.DataFrame({
+        "season": lines["season"], "week": lines["week"],
+        "home_team": lines["home_team"], "away_team": lines["away_team"],
+        "provider": np.tile(books, len(sched)),
+        "spread_open": spread, "spread_close": spread + rng.choice([-1, -0.5, 0, 0.5, 1], n),
+        "total_open": total, "total_close": total + rng.choice([-1, -0.5, 0, 0.5, 1], n),
+        "favorite": np.where(spread < 0, lines["home_team"], lines["away_team"]),
+        "home_moneyline": rng.integers(-300, 250, n), "away_moneyline": rng.integers(-300, 250, n),
+        "timestamp": pd.to_datetime(lines["gameday"]) - pd.Timedelta(hours=2),
+    })
+
+def theodds_events(sched: pd.DataFrame, season: int, week: int) -> list[dict]:
+    games = sched[(sched["season"] == season) & (sched["week"] == week)]
+    return [{
+        "id": f"ev{season}{week:02d}{i:02d}",
+        "home_team": TEAMS[h], "away_team": TEAMS[a],
+        "commence_time": pd.Timestamp(d, tz="UTC").isoformat(),
+    } for i, (h, a, d) in enumerate(zip(games["home_team"], games["away_team"], games["gameday"]))]
+
+def theodds_event_odds(event: dict, seed: int = 0, books=("DraftKings", "FanDuel", "Fanatics", "BetMGM"),
+                       markets=("player_pass_yds", "player_rush_yds", "player_rec_yds", "player_receptions"),
+                       players_per_market: int = 12) -> dict:
+    """One /events/{id}/odds payload: every book quotes Over and Under for each player and market."""
+    rng = np.random.default_rng([seed, int(event["id"][2:])])
+    def outcomes(market):
+        out = []
+        for p in range(players_per_market):
+            point = float(rng.integers(10, 300)) + 0.5
+            for side in ("Over", "Under"):
+                out.append({"name": side, "description": f"Player {event['id'][-4:]}{p:02d}",
+                            "price": int(rng.choice([-125, -115, -110, -105, 100, 105])), "point": point})
+        return out
+    return {"id": event["id"], "bookmakers": [
+        {"key": b.lower(), "title": b, "markets": [{"key": m, "outcomes": outcomes(m)} for m in markets]}
+        for b in books
+    ]}
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+import pyarrow.parquet as pq
+import nfl_data_py as nfl
+from config import CURRENT_SEASON, NFL_CACHE_MODE, NFL_CACHE_DIR, NFL_CACHE_TTL_HOURS
+from logutil import get_logger
+import telemetry
+
+logger = get_logger()
+
+# On-disk Parquet cache for nfl_data_py pulls, one file per (source, season).
+# A completed season's file is reused forever once it was written after the
+# season ended (playoffs and stat corrections done, see _season_end); any other
+# file is refetched once it is older than NFL_CACHE_TTL_HOURS.
+# NFL_CACHE_MODE: "on" (default), "off" (always hit upstream), "only" (offline, never hit upstream).
+
+def _cache_dir() -> Path:
+    return Path(NFL_CACHE_DIR) if NFL_CACHE_DIR else Path(__file__).resolve().parent / "cache"
+
+def _path(source: str, key) -> Path:
+    return _cache_dir() / source / f"{key}.parquet"
+
+def _season_end(season: int) -> float:
+    """Epoch seconds after which ``season``'s upstream data no longer changes (March 1 of the next year)."""
+    return datetime(season + 1, 3, 1).timestamp()
+
+def _is_fresh(path: Path, season: int | None) -> bool:
+    if not path.exists():
+        return False
+    mtime = path.stat().st_mtime
+    if season is not None and season < CURRENT_SEASON and mtime >= _season_end(season):
+        return True
+    return (time.time() - mtime) < NFL_CACHE_TTL_HOURS * 3600
+
+def _project(df: pd.DataFrame, columns: list[str] | None) -> pd.DataFrame:
+    return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+def _read(path: Path, columns: list[str] | None) -> pd.DataFrame:
+    if columns is None:
+        return pd.read_parquet(path)
+    have = set(pq.read_schema(path).names)
+    return pd.read_parquet(path, columns=[c for c in columns if c in have])
+
+def _write(path: Path, df: pd.DataFrame) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        df.reset_index(drop=True).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        logger.warning(f"Could not cache {path.parent.name}/{path.name}: {e}")
+
+def _by_season(source: str, years: list[int], fetch, columns: list[str] | None = None) -> pd.DataFrame:
+    years = sorted({int(y) for y in years})
+    if NFL_CACHE_MODE == "off":
+        # fetch everything and project here: upstream raises on columns a season doesn't have
+        with telemetry.timed("fetch"):
+            return _project(fetch(years, None), columns)
+
+    stale = [y for y in years if not _is_fresh(_path(source, y), y)]
+    if stale and NFL_CACHE_MODE == "only":
+        missing = [y for y in stale if not _path(source, y).exists()]
+        if missing:
+            raise FileNotFoundError(f"{source} not cached for seasons {missing} (NFL_CACHE_MODE=only)")
+        stale = []  # offline: serve whatever is on disk, however old
+
+    if stale:
+        logger.info(f"Fetching {source} for seasons {stale}")
+        with telemetry.timed("fetch"):
+            fresh = fetch(stale, None)
+        for y in stale:
+            part = fresh[fresh['season'] == y] if 'season' in fresh.columns else fresh.iloc[0:0]
+            _write(_path(source, y), part)
+
+    frames = [_read(_path(source, y), columns) for y in years if _path(source, y).exists()]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(frames, ignore_index=True)
+
+def load_weekly(years: list[int], columns: list[str] | None = None) -> pd.DataFrame:
+    return _by_season("weekly", years, lambda ys, cols: nfl.import_weekly_data(ys, columns=cols), columns)
+
+def load_schedules(years: list[int], columns: list[str] | None = None) -> pd.DataFrame:
+    return _by_season("schedules", years, lambda ys, cols: nfl.import_schedules(ys), columns)
+
+def load_seasonal_rosters(years: list[int], columns: list[str] | None = None) -> pd.DataFrame:
+    return _by_season("rosters", years, lambda ys, cols: nfl.import_seasonal_rosters(ys, columns=cols), columns)
+
+def load_team_desc() -> pd.DataFrame:
+    path = _path("team_desc", "all")
+    if NFL_CACHE_MODE == "off":
+        with telemetry.timed("fetch"):
+            return nfl.import_team_desc()
+    if NFL_CACHE_MODE == "only" or _is_fresh(path, None):
+        if not path.exists():
+            raise FileNotFoundError("team_desc not cached (NFL_CACHE_MODE=only)")
+        return _read(path, None)
+    with telemetry.timed("fetch"):
+        teams = nfl.import_team_desc()
+    _write(path, teams)
+    return teams
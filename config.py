@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 CURRENT_YEAR = dt.datetime.now().year
+# NFL seasons start in September and run into February of the next calendar year
+CURRENT_SEASON = CURRENT_YEAR if dt.datetime.now().month >= 3 else CURRENT_YEAR - 1
 
 def _parse_years(s: str) -> list[int]:
     s = (s or "").strip()
@@ -28,13 +30,39 @@ DB_SCHEMA   = os.getenv("DB_SCHEMA", "nfl")
 YEARS               = _parse_years(os.getenv("YEARS", f"2015-{CURRENT_YEAR}"))
 CURRENT_ROSTER_ONLY = os.getenv("CURRENT_ROSTER_ONLY", "false").lower() in ("1","true","yes")
 REPLACE_MODE        = os.getenv("REPLACE_MODE", "true").lower() in ("1","true","yes")
+INCREMENTAL_LOAD    = os.getenv("INCREMENTAL_LOAD", "true").lower() in ("1","true","yes")
+PARTITION_BY_SEASON = os.getenv("PARTITION_BY_SEASON", "false").lower() in ("1","true","yes")
 DAILY_MODE          = os.getenv("DAILY_MODE", "false").lower() in ("1","true","yes")
 RECENT_WEEKS        = int(os.getenv("RECENT_WEEKS", "4"))
+PIPELINE_WORKERS    = int(os.getenv("PIPELINE_WORKERS", "4"))
+STREAM_SEASONS      = os.getenv("STREAM_SEASONS", "false").lower() in ("1","true","yes")
+PROFILE_STAGES      = os.getenv("PROFILE_STAGES", "false").lower() in ("1","true","yes")   # cProfile dump per stage
+PROFILE_DIR         = os.getenv("PROFILE_DIR", "")
+
+COPY_CHUNK_ROWS     = int(os.getenv("COPY_CHUNK_ROWS", "50000"))
+UPSERT_MODE         = os.getenv("UPSERT_MODE", "merge").strip().lower()   # merge (row-hash diff) | insert (new keys only)
+DB_WRITERS          = int(os.getenv("DB_WRITERS", "4"))            # connections one bulk upsert may use at once
+DB_WRITER_MIN_ROWS  = int(os.getenv("DB_WRITER_MIN_ROWS", "50000")) # smallest shard worth its own connection
 
 LINES_BOOK_FILTER = [b.strip() for b in os.getenv("LINES_BOOK_FILTER","DraftKings,FanDuel,Fanatics").split(",") if b.strip()]
 
 THEODDS_API_KEY = os.getenv("THEODDS_API_KEY")
 PROPS_BOOKS  = [b.strip().lower() for b in os.getenv("PROPS_BOOKS","DraftKings,FanDuel,Fanatics").split(",") if b.strip()]
 PROPS_MARKETS = [m.strip() for m in os.getenv("PROPS_MARKETS","player_pass_yds,player_rush_yds,player_rec_yds,player_receptions").split(",") if m.strip()]
+PROPS_MAX_WORKERS   = int(os.getenv("PROPS_MAX_WORKERS", "4"))
+PROPS_MAX_RETRIES   = int(os.getenv("PROPS_MAX_RETRIES", "3"))
+PROPS_QUOTA_RESERVE = int(os.getenv("PROPS_QUOTA_RESERVE", "0"))
+
+# props daemon: "<hours to kickoff>:<seconds between polls>" steps, "*" for everything further out
+PROPS_POLL_CADENCE = os.getenv("PROPS_POLL_CADENCE", "2:300,24:1800,*:3600")
+
+ODDS_STORE_MODE    = os.getenv("ODDS_STORE_MODE", "off").strip().lower()   # off | record | replay | ttl
+ODDS_STORE_DIR     = os.getenv("ODDS_STORE_DIR", "")
+ODDS_STORE_TTL_MIN = float(os.getenv("ODDS_STORE_TTL_MIN", "10"))
+ODDS_REPLAY_AT     = os.getenv("ODDS_REPLAY_AT", "")   # replay the latest snapshot at or before this UTC time
 
 SPORT_KEY = "americanfootball_nfl"
+
+NFL_CACHE_MODE      = os.getenv("NFL_CACHE_MODE", "on").strip().lower()   # on | off | only
+NFL_CACHE_DIR       = os.getenv("NFL_CACHE_DIR", "")
+NFL_CACHE_TTL_HOURS = float(os.getenv("NFL_CACHE_TTL_HOURS", "12"))
@@ -0,0 +1,69 @@
+import threading
+from functools import cached_property
+import pandas as pd
+from config import YEARS, CURRENT_YEAR
+from cache import load_schedules, load_seasonal_rosters, load_team_desc
+from utils import mk_game_ids
+from games import GameIndex
+
+SCHEDULE_COLUMNS = ['season','week','home_team','away_team','gameday','game_date']
+ROSTER_COLUMNS   = ['player_id','player_name','team','position','season']
+
+class _shared(cached_property):
+    """cached_property that concurrent stages can hit safely: the first caller loads, the rest wait."""
+
+    def __get__(self, instance, owner=None):
+        if instance is None or self.attrname in instance.__dict__:
+            return super().__get__(instance, owner)
+        with instance._locks.setdefault(self.attrname, threading.Lock()):
+            return super().__get__(instance, owner)
+
+class RunContext:
+    """Upstream data for a single run.
+
+    Every dataset is loaded at most once, projected to the columns the
+    pipeline uses, and shared by all stages. Derived keys (schedule
+    game_id, roster name-key map) are computed once here as well.
+    """
+
+    def __init__(self, years: list[int] | None = None):
+        self.years = sorted(set(years or YEARS))
+        self._locks: dict[str, threading.Lock] = {}
+
+    @_shared
+    def schedule(self) -> pd.DataFrame:
+        sched = load_schedules(self.years, SCHEDULE_COLUMNS)
+        sched['game_date'] = sched['gameday'] if 'gameday' in sched.columns else sched.get('game_date', pd.NaT)
+        sched['game_date'] = pd.to_datetime(sched['game_date'], errors='coerce', utc=True)
+        sched['game_id'] = mk_game_ids(sched['season'], sched['week'], sched['home_team'], sched['away_team'])
+        return sched[['season','week','home_team','away_team','game_date','game_id']]
+
+    @_shared
+    def games(self) -> GameIndex:
+        return GameIndex(self.schedule)
+
+    @_shared
+    def rosters(self) -> pd.DataFrame:
+        rost = load_seasonal_rosters(self.years, ROSTER_COLUMNS).dropna(subset=['player_id','player_name','team'])
+        rost['player_name_norm'] = rost['player_name'].str.lower().str.strip()
+        rost['k'] = rost['player_name_norm'] + '|' + rost['team'] + '|' + rost['position'].fillna('')
+        return rost
+
+    @_shared
+    def roster_key_map(self) -> pd.DataFrame:
+        """One player_id per ``name|team|pos`` key (the most common one)."""
+        return (self.rosters.groupby('k')['player_id']
+                    .agg(lambda s: s.mode().iat[0] if not s.mode().empty else s.iloc[0])
+                    .reset_index())
+
+    @_shared
+    def resolver(self) -> dict[str, str]:
+        return dict(zip(self.roster_key_map['k'], self.roster_key_map['player_id']))
+
+    @_shared
+    def current_rosters(self) -> pd.DataFrame:
+        return load_seasonal_rosters([CURRENT_YEAR], ROSTER_COLUMNS[:-1])
+
+    @_shared
+    def team_desc(self) -> pd.DataFrame:
+        return load_team_desc()[['team_abbr','team_name']]
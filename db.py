@@ -1,17 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import pandas as pd
 from sqlalchemy import create_engine, text
-from config import PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD, DB_SCHEMA
-from io import StringIO
+from sqlalchemy.exc import ProgrammingError
+from config import PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD, DB_SCHEMA, PARTITION_BY_SEASON, COPY_CHUNK_ROWS
+from config import PIPELINE_WORKERS, DB_WRITERS, DB_WRITER_MIN_ROWS
+from logutil import get_logger
+import telemetry
+
+logger = get_logger()
+
+# Tables that are list-partitioned by season when PARTITION_BY_SEASON is on.
+# Postgres requires the partition key in every unique constraint, hence the
+# season suffix on the lines/props keys in that mode.
+SEASON_TABLES = ["fact_player_timeslot", "dim_vegas_lines", "fact_player_prop_lines"]
+_SEASON_KEY   = ["season"] if PARTITION_BY_SEASON else []
+FACT_KEY  = ["game_id","season","week","team_abbr","opponent_abbr","time_slot","player_id","position"]
+LINES_KEY = ["game_id","book","line_timestamp"] + _SEASON_KEY
+PROPS_KEY = ["game_id","book","player_name","market","ts","line_value"] + _SEASON_KEY
 
 def get_engine():
     url = f"postgresql+psycopg2://{PGUSER}:{PGPASSWORD}@{PGHOST}:{PGPORT}/{PGDATABASE}"
-    return create_engine(url, pool_pre_ping=True, hide_parameters=True)
+    # room for every concurrent stage to run a full set of parallel writers
+    return create_engine(url, pool_pre_ping=True, hide_parameters=True,
+                         pool_size=max(5, PIPELINE_WORKERS * DB_WRITERS), max_overflow=5)
 
 def ensure_schema(engine):
     with engine.begin() as con:
         con.execute(text(f"CREATE SCHEMA IF NOT EXISTS {DB_SCHEMA};"))
 
-def create_tables(engine):
-    ddl = f"""
+def _tables_ddl() -> str:
+    part = " PARTITION BY LIST (season)" if PARTITION_BY_SEASON else ""
+    return f"""
     CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.dim_team (
         team_abbr text PRIMARY KEY,
         team_name text
@@ -42,9 +63,10 @@ def create_tables(engine):
         away_moneyline int,
         line_source text,
         line_timestamp timestamptz,
+        row_hash uuid,
         load_ts timestamptz DEFAULT now(),
-        PRIMARY KEY (game_id, book, line_timestamp)
-    );
+        PRIMARY KEY ({", ".join(LINES_KEY)})
+    ){part};
     CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.fact_player_timeslot (
         game_id text,
         season int,
@@ -73,9 +95,10 @@ def create_tables(engine):
         games_played int,
         season_range text,
         current_roster_only boolean,
+        row_hash uuid,
         load_ts timestamp default now(),
-        PRIMARY KEY (game_id, season, week, team_abbr, opponent_abbr, time_slot, player_id, position)
-    );
+        PRIMARY KEY ({", ".join(FACT_KEY)})
+    ){part};
     CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.fact_player_prop_lines (
         game_id   text,
         season    int,
@@ -90,75 +113,658 @@ def create_tables(engine):
         under_odds int,
         ts         timestamptz,
         load_ts    timestamptz default now(),
-        PRIMARY KEY (game_id, book, player_name, market, ts)
+        PRIMARY KEY ({", ".join(PROPS_KEY)})
+    ){part};
+    CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.load_state (
+        table_name   text,
+        season       int,
+        week         int,
+        content_hash text,
+        row_count    int,
+        load_ts      timestamptz default now(),
+        PRIMARY KEY (table_name, season, week)
+    );
+    CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.load_audit (
+        run_id       text,
+        stage        text,
+        started_at   timestamptz,
+        status       text,
+        wall_s       double precision,
+        fetch_s      double precision,
+        db_s         double precision,
+        pandas_s     double precision,
+        rows_in      bigint,
+        rows_out     bigint,
+        copy_bytes   bigint,
+        rss_delta_mb double precision,
+        error        text,
+        PRIMARY KEY (run_id, stage)
+    );
+    """
+
+# rollup table -> the split it groups a player's games by, within a season
+ROLLUPS = {
+    "rollup_player_timeslot":          ["time_slot"],
+    "rollup_player_opponent":          ["opponent_abbr"],
+    "rollup_player_timeslot_opponent": ["time_slot", "opponent_abbr"],
+}
+ROLLUP_STATS = [
+    "passing_yards", "passing_tds", "interceptions", "attempts", "completions",
+    "rushing_yards", "rushing_tds", "carries", "receptions", "receiving_yards", "receiving_tds",
+    "sacks", "def_interceptions", "fumbles_recovered", "total_touchdowns",
+]
+
+def _rollups_ddl() -> str:
+    """Per-season rollup tables plus an ``_all`` view over every loaded season for each of ROLLUPS."""
+    stat_cols = ",\n        ".join(f"{c}_sum numeric, {c}_avg numeric" for c in ROLLUP_STATS)
+    ddl = []
+    for table, split in ROLLUPS.items():
+        ddl.append(f"""
+    CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.{table} (
+        player_id text,
+        season int,
+        {", ".join(f"{c} text" for c in split)},
+        player_name text,
+        position text,
+        games int,
+        {stat_cols},
+        season_range text,
+        load_ts timestamptz default now(),
+        PRIMARY KEY (player_id, season, {", ".join(split)})
+    );
+    CREATE OR REPLACE VIEW {DB_SCHEMA}.{table}_all AS
+    SELECT player_id, {", ".join(split)}, max(player_name) AS player_name, max(position) AS position,
+        min(season) AS first_season, max(season) AS last_season, sum(games) AS games,
+        {", ".join(f"sum({c}_sum) AS {c}_sum, sum({c}_sum) / nullif(sum(games), 0) AS {c}_avg" for c in ROLLUP_STATS)}
+    FROM {DB_SCHEMA}.{table}
+    GROUP BY player_id, {", ".join(split)};""")
+    return "\n".join(ddl)
+
+# per-stat feature columns of feature_player_week: <stat>_<kind>, all computed from earlier games only
+FEATURE_STATS = [
+    "passing_yards", "passing_tds", "interceptions", "attempts", "completions",
+    "rushing_yards", "rushing_tds", "carries", "receptions", "receiving_yards", "receiving_tds",
+    "total_touchdowns",
+]
+FEATURE_KINDS = ["l3", "l5", "season_avg", "ewm", "opp_allowed"]
+
+def _features_ddl() -> str:
+    cols = ",\n        ".join(f"{c}_{k} double precision" for c in FEATURE_STATS for k in FEATURE_KINDS)
+    return f"""
+    CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.feature_player_week (
+        player_id text,
+        season int,
+        week int,
+        game_id text,
+        team_abbr text,
+        opponent_abbr text,
+        position text,
+        games_prior int,
+        {cols},
+        load_ts timestamptz default now(),
+        PRIMARY KEY (player_id, season, week)
+    );
+    CREATE INDEX IF NOT EXISTS ix_feature_season_week ON {DB_SCHEMA}.feature_player_week (season, week);
+    """
+
+def _prop_pricing_ddl() -> str:
+    return f"""
+    CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.prop_pricing (
+        game_id      text,
+        season       int,
+        week         int,
+        book         text,
+        player_id    text,
+        player_name  text,
+        market       text,
+        line_value   numeric,
+        over_odds    int,
+        under_odds   int,
+        over_implied  double precision,
+        under_implied double precision,
+        vig           double precision,
+        over_fair     double precision,
+        under_fair    double precision,
+        consensus_over_fair double precision,
+        best_over_odds   int,
+        best_over_book   text,
+        best_under_odds  int,
+        best_under_book  text,
+        projection   double precision,
+        edge         double precision,
+        edge_pct     double precision,
+        ts           timestamptz,
+        priced_at    timestamptz default now(),
+        PRIMARY KEY (game_id, book, player_name, market, line_value)
     );
     """
+
+def create_tables(engine):
     with engine.begin() as con:
-        con.execute(text(ddl))
+        con.execute(text(_tables_ddl()))
+
+def _season_partitions(con) -> set[str]:
+    rows = con.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :s
+    """), {"s": DB_SCHEMA}).fetchall()
+    return {r[0] for r in rows}
+
+def _convert_to_partitioned(con, table: str) -> None:
+    """Swap an unpartitioned install of ``table`` for a season-partitioned copy.
+
+    Rows with a NULL season cannot be routed to a partition and are dropped.
+    """
+    old = f"{table}_unpartitioned"
+    con.execute(text(f"ALTER TABLE {DB_SCHEMA}.{table} RENAME TO {old};"))
+    con.execute(text(f"ALTER TABLE {DB_SCHEMA}.{old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey;"))
+    con.execute(text(_tables_ddl()))
+    seasons = [r[0] for r in con.execute(text(f"SELECT DISTINCT season FROM {DB_SCHEMA}.{old} WHERE season IS NOT NULL;")).fetchall()]
+    for y in seasons:
+        con.execute(text(f"CREATE TABLE {DB_SCHEMA}.{table}_{int(y)} PARTITION OF {DB_SCHEMA}.{table} FOR VALUES IN ({int(y)});"))
+    cols = [r[0] for r in con.execute(text("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = :s AND table_name = :t ORDER BY ordinal_position
+    """), {"s": DB_SCHEMA, "t": table}).fetchall()]
+    cols_csv = ",".join(cols)
+    con.execute(text(f"INSERT INTO {DB_SCHEMA}.{table} ({cols_csv}) SELECT {cols_csv} FROM {DB_SCHEMA}.{old} WHERE season IS NOT NULL;"))
+    con.execute(text(f"DROP TABLE {DB_SCHEMA}.{old};"))
+    for name, (t, _) in INDEXES.items():
+        if t == table:
+            _create_index(con, name, concurrently=False)
+
+def ensure_season_partitions(engine, years: list[int]):
+    """Create missing per-season partitions, converting unpartitioned tables first."""
+    if not PARTITION_BY_SEASON:
+        return
+    with engine.begin() as con:
+        kinds = dict(con.execute(text("""
+            SELECT c.relname, c.relkind FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :s AND c.relname = ANY(:t)
+        """), {"s": DB_SCHEMA, "t": SEASON_TABLES}).fetchall())
+        for table in SEASON_TABLES:
+            if kinds.get(table) == "r":
+                _convert_to_partitioned(con, table)
+        existing = _season_partitions(con)
+        for table in SEASON_TABLES:
+            for y in sorted({int(y) for y in years}):
+                if f"{table}_{y}" not in existing:
+                    con.execute(text(f"CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.{table}_{y} PARTITION OF {DB_SCHEMA}.{table} FOR VALUES IN ({y});"))
+
+def legacy_key_sql(alias: str = "") -> str:
+    """The ``name|team|pos`` roster key of a fact row, as indexed by ix_fact_legacy_key."""
+    a = alias
+    return f"(LOWER(TRIM({a}player_name)) || '|' || {a}team_abbr || '|' || COALESCE({a}position,''))"
 
-def ensure_fact_schema_up_to_date(engine):
+# name -> (table, column list and optional predicate)
+INDEXES = {
+    "ix_fact_season_week":   ("fact_player_timeslot", "(season, week)"),
+    "ix_fact_team_opp_slot": ("fact_player_timeslot", "(team_abbr, opponent_abbr, time_slot)"),
+    "ix_fact_player":        ("fact_player_timeslot", "(player_id)"),
+    "ix_fact_game":          ("fact_player_timeslot", "(game_id)"),
+    "ix_lines_game_book":    ("dim_vegas_lines", "(game_id, book)"),
+    # small: only rows still waiting for a roster id, keyed the way backfill matches them
+    "ix_fact_legacy_key":    ("fact_player_timeslot", f"(season, {legacy_key_sql()}) WHERE player_id LIKE 'legacy_%'"),
+    "ix_props_seasonweek":   ("fact_player_prop_lines", "(seasonweek)"),
+}
+
+def _index_valid(con, name: str) -> bool | None:
+    """None when index ``name`` does not exist, else whether it is usable."""
+    return con.execute(text("""
+        SELECT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :s AND c.relname = :n
+    """), {"s": DB_SCHEMA, "n": name}).scalar()
+
+def _partitions_of(con, table: str) -> list[str] | None:
+    """Partition names of ``table``, or None when it is a plain table."""
+    rows = con.execute(text("""
+        SELECT p.relkind, c.relname FROM pg_class p
+        JOIN pg_namespace n ON n.oid = p.relnamespace
+        LEFT JOIN pg_inherits i ON i.inhparent = p.oid
+        LEFT JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE n.nspname = :s AND p.relname = :t
+    """), {"s": DB_SCHEMA, "t": table}).fetchall()
+    if not rows or rows[0][0] != "p":
+        return None
+    return sorted(r[1] for r in rows if r[1])
+
+def _create_index(con, name: str, concurrently: bool) -> None:
+    """Build index ``name`` from INDEXES unless a valid one exists; a failed earlier build is dropped first.
+
+    Partitioned tables can't be indexed CONCURRENTLY, so their index is
+    created ON ONLY the parent, built per partition, and attached.
+    """
+    table, spec = INDEXES[name]
+    how = "CONCURRENTLY " if concurrently else ""
+    valid = _index_valid(con, name)
+    if valid:
+        return
+    parts = _partitions_of(con, table)
+    if parts is None:
+        if valid is False:
+            con.execute(text(f"DROP INDEX {how}{DB_SCHEMA}.{name};"))
+        con.execute(text(f"CREATE INDEX {how}{name} ON {DB_SCHEMA}.{table} {spec};"))
+        return
+    if valid is False:
+        con.execute(text(f"DROP INDEX {DB_SCHEMA}.{name};"))  # takes its attached partition indexes with it
+    con.execute(text(f"CREATE INDEX {name} ON ONLY {DB_SCHEMA}.{table} {spec};"))
+    for part in parts:
+        child = f"{name}_{part.rsplit('_', 1)[1]}"
+        if _index_valid(con, child) is False:
+            con.execute(text(f"DROP INDEX {how}{DB_SCHEMA}.{child};"))
+        con.execute(text(f"CREATE INDEX {how}IF NOT EXISTS {child} ON {DB_SCHEMA}.{part} {spec};"))
+        con.execute(text(f"ALTER INDEX {DB_SCHEMA}.{name} ATTACH PARTITION {DB_SCHEMA}.{child};"))
+
+def _add_missing_columns(con) -> None:
+    # columns added after the first release; fresh installs already get them from _tables_ddl
     needed = {
-        "game_id": "text",
-        "interceptions_avg": "numeric",
-        "def_interceptions_avg": "numeric",
-        "fumbles_recovered_avg": "numeric",
-        "season_range": "text",
-        "current_roster_only": "boolean",
+        "fact_player_timeslot": {
+            "game_id": "text", "interceptions_avg": "numeric", "def_interceptions_avg": "numeric",
+            "fumbles_recovered_avg": "numeric", "season_range": "text", "current_roster_only": "boolean",
+            "row_hash": "uuid",
+        },
+        "dim_vegas_lines": {"row_hash": "uuid"},
+        "fact_player_prop_lines": {"seasonweek": "int"},
     }
+    for table, cols in needed.items():
+        for col, typ in cols.items():
+            con.execute(text(f"ALTER TABLE {DB_SCHEMA}.{table} ADD COLUMN IF NOT EXISTS {col} {typ};"))
+
+def _props_line_key(con) -> None:
+    # one snapshot of a (game, book, player, market) can hold several alternate lines: line_value joins the key
+    pk = [r[0] for r in con.execute(text("""
+        SELECT a.attname FROM pg_constraint c
+        JOIN pg_class t ON t.oid = c.conrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ANY(c.conkey)
+        WHERE n.nspname = :s AND t.relname = 'fact_player_prop_lines' AND c.contype = 'p'
+    """), {"s": DB_SCHEMA}).fetchall()]
+    if "line_value" in pk:
+        return
+    # rows without a line are yes/no markets with no over/under price
+    con.execute(text(f"DELETE FROM {DB_SCHEMA}.fact_player_prop_lines WHERE line_value IS NULL;"))
+    con.execute(text(f"ALTER TABLE {DB_SCHEMA}.fact_player_prop_lines DROP CONSTRAINT fact_player_prop_lines_pkey, "
+                     f"ADD PRIMARY KEY ({', '.join(['game_id', 'book', 'player_name', 'market', 'ts', 'line_value'] + _SEASON_KEY)});"))
+
+# Migration 1 exactly as first released; _tables_ddl() is the current layout.
+# Only the install's settings are filled in: schema, partitioning and the
+# season suffix partitioned keys need.
+_BASE_TABLES_V1 = """
+    CREATE TABLE IF NOT EXISTS {schema}.dim_team (
+        team_abbr text PRIMARY KEY,
+        team_name text
+    );
+    CREATE TABLE IF NOT EXISTS {schema}.dim_player (
+        player_id text PRIMARY KEY,
+        player_name text,
+        primary_position text,
+        last_team text
+    );
+    CREATE TABLE IF NOT EXISTS {schema}.dim_timeslot (
+        timeslot_key smallint PRIMARY KEY,
+        time_slot text UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS {schema}.dim_vegas_lines (
+        game_id text,
+        season int,
+        week int,
+        book text,
+        home_team text,
+        away_team text,
+        favorite_team text,
+        spread_open numeric,
+        spread_close numeric,
+        total_open numeric,
+        total_close numeric,
+        home_moneyline int,
+        away_moneyline int,
+        line_source text,
+        line_timestamp timestamptz,
+        row_hash uuid,
+        load_ts timestamptz DEFAULT now(),
+        PRIMARY KEY (game_id, book, line_timestamp{season_key})
+    ){part};
+    CREATE TABLE IF NOT EXISTS {schema}.fact_player_timeslot (
+        game_id text,
+        season int,
+        week int,
+        team_abbr text,
+        opponent_abbr text,
+        time_slot text,
+        player_id text,
+        player_name text,
+        position text,
+        passing_yards_avg numeric,
+        passing_tds_avg numeric,
+        interceptions_avg numeric,
+        attempts_avg numeric,
+        completions_avg numeric,
+        rushing_yards_avg numeric,
+        rushing_tds_avg numeric,
+        carries_avg numeric,
+        receptions_avg numeric,
+        receiving_yards_avg numeric,
+        receiving_tds_avg numeric,
+        sacks_avg numeric,
+        def_interceptions_avg numeric,
+        fumbles_recovered_avg numeric,
+        total_touchdowns_avg numeric,
+        games_played int,
+        season_range text,
+        current_roster_only boolean,
+        row_hash uuid,
+        load_ts timestamp default now(),
+        PRIMARY KEY (game_id, season, week, team_abbr, opponent_abbr, time_slot, player_id, position)
+    ){part};
+    CREATE TABLE IF NOT EXISTS {schema}.fact_player_prop_lines (
+        game_id   text,
+        season    int,
+        week      int,
+        seasonweek int,
+        book      text,
+        player_id text,
+        player_name text,
+        market    text,
+        line_value numeric,
+        over_odds  int,
+        under_odds int,
+        ts         timestamptz,
+        load_ts    timestamptz default now(),
+        PRIMARY KEY (game_id, book, player_name, market, ts{season_key})
+    ){part};
+    CREATE TABLE IF NOT EXISTS {schema}.load_state (
+        table_name   text,
+        season       int,
+        week         int,
+        content_hash text,
+        row_count    int,
+        load_ts      timestamptz default now(),
+        PRIMARY KEY (table_name, season, week)
+    );
+    CREATE TABLE IF NOT EXISTS {schema}.load_audit (
+        run_id       text,
+        stage        text,
+        started_at   timestamptz,
+        status       text,
+        wall_s       double precision,
+        fetch_s      double precision,
+        db_s         double precision,
+        pandas_s     double precision,
+        rows_in      bigint,
+        rows_out     bigint,
+        copy_bytes   bigint,
+        rss_delta_mb double precision,
+        error        text,
+        PRIMARY KEY (run_id, stage)
+    );
+"""
+
+def _base_tables_v1(con) -> None:
+    con.execute(text(_BASE_TABLES_V1.format(
+        schema=DB_SCHEMA,
+        part=" PARTITION BY LIST (season)" if PARTITION_BY_SEASON else "",
+        season_key=", season" if PARTITION_BY_SEASON else "",
+    )))
+
+# Append only: a step never changes once released, fixes go in a new version.
+# (version, description, step(con), concurrent). Plain steps run in one
+# transaction with their schema_version row; concurrent steps run on an
+# autocommit connection so CREATE INDEX CONCURRENTLY doesn't block readers.
+def _index_step(version: int, name: str) -> tuple:
+    return (version, f"index {name}", partial(_create_index, name=name, concurrently=True), True)
+
+MIGRATIONS = [
+    (1, "base tables", _base_tables_v1, False),
+    (2, "columns added since the first release", _add_missing_columns, False),
+    _index_step(3, "ix_fact_season_week"),
+    _index_step(4, "ix_fact_team_opp_slot"),
+    _index_step(5, "ix_fact_player"),
+    _index_step(6, "ix_fact_game"),
+    _index_step(7, "ix_lines_game_book"),
+    _index_step(8, "ix_fact_legacy_key"),
+    _index_step(9, "ix_props_seasonweek"),
+    (10, "player split rollups", lambda con: con.execute(text(_rollups_ddl())), False),
+    (11, "feature_player_week", lambda con: con.execute(text(_features_ddl())), False),
+    (12, "prop_pricing", lambda con: con.execute(text(_prop_pricing_ddl())), False),
+    (13, "line_value in the props key", _props_line_key, False),
+]
+
+def migrate(engine) -> int:
+    """Bring DB_SCHEMA up to the latest MIGRATIONS version; returns how many steps ran.
+
+    An up-to-date database costs a single query. Runs that find pending
+    steps serialize on an advisory lock, so a concurrent loader and props
+    daemon never apply the same step twice.
+    """
+    latest = MIGRATIONS[-1][0]
+    try:
+        with engine.connect() as con:
+            if (con.execute(text(f"SELECT max(version) FROM {DB_SCHEMA}.schema_version;")).scalar() or 0) >= latest:
+                return 0
+    except ProgrammingError:
+        pass  # no schema_version yet
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as con:
+        # poll rather than block: CREATE INDEX CONCURRENTLY in the holder would wait for our waiting statement
+        while not con.execute(text("SELECT pg_try_advisory_lock(hashtext(:k));"), {"k": f"{DB_SCHEMA}.schema_version"}).scalar():
+            time.sleep(0.5)
+        try:
+            con.execute(text(f"CREATE SCHEMA IF NOT EXISTS {DB_SCHEMA};"))
+            con.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.schema_version (
+                    version     int PRIMARY KEY,
+                    description text,
+                    applied_at  timestamptz DEFAULT now()
+                );
+            """))
+            current = con.execute(text(f"SELECT coalesce(max(version), 0) FROM {DB_SCHEMA}.schema_version;")).scalar()
+            pending = [m for m in MIGRATIONS if m[0] > current]
+            record = text(f"INSERT INTO {DB_SCHEMA}.schema_version (version, description) VALUES (:v, :d);")
+            for version, description, step, concurrent in pending:
+                t0 = time.perf_counter()
+                if concurrent:
+                    step(con)
+                    con.execute(record, {"v": version, "d": description})
+                else:
+                    with engine.begin() as tx:
+                        step(tx)
+                        tx.execute(record, {"v": version, "d": description})
+                logger.info(f"Schema migration {version} ({description}) applied in {time.perf_counter() - t0:.2f}s")
+        finally:
+            con.execute(text("SELECT pg_advisory_unlock(hashtext(:k));"), {"k": f"{DB_SCHEMA}.schema_version"})
+    return len(pending)
+
+def delete_seasons(engine, table: str, years: list[int]):
+    """Remove ``years`` from ``table``: drop and recreate their partitions when
+    partitioned, otherwise a plain DELETE. Their load_state fingerprints go too."""
     with engine.begin() as con:
-        cols = con.execute(text("""
-            SELECT column_name FROM information_schema.columns
-            WHERE table_schema=:s AND table_name='fact_player_timeslot'
-        """), {"s": DB_SCHEMA}).fetchall()
-        existing = {r[0] for r in cols}
-        for col, typ in needed.items():
-            if col not in existing:
-                con.execute(text(f"ALTER TABLE {DB_SCHEMA}.fact_player_timeslot ADD COLUMN {col} {typ};"))
-
-def ensure_props_schema_up_to_date(engine):
-    """Add missing columns for fact_player_prop_lines created by older versions."""
-    with engine.begin() as con:
-        cols = con.execute(text("""
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = :s AND table_name = 'fact_player_prop_lines'
-        """), {"s": DB_SCHEMA}).fetchall()
-        existing = {r[0] for r in cols}
-        if "seasonweek" not in existing:
-            con.execute(text(f"ALTER TABLE {DB_SCHEMA}.fact_player_prop_lines ADD COLUMN seasonweek int;"))
-
-def add_indexes(engine):
-    with engine.begin() as con:
-        con.execute(text(f"CREATE INDEX IF NOT EXISTS ix_fact_season_week ON {DB_SCHEMA}.fact_player_timeslot(season, week);"))
-        con.execute(text(f"CREATE INDEX IF NOT EXISTS ix_fact_team_opp_slot ON {DB_SCHEMA}.fact_player_timeslot(team_abbr, opponent_abbr, time_slot);"))
-        con.execute(text(f"CREATE INDEX IF NOT EXISTS ix_fact_player ON {DB_SCHEMA}.fact_player_timeslot(player_id);"))
-        con.execute(text(f"CREATE INDEX IF NOT EXISTS ix_fact_game ON {DB_SCHEMA}.fact_player_timeslot(game_id);"))
-        con.execute(text(f"CREATE INDEX IF NOT EXISTS ix_lines_game_book ON {DB_SCHEMA}.dim_vegas_lines(game_id, book);"))
-
-        # only if seasonweek exists
-        cols = con.execute(text("""
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = :s AND table_name = 'fact_player_prop_lines'
-        """), {"s": DB_SCHEMA}).fetchall()
-        existing = {r[0] for r in cols}
-        if "seasonweek" in existing:
-            con.execute(text(f"CREATE INDEX IF NOT EXISTS ix_props_seasonweek ON {DB_SCHEMA}.fact_player_prop_lines(seasonweek);"))
+        if PARTITION_BY_SEASON:
+            existing = _season_partitions(con)
+            for y in sorted({int(y) for y in years}):
+                part = f"{table}_{y}"
+                if part in existing:
+                    con.execute(text(f"ALTER TABLE {DB_SCHEMA}.{table} DETACH PARTITION {DB_SCHEMA}.{part};"))
+                    con.execute(text(f"DROP TABLE {DB_SCHEMA}.{part};"))
+                con.execute(text(f"CREATE TABLE {DB_SCHEMA}.{part} PARTITION OF {DB_SCHEMA}.{table} FOR VALUES IN ({y});"))
+        else:
+            con.execute(text(f"DELETE FROM {DB_SCHEMA}.{table} WHERE season = ANY(:y);"), {"y": years})
+        con.execute(text(f"DELETE FROM {DB_SCHEMA}.load_state WHERE table_name = :t AND season = ANY(:y);"), {"t": table, "y": years})
 
 def delete_fact_and_lines_for_seasons(engine, years: list[int]):
-    with engine.begin() as con:
-        con.execute(text(f"DELETE FROM {DB_SCHEMA}.fact_player_timeslot WHERE season = ANY(:y);"), {"y": years})
-        con.execute(text(f"DELETE FROM {DB_SCHEMA}.dim_vegas_lines WHERE season = ANY(:y);"), {"y": years})
-        con.execute(text(f"DELETE FROM {DB_SCHEMA}.fact_player_prop_lines WHERE season = ANY(:y);"), {"y": years})
-
-def copy_from_dataframe(conn, df, table_name: str):
-    buf = StringIO()
-    df_to_copy = df.copy()
-    if "current_roster_only" in df_to_copy.columns:
-        df_to_copy["current_roster_only"] = df_to_copy["current_roster_only"].map({True: 't', False: 'f'})
-    df_to_copy.to_csv(buf, index=False, header=False, na_rep="\\N")
-    buf.seek(0)
+    for table in SEASON_TABLES:
+        delete_seasons(engine, table, years)
+
+class CsvCopyStream:
+    """Read-only file object that renders ``df`` as COPY CSV ``chunk_rows`` rows at a time.
+
+    Only one encoded chunk is alive at once, so COPY memory stays flat no
+    matter how large the frame is. ``bytes_read`` counts what was handed out.
+    """
+
+    def __init__(self, df, chunk_rows: int = COPY_CHUNK_ROWS):
+        self._df = df
+        self._chunk_rows = max(1, int(chunk_rows))
+        self._pos = 0
+        self._buf = b""
+        self._off = 0
+        self.bytes_read = 0
+
+    def _encode_next(self) -> bytes:
+        part = self._df.iloc[self._pos:self._pos + self._chunk_rows]
+        self._pos += self._chunk_rows
+        if "current_roster_only" in part.columns:
+            part = part.assign(current_roster_only=part["current_roster_only"].map({True: 't', False: 'f'}))
+        return part.to_csv(index=False, header=False, na_rep="\\N").encode("utf-8")
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            out = [self._buf[self._off:]] + [self._encode_next() for _ in range(self._pos, len(self._df), self._chunk_rows)]
+            data = b"".join(out)
+            self._buf, self._off = b"", 0
+        else:
+            while self._off >= len(self._buf) and self._pos < len(self._df):
+                self._buf, self._off = self._encode_next(), 0
+            data = self._buf[self._off:self._off + size]
+            self._off += len(data)
+        self.bytes_read += len(data)
+        return data
+
+def copy_from_dataframe(conn, df, table_name: str, chunk_rows: int = COPY_CHUNK_ROWS) -> int:
+    """Stream ``df`` into ``table_name`` with COPY; returns the number of CSV bytes sent."""
+    stream = CsvCopyStream(df, chunk_rows)
     raw = conn.connection  # psycopg2 connection
     cols_csv = ",".join(df.columns)
-    with raw.cursor() as cur:
-        cur.copy_expert(f"COPY {table_name} ({cols_csv}) FROM STDIN WITH (FORMAT CSV, NULL '\\N')", buf)
+    with raw.cursor() as cur, telemetry.timed("db"):
+        cur.copy_expert(f"COPY {table_name} ({cols_csv}) FROM STDIN WITH (FORMAT CSV, NULL '\\N', ENCODING 'UTF8')",
+                        stream, size=1 << 20)
+    telemetry.add(copy_bytes=stream.bytes_read)
+    return stream.bytes_read
+
+def shard_frame(df: pd.DataFrame, n: int, key_cols: list[str], whole_seasons: bool = False) -> list[pd.DataFrame]:
+    """Split ``df`` into at most ``n`` shards that never share a key.
+
+    Whole seasons are dealt out (largest first, to the lightest shard) when
+    there are at least ``n`` of them, or always with ``whole_seasons``;
+    otherwise rows are bucketed by a hash of ``key_cols``.
+    """
+    if n <= 1 or len(df) == 0:
+        return [df]
+    sizes = df['season'].value_counts() if 'season' in df.columns else pd.Series(dtype=int)
+    if whole_seasons:
+        n = min(n, max(1, len(sizes)))
+    if len(sizes) >= n:
+        load, bucket_of = [0] * n, {}
+        for season, size in sizes.items():
+            b = load.index(min(load))
+            bucket_of[season] = b
+            load[b] += size
+        bucket = df['season'].map(bucket_of).to_numpy()
+    else:
+        bucket = (pd.util.hash_pandas_object(df[key_cols], index=False).to_numpy() % n).astype(int)
+    return [df[bucket == b] for b in range(n) if (bucket == b).any()]
+
+def parallel_write(engine, df: pd.DataFrame, write, key_cols: list[str], label: str,
+                   workers: int | None = None, min_rows: int | None = None, whole_seasons: bool = False) -> list:
+    """Run ``write(engine, shard)`` for disjoint shards of ``df`` on separate pooled connections.
+
+    Each shard is its own transaction (COPY into its temp table + merge), so
+    the server works on up to ``workers`` merges at once. Frames too small
+    to split are written directly. ``whole_seasons`` keeps every season in
+    a single shard (needed when a shard deletes what it did not write).
+    Returns the per-shard results.
+    """
+    workers = DB_WRITERS if workers is None else workers
+    min_rows = DB_WRITER_MIN_ROWS if min_rows is None else min_rows
+    n = max(1, min(workers, len(df) // max(1, min_rows)))
+    if n == 1:
+        return [write(engine, df)]
+    shards = shard_frame(df, n, key_cols, whole_seasons)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        results = list(pool.map(telemetry.carry(lambda shard: write(engine, shard)), shards))
+    wall = time.perf_counter() - t0
+    logger.info(f"{label}: wrote {len(df):,} rows as {len(shards)} parallel shards in {wall:.2f}s "
+                f"({len(df) / wall:,.0f} rows/s)")
+    return results
+
+def merge_from_temp(con, table: str, tmp: str, cols: list[str], key_cols: list[str],
+                    delete_missing: bool = False) -> dict[str, int]:
+    """Row-hash diff merge of temp table ``tmp`` into ``table``.
+
+    New keys are inserted; existing keys are rewritten only when the md5 of
+    their non-key columns differs from the stored row_hash, so unchanged rows
+    produce no new tuple versions. With ``delete_missing``, rows of the
+    (season, week) partitions present in ``tmp`` whose key is absent from it
+    are deleted. Returns inserted/updated/unchanged/deleted counts.
+    """
+    vals = [c for c in cols if c not in key_cols]
+    row_hash = f"md5(ROW({', '.join('t.' + c for c in vals)})::text)::uuid"
+    same_key = " AND ".join(f"t.{k} = d.{k}" for k in key_cols)
+    # every part of the statement sees the pre-insert snapshot, so `known` counts keys that already existed
+    # (RETURNING xmax would say the same but is not available on partitioned tables)
+    known, written, total = con.execute(text(f"""
+        WITH known AS (
+            SELECT count(*) AS n FROM {tmp} t JOIN {DB_SCHEMA}.{table} d ON {same_key}
+        ), up AS (
+            INSERT INTO {DB_SCHEMA}.{table} AS d ({", ".join(cols)}, row_hash)
+            SELECT {", ".join("t." + c for c in cols)}, {row_hash} FROM {tmp} t
+            ON CONFLICT ({", ".join(key_cols)}) DO UPDATE SET
+                {", ".join(f"{c} = EXCLUDED.{c}" for c in vals)},
+                row_hash = EXCLUDED.row_hash, load_ts = now()
+            WHERE d.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+            RETURNING 1
+        )
+        SELECT (SELECT n FROM known), (SELECT count(*) FROM up), (SELECT count(*) FROM {tmp});
+    """)).one()
+    inserted = total - known
+    updated = written - inserted
+    deleted = 0
+    if delete_missing:
+        deleted = con.execute(text(f"""
+            DELETE FROM {DB_SCHEMA}.{table} d
+            USING (SELECT DISTINCT season, week FROM {tmp}) p
+            WHERE d.season = p.season AND d.week = p.week
+              AND NOT EXISTS (SELECT 1 FROM {tmp} t WHERE {same_key});
+        """)).rowcount
+    return {"inserted": inserted, "updated": updated, "unchanged": total - inserted - updated, "deleted": deleted}
+
+def log_merge(table: str, counts: list[dict[str, int]]) -> dict[str, int]:
+    """Sum per-shard merge counts and log them."""
+    total = {k: sum(c[k] for c in counts) for k in ("inserted", "updated", "unchanged", "deleted")}
+    logger.info(f"{table}: inserted {total['inserted']:,}, updated {total['updated']:,}, "
+                f"unchanged {total['unchanged']:,}, deleted {total['deleted']:,}")
+    return total
+
+def bulk_upsert(engine, df: pd.DataFrame, table: str, key_cols: list[str], update_cols: list[str]) -> int:
+    """COPY ``df`` into a temp copy of ``table`` and upsert it in one statement.
+
+    Existing keys are only rewritten when one of ``update_cols`` differs, so
+    unchanged rows produce no new tuple versions. Later duplicates of a key
+    win. Returns the number of rows inserted or changed.
+    """
+    if df.empty:
+        return 0
+    cols = key_cols + update_cols
+    df = df[cols].drop_duplicates(subset=key_cols, keep='last')
+    tmp = f"tmp_{table}"
+    with engine.begin() as con:
+        con.execute(text(f"CREATE TEMP TABLE {tmp} (LIKE {DB_SCHEMA}.{table} INCLUDING DEFAULTS) ON COMMIT DROP;"))
+        copy_from_dataframe(con, df, tmp)
+        return con.execute(text(f"""
+            WITH up AS (
+                INSERT INTO {DB_SCHEMA}.{table} AS d ({", ".join(cols)})
+                SELECT {", ".join(cols)} FROM {tmp}
+                ON CONFLICT ({", ".join(key_cols)}) DO UPDATE SET
+                    {", ".join(f"{c} = EXCLUDED.{c}" for c in update_cols)}
+                WHERE ({", ".join("d." + c for c in update_cols)})
+                      IS DISTINCT FROM ({", ".join("EXCLUDED." + c for c in update_cols)})
+                RETURNING 1
+            )
+            SELECT count(*) FROM up;
+        """)).scalar()
@@ -1,8 +1,8 @@
 import numpy as np
 import pandas as pd
 from sqlalchemy import text
-from config import YEARS, DB_SCHEMA
-from db import copy_from_dataframe
+from config import YEARS, DB_SCHEMA, UPSERT_MODE
+from db import copy_from_dataframe, parallel_write, merge_from_temp, log_merge, FACT_KEY
 from utils import coerce_numeric
 
 def build_fact_all(wk: pd.DataFrame) -> pd.DataFrame:
@@ -18,7 +18,7 @@ def build_fact_all(wk: pd.DataFrame) -> pd.DataFrame:
     if 'total_touchdowns' in wk.columns: maybe('total_touchdowns')
 
     agg = {c:'mean' for c in mean_cols}
-    g = wk.groupby(grp, as_index=False).agg(agg)
+    g = wk.groupby(grp, as_index=False, observed=True).agg(agg)
 
     rename = {
         'passing_yards':'passing_yards_avg','passing_tds':'passing_tds_avg','interceptions':'interceptions_avg',
@@ -50,7 +50,12 @@ def build_fact_all(wk: pd.DataFrame) -> pd.DataFrame:
             g[c] = np.nan
     return g[expected]
 
-def upsert_fact(engine, fact: pd.DataFrame):
+def upsert_fact(engine, fact: pd.DataFrame, delete_missing: bool = False):
+    """Write ``fact``: a row-hash merge (UPSERT_MODE=merge) or insert-new-keys-only.
+
+    ``delete_missing`` (merge only) also drops stored keys of the loaded
+    (season, week) partitions that ``fact`` no longer has.
+    """
     if fact.empty:
         return
     cols = list(fact.columns)
@@ -63,14 +68,25 @@ def upsert_fact(engine, fact: pd.DataFrame):
     coerce_numeric(fact, num_cols)
     fact["games_played"] = pd.to_numeric(fact["games_played"], errors="coerce").fillna(0).astype(int)
     fact["current_roster_only"] = fact["current_roster_only"].astype(bool)
+    if UPSERT_MODE != "merge":
+        parallel_write(engine, fact[cols], _write_fact, FACT_KEY, "fact_player_timeslot")
+        return
+    fact = fact.drop_duplicates(subset=FACT_KEY, keep='first')
+    counts = parallel_write(engine, fact[cols], lambda e, shard: _write_fact(e, shard, delete_missing),
+                            FACT_KEY, "fact_player_timeslot", whole_seasons=delete_missing)
+    log_merge("fact_player_timeslot", counts)
 
+def _write_fact(engine, fact: pd.DataFrame, delete_missing: bool = False):
+    cols = list(fact.columns)
     tmp = f"tmp_fact_player_timeslot"
     with engine.begin() as con:
         con.execute(text(f"CREATE TEMP TABLE {tmp} (LIKE {DB_SCHEMA}.fact_player_timeslot INCLUDING DEFAULTS) ON COMMIT DROP;"))
         copy_from_dataframe(con, fact[cols], tmp)
+        if UPSERT_MODE == "merge":
+            return merge_from_temp(con, "fact_player_timeslot", tmp, cols, FACT_KEY, delete_missing)
         con.execute(text(f"""
             INSERT INTO {DB_SCHEMA}.fact_player_timeslot ({",".join(cols)})
             SELECT {",".join(cols)} FROM {tmp}
-            ON CONFLICT (game_id, season, week, team_abbr, opponent_abbr, time_slot, player_id, position)
+            ON CONFLICT ({",".join(FACT_KEY)})
             DO NOTHING;
         """))
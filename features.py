@@ -0,0 +1,145 @@
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from config import DB_SCHEMA
+from db import copy_from_dataframe, FEATURE_STATS, FEATURE_KINDS
+from logutil import get_logger
+
+logger = get_logger()
+
+# Per player-week predictive features in feature_player_week. Every value for
+# a game is computed from the player's (or the opposing defense's) earlier
+# games only, so a row never sees the game it describes:
+#   l3 / l5      mean of the previous 3 / 5 games (career, across seasons)
+#   season_avg   season-to-date mean before this week
+#   ewm          exponentially weighted mean of all previous games
+#   opp_allowed  season-to-date mean the opponent allowed to this position
+# A load only changes rows from the earliest (season, week) partition it
+# rewrote on, so refresh deletes and rebuilds just that tail; history before
+# it is left alone.
+
+EWM_SPAN = 5
+KEYS = ['player_id', 'season', 'week']
+INFO = ['game_id', 'team_abbr', 'opponent_abbr', 'position']
+
+def features_from(parts: pd.DataFrame) -> tuple[int, int] | None:
+    """Earliest of the (season, week) partitions ``parts`` a load rewrote: where features start to change."""
+    if parts.empty:
+        return None
+    first = parts.sort_values(['season', 'week']).iloc[0]
+    return int(first['season']), int(first['week'])
+
+def _prior_mean_frame(values: pd.DataFrame, groups: list[pd.Series]) -> np.ndarray:
+    """Per column, the mean of the earlier rows of each group (rows sorted in time within groups)."""
+    ok = values.notna().astype(float)
+    x = values.fillna(0.0)
+    total = (x.groupby(groups, sort=False).cumsum() - x).to_numpy()
+    n = (ok.groupby(groups, sort=False).cumsum() - ok).to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, total / n, np.nan)
+
+def _last_k_mean(prev: np.ndarray, start: np.ndarray, k: int) -> np.ndarray:
+    """Mean of the last ``k`` rows of ``prev`` up to each row, not reaching back past its group's ``start`` row.
+
+    Windows are differences of one running sum, so every column and group
+    is handled in a single pass (groupby().rolling() loops per group).
+    """
+    ok = ~np.isnan(prev)
+    csum = np.vstack([np.zeros((1, prev.shape[1])), np.cumsum(np.where(ok, prev, 0.0), axis=0)])
+    ccnt = np.vstack([np.zeros((1, prev.shape[1])), np.cumsum(ok, axis=0)])
+    i = np.arange(len(prev))
+    lo = np.maximum(i + 1 - k, start)
+    n = ccnt[i + 1] - ccnt[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, (csum[i + 1] - csum[lo]) / n, np.nan)
+
+def _ewm_mean(prev: pd.DataFrame, pid: pd.Series, pos: np.ndarray) -> np.ndarray:
+    """``prev.groupby(pid).ewm(span=EWM_SPAN).mean()`` as two grouped cumsums.
+
+    With decay r the mean at position p is sum(r^(p-j) x_j) / sum(r^(p-j));
+    scaling by r^-p turns both sums into cumulative sums. r^-p stays finite
+    for any realistic career (r^-400 ~ 1e70 at span 5).
+    """
+    r = 1 - 2 / (EWM_SPAN + 1)
+    scale = (r ** -pos.astype(float))[:, None]
+    x = prev.to_numpy()
+    ok = ~np.isnan(x)
+    num = pd.DataFrame(np.where(ok, x, 0.0) * scale).groupby(pid.to_numpy(), sort=False).cumsum().to_numpy()
+    den = pd.DataFrame(ok * scale).groupby(pid.to_numpy(), sort=False).cumsum().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(den > 0, num / den, np.nan)
+
+def build_features(history: pd.DataFrame, allowed: pd.DataFrame, since: tuple[int, int]) -> pd.DataFrame:
+    """Feature rows from ``since`` on.
+
+    ``history`` holds every game (KEYS + INFO + FEATURE_STATS) of the players
+    to rebuild, back to their first; ``allowed`` the per-game stat totals
+    each defense gave up to each position (season, week, opponent_abbr,
+    position + FEATURE_STATS) for the seasons from ``since``.
+    """
+    h = history.sort_values(['player_id', 'season', 'week'], kind='stable').reset_index(drop=True)
+    pid = h['player_id']
+    out = h[KEYS + INFO].copy()
+    pos = h.groupby('player_id', sort=False).cumcount().to_numpy()
+    out['games_prior'] = pos
+    start = np.arange(len(h)) - pos
+
+    a = allowed.sort_values(['season', 'opponent_abbr', 'position', 'week'], kind='stable').reset_index(drop=True)
+    opp = a[['season', 'week', 'opponent_abbr', 'position']].copy()
+    opp[FEATURE_STATS] = _prior_mean_frame(a[FEATURE_STATS], [a['season'], a['opponent_abbr'], a['position']])
+    opp = h[['season', 'week', 'opponent_abbr', 'position']].merge(
+        opp, on=['season', 'week', 'opponent_abbr', 'position'], how='left')
+
+    prev = h[FEATURE_STATS].groupby(pid, sort=False).shift(1)
+    kinds = {
+        "l3": _last_k_mean(prev.to_numpy(), start, 3),
+        "l5": _last_k_mean(prev.to_numpy(), start, 5),
+        "season_avg": _prior_mean_frame(h[FEATURE_STATS], [pid, h['season']]),
+        "ewm": _ewm_mean(prev, pid, pos),
+        "opp_allowed": opp[FEATURE_STATS].to_numpy(),
+    }
+    feats = pd.DataFrame({f"{c}_{k}": kinds[k][:, j] for j, c in enumerate(FEATURE_STATS) for k in FEATURE_KINDS},
+                         index=out.index)
+    out = pd.concat([out, feats], axis=1)
+
+    s, w = since
+    keep = (out['season'] > s) | ((out['season'] == s) & (out['week'] >= w))
+    return out.loc[keep].reset_index(drop=True)
+
+def _frame(con, sql: str, params: dict, columns: list[str]) -> pd.DataFrame:
+    df = pd.DataFrame(con.execute(text(sql), params).fetchall(), columns=columns)
+    for c in FEATURE_STATS:
+        df[c] = df[c].astype(float)
+    return df
+
+def refresh_features(engine, since: tuple[int, int] | None) -> int:
+    """Rebuild feature_player_week from ``since`` on, in one transaction; returns rows written."""
+    if since is None:
+        return 0
+    t0 = time.perf_counter()
+    s, w = since
+    params = {"s": s, "w": w}
+    # a player's fact rows can split a game by slot/position; features are per player-week
+    stat_sums = ", ".join(f"sum({c}_avg * games_played)::float8" for c in FEATURE_STATS)
+    with engine.begin() as con:
+        history = _frame(con, f"""
+            SELECT player_id, season, week, min(game_id), min(team_abbr), min(opponent_abbr), min(position), {stat_sums}
+            FROM {DB_SCHEMA}.fact_player_timeslot
+            WHERE player_id IN (SELECT DISTINCT player_id FROM {DB_SCHEMA}.fact_player_timeslot
+                                WHERE (season, week) >= (:s, :w))
+            GROUP BY player_id, season, week;
+        """, params, KEYS + INFO + FEATURE_STATS)
+        allowed = _frame(con, f"""
+            SELECT season, week, opponent_abbr, position, {stat_sums}
+            FROM {DB_SCHEMA}.fact_player_timeslot
+            WHERE season >= :s
+            GROUP BY season, week, opponent_abbr, position;
+        """, params, ['season', 'week', 'opponent_abbr', 'position'] + FEATURE_STATS)
+        feats = build_features(history, allowed, since) if not history.empty else history.iloc[0:0]
+        con.execute(text(f"DELETE FROM {DB_SCHEMA}.feature_player_week WHERE (season, week) >= (:s, :w);"), params)
+        if not feats.empty:
+            copy_from_dataframe(con, feats, f"{DB_SCHEMA}.feature_player_week")
+    logger.info(f"Features: rebuilt {len(feats):,} player-weeks from {s} week {w} "
+                f"({len(history):,} games of history) in {time.perf_counter() - t0:.2f}s")
+    return len(feats)
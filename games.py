@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+MATCH_DAYS = 2  # how far a kickoff time may be from the scheduled game date
+
+class GameIndex:
+    """Schedule lookups built once per run and shared by weekly, lines and props.
+
+    - ``nearest(home, away, when)``: O(1) matchup lookup, then a binary search
+      over that matchup's sorted kickoff dates.
+    - ``team_games`` / ``matchups``: the same keys as frames, for vectorized merges.
+    """
+
+    def __init__(self, schedule: pd.DataFrame):
+        sched = schedule[['season','week','home_team','away_team','game_date','game_id']].reset_index(drop=True)
+        self.schedule = sched
+        self.matchups = sched[['season','week','home_team','away_team','game_id']].drop_duplicates()
+
+        keep = ['season','week','game_date','game_id']
+        self.team_games = pd.concat([
+            sched[keep + ['home_team']].rename(columns={'home_team':'team'}),
+            sched[keep + ['away_team']].rename(columns={'away_team':'team'}),
+        ], ignore_index=True)[['season','week','team','game_date','game_id']]
+
+        dates = pd.to_datetime(sched['game_date'], errors='coerce', utc=True)
+        ns = dates.to_numpy(dtype='datetime64[ns]').astype('int64')
+        self._by_matchup: dict[tuple[str, str], tuple[np.ndarray, np.ndarray, int]] = {}
+        for key, rows in sched.groupby(['home_team','away_team'], sort=False).indices.items():
+            dated = rows[dates.iloc[rows].notna().to_numpy()]
+            order = dated[np.argsort(ns[dated], kind='stable')]
+            self._by_matchup[key] = (ns[order], order, int(rows[0]))
+
+    def _row(self, i: int) -> tuple[int, int, str]:
+        r = self.schedule.iloc[i]
+        return int(r['season']), int(r['week']), r['game_id']
+
+    def nearest(self, home: str, away: str, when=None, max_days: float = MATCH_DAYS) -> tuple[int, int, str] | None:
+        """``(season, week, game_id)`` of the home-vs-away game closest to ``when``.
+
+        None when that game is more than ``max_days`` away (another season,
+        or a game not on the schedule yet). Without a usable ``when`` the
+        matchup's first scheduled game is returned.
+        """
+        entry = self._by_matchup.get((home, away))
+        if entry is None:
+            return None
+        dates, rows, first = entry
+        when = pd.to_datetime(when, errors='coerce', utc=True)
+        if pd.isna(when) or not len(dates):
+            return self._row(first)
+        t = when.value
+        i = int(np.searchsorted(dates, t))
+        best = min((j for j in (i - 1, i) if 0 <= j < len(dates)), key=lambda j: abs(dates[j] - t))
+        if abs(dates[best] - t) > max_days * 86_400 * 10**9:
+            return None
+        return self._row(int(rows[best]))
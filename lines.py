@@ -2,8 +2,9 @@ import pandas as pd
 import numpy as np
 import nfl_data_py as nfl
 from sqlalchemy import text
-from config import DB_SCHEMA, LINES_BOOK_FILTER
+from config import DB_SCHEMA, LINES_BOOK_FILTER, UPSERT_MODE
 from utils import coerce_numeric
+from games import GameIndex
 
 def _normalize_book_name(s: str) -> str:
     if not isinstance(s, str): return ""
@@ -19,7 +20,7 @@ def _normalize_book_name(s: str) -> str:
     if "fanatic" in low:                 return "Fanatics"
     return b
 
-def load_vegas_lines(years: list[int], schedule: pd.DataFrame) -> pd.DataFrame:
+def load_vegas_lines(years: list[int], games: GameIndex) -> pd.DataFrame:
     lines = pd.DataFrame()
     try:
         if hasattr(nfl, "import_betting_lines"):
@@ -70,8 +71,7 @@ def load_vegas_lines(years: list[int], schedule: pd.DataFrame) -> pd.DataFrame:
         maybe_set(col, name)
 
     # join game_id
-    sched = schedule[['season','week','home_team','away_team','game_id']].drop_duplicates()
-    out = out.merge(sched, on=['season','week','home_team','away_team'], how='left')
+    out = out.merge(games.matchups, on=['season','week','home_team','away_team'], how='left')
 
     out['book'] = out['book'].astype(str).str.strip().map(_normalize_book_name)
     if LINES_BOOK_FILTER:
@@ -96,17 +96,30 @@ def load_vegas_lines(years: list[int], schedule: pd.DataFrame) -> pd.DataFrame:
             out[c] = pd.NA
     return out[cols]
 
-def upsert_lines(engine, df: pd.DataFrame):
+def upsert_lines(engine, df: pd.DataFrame, delete_missing: bool = False):
+    """Same modes as facts.upsert_fact, keyed on LINES_KEY."""
     if df.empty:
         return
+    from db import parallel_write, log_merge, LINES_KEY
+    if UPSERT_MODE != "merge":
+        parallel_write(engine, df, _write_lines, LINES_KEY, "dim_vegas_lines")
+        return
+    df = df.drop_duplicates(subset=LINES_KEY, keep='first')
+    counts = parallel_write(engine, df, lambda e, shard: _write_lines(e, shard, delete_missing),
+                            LINES_KEY, "dim_vegas_lines", whole_seasons=delete_missing)
+    log_merge("dim_vegas_lines", counts)
+
+def _write_lines(engine, df: pd.DataFrame, delete_missing: bool = False):
     cols = list(df.columns)
     tmp = "tmp_lines"
-    from db import copy_from_dataframe
+    from db import copy_from_dataframe, merge_from_temp, LINES_KEY
     with engine.begin() as con:
         con.execute(text(f"CREATE TEMP TABLE {tmp} (LIKE {DB_SCHEMA}.dim_vegas_lines INCLUDING DEFAULTS) ON COMMIT DROP;"))
         copy_from_dataframe(con, df[cols], tmp)
+        if UPSERT_MODE == "merge":
+            return merge_from_temp(con, "dim_vegas_lines", tmp, cols, LINES_KEY, delete_missing)
         con.execute(text(f"""
             INSERT INTO {DB_SCHEMA}.dim_vegas_lines ({",".join(cols)})
             SELECT {",".join(cols)} FROM {tmp}
-            ON CONFLICT (game_id, book, line_timestamp) DO NOTHING;
+            ON CONFLICT ({",".join(LINES_KEY)}) DO NOTHING;
         """))
@@ -0,0 +1,96 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from config import DB_SCHEMA
+
+# Content fingerprints per (table, season, week) partition, stored in load_state.
+# A partition is deleted and reloaded only when its fingerprint changed, so
+# untouched historical weeks are never rewritten.
+
+PART_COLS = ['season','week']
+
+def partition_hashes(df: pd.DataFrame) -> pd.DataFrame:
+    """Order-independent SHA-1 of every (season, week) partition of ``df``."""
+    if df.empty:
+        return pd.DataFrame(columns=PART_COLS + ['content_hash','row_count'])
+    h = pd.DataFrame({
+        'season': df['season'].astype('int64').to_numpy(),
+        'week': df['week'].astype('int64').to_numpy(),
+        'h': pd.util.hash_pandas_object(df, index=False).to_numpy(),
+    }).sort_values(PART_COLS + ['h'])
+    out = (h.groupby(PART_COLS, sort=True)['h']
+             .agg(content_hash=lambda s: hashlib.sha1(s.to_numpy().tobytes()).hexdigest(), row_count='size')
+             .reset_index())
+    return out
+
+def in_partitions(df: pd.DataFrame, parts: pd.DataFrame) -> np.ndarray:
+    """Mask of the rows of ``df`` that fall in the (season, week) partitions ``parts``."""
+    keys = pd.MultiIndex.from_frame(parts[PART_COLS].astype('int64'))
+    return pd.MultiIndex.from_frame(df[PART_COLS].astype('int64')).isin(keys)
+
+def changed_partitions(engine, table: str, hashes: pd.DataFrame) -> pd.DataFrame:
+    if hashes.empty:
+        return hashes
+    with engine.begin() as con:
+        stored = con.execute(text(f"""
+            SELECT season, week, content_hash FROM {DB_SCHEMA}.load_state
+            WHERE table_name = :t AND season = ANY(:y)
+        """), {"t": table, "y": sorted(int(s) for s in hashes['season'].unique())}).fetchall()
+    known = {(int(s), int(w)): ch for s, w, ch in stored}
+    same = np.array([known.get((s, w)) == ch for s, w, ch in
+                     zip(hashes['season'], hashes['week'], hashes['content_hash'])], dtype=bool)
+    return hashes[~same]
+
+def delete_partitions(con, table: str, parts: pd.DataFrame) -> None:
+    params = {"t": table, "s": [int(x) for x in parts['season']], "w": [int(x) for x in parts['week']]}
+    con.execute(text(f"""
+        DELETE FROM {DB_SCHEMA}.{table} t
+        USING unnest(CAST(:s AS int[]), CAST(:w AS int[])) AS p(season, week)
+        WHERE t.season = p.season AND t.week = p.week;
+    """), params)
+    con.execute(text(f"""
+        DELETE FROM {DB_SCHEMA}.load_state l
+        USING unnest(CAST(:s AS int[]), CAST(:w AS int[])) AS p(season, week)
+        WHERE l.table_name = :t AND l.season = p.season AND l.week = p.week;
+    """), params)
+
+def save_partitions(con, table: str, parts: pd.DataFrame) -> None:
+    rows = [{"t": table, "s": int(s), "w": int(w), "h": ch, "n": int(n)}
+            for s, w, ch, n in zip(parts['season'], parts['week'], parts['content_hash'], parts['row_count'])]
+    sql = f"""
+        INSERT INTO {DB_SCHEMA}.load_state (table_name, season, week, content_hash, row_count)
+        VALUES (:t, :s, :w, :h, :n)
+        ON CONFLICT (table_name, season, week) DO UPDATE SET
+            content_hash = EXCLUDED.content_hash,
+            row_count = EXCLUDED.row_count,
+            load_ts = now();
+    """
+    for i in range(0, len(rows), 1000):
+        con.execute(text(sql), rows[i:i+1000])
+
+def load_changed_partitions(engine, table: str, df: pd.DataFrame, upsert, delete: bool = True,
+                            before=None) -> tuple[pd.DataFrame, int]:
+    """Reload only the partitions of ``df`` whose fingerprint differs from load_state.
+
+    Returns the reloaded partitions (season, week, content_hash, row_count)
+    and the number skipped. ``before(changed)`` is called ahead of the
+    reload, while the old rows are still stored. The stored fingerprint is
+    dropped together with the old rows and written back only after ``upsert``
+    succeeds, so a failed load is retried on the next run. With
+    ``delete=False`` the old rows stay and ``upsert`` is expected to merge
+    (the stale fingerprint still differs, so a failed merge is retried too).
+    """
+    hashes = partition_hashes(df)
+    changed = changed_partitions(engine, table, hashes)
+    if not changed.empty:
+        if before is not None:
+            before(changed)
+        mask = in_partitions(df, changed)
+        if delete:
+            with engine.begin() as con:
+                delete_partitions(con, table, changed)
+        upsert(engine, df[mask])
+        with engine.begin() as con:
+            save_partitions(con, table, changed)
+    return changed, len(hashes) - len(changed)
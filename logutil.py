@@ -27,3 +27,19 @@ def get_logger(name: str = "NFLLoader") -> logging.Logger:
     logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
     logging.getLogger("sqlalchemy.pool").setLevel(logging.WARNING)
     return logger
+
+def get_telemetry_logger() -> logging.Logger:
+    """One JSON object per line in logs/telemetry.jsonl, kept out of the main log."""
+    log_dir = Path(__file__).resolve().parent / "logs"
+    log_dir.mkdir(exist_ok=True)
+
+    logger = logging.getLogger("NFLLoader.telemetry")
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    fh = RotatingFileHandler(log_dir / "telemetry.jsonl", maxBytes=5*1024*1024, backupCount=5)
+    fh.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(fh)
+    return logger
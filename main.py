@@ -1,116 +1,255 @@
-import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import pandas as pd
-import numpy as np
-import nfl_data_py as nfl
 from logutil import get_logger
-from config import YEARS, CURRENT_ROSTER_ONLY, REPLACE_MODE, DAILY_MODE, RECENT_WEEKS
-from config import DB_SCHEMA
-from db import get_engine, ensure_schema, create_tables, ensure_fact_schema_up_to_date, add_indexes, delete_fact_and_lines_for_seasons, ensure_props_schema_up_to_date
+from config import YEARS, CURRENT_ROSTER_ONLY, REPLACE_MODE, INCREMENTAL_LOAD, DAILY_MODE, RECENT_WEEKS, PIPELINE_WORKERS, PROFILE_STAGES, STREAM_SEASONS, UPSERT_MODE
+from db import get_engine, migrate, delete_seasons, bulk_upsert, ensure_season_partitions, FACT_KEY
 from teams import load_reference, upsert_dim_team, upsert_dim_timeslot
-from weekly import load_weekly_with_timeslot, build_player_id_resolver, filter_to_current_roster
+from weekly import load_weekly_with_timeslot, iter_weekly_seasons, build_player_id_resolver, resolve_player_ids, filter_to_current_roster
 from facts import build_fact_all, upsert_fact
 from lines import load_vegas_lines, upsert_lines
 from props import fetch_player_props_from_theodds, upsert_player_props
-from backfill import backfill_legacy_ids
-from utils import mk_game_id
-from sqlalchemy import text
+from backfill import backfill_legacy_ids, legacy_seasons
+from rollups import touched_players, stored_players, refresh_rollups
+from features import features_from, refresh_features
+from pricing import refresh_prop_pricing
+from loadstate import load_changed_partitions
+from context import RunContext
+from pipeline import Stage, select_stages, run_stages
+import telemetry
 
 logger = get_logger()
 
-def _fill_player_id_with_resolver(row, resolver: dict[str,str]):
-    pid = row.get('player_id')
-    if pd.notna(pid) and str(pid).strip() not in ("", "None", "nan"):
-        return str(pid)
-    name = str(row.get('player_name','')).lower().strip()
-    team = str(row.get('team','') or row.get('team_abbr',''))
-    pos  = str(row.get('position','') or '')
-    k = f"{name}|{team}|{pos}"
-    if resolver and k in resolver and pd.notna(resolver[k]):
-        return str(resolver[k])
-    basis = f"{row.get('player_name','unknown')}|{row.get('season')}|{row.get('week')}|{team}|{row.get('opponent')}"
-    return "legacy_" + hashlib.sha1(basis.encode("utf-8")).hexdigest()[:16]
-
-def main():
-    logger.info(f"Loading seasons {min(YEARS)}-{max(YEARS)} | roster filter={CURRENT_ROSTER_ONLY} | replace={REPLACE_MODE} | daily={DAILY_MODE} (last {RECENT_WEEKS} weeks)")
-
-    engine = get_engine()
-    ensure_schema(engine)
-    create_tables(engine)
-    ensure_fact_schema_up_to_date(engine)
-    ensure_props_schema_up_to_date(engine)
-    upsert_dim_timeslot(engine)
-
-    teams_all, dim_team = load_reference()
-    upsert_dim_team(engine, dim_team)
-
-    weekly = load_weekly_with_timeslot(YEARS)
-
-    if DAILY_MODE and not weekly.empty:
-        max_season = weekly['season'].max()
-        wks = weekly.loc[weekly['season'].eq(max_season), 'week']
-        if not wks.empty:
-            cutoff = max(int(wks.max()) - RECENT_WEEKS + 1, int(wks.min()))
-            weekly = weekly.query("season == @max_season and week >= @cutoff").copy()
-
-    logger.info(f"Weekly data after time slot join: {weekly.shape}")
-
-    resolver = build_player_id_resolver(YEARS)
-    weekly['player_id'] = weekly.apply(lambda r: _fill_player_id_with_resolver(r, resolver), axis=1).astype(str)
-
-    weekly, dim_player = filter_to_current_roster(weekly)
+def _load_table(engine, table: str, df: pd.DataFrame, upsert, years: list[int] = YEARS, before=None) -> pd.DataFrame:
+    """Load ``df`` into ``table``; returns the (season, week) partitions that were rewritten.
+
+    ``before(parts)`` is called ahead of an incremental reload with the
+    partitions about to change (see load_changed_partitions).
+    """
+    if df.empty:
+        # nothing fetched (e.g. no lines upstream): leave the stored rows alone
+        logger.info(f"{table}: nothing to load")
+        return pd.DataFrame({'season': pd.Series(dtype='int64'), 'week': pd.Series(dtype='int64')})
+    parts = df[['season', 'week']].drop_duplicates().astype('int64')
+    if UPSERT_MODE == "merge":
+        # the merge updates changed rows in place; replacing means dropping keys that vanished
+        upsert = partial(upsert, delete_missing=REPLACE_MODE)
+    if REPLACE_MODE and INCREMENTAL_LOAD:
+        reloaded, skipped = load_changed_partitions(engine, table, df, upsert, delete=UPSERT_MODE != "merge", before=before)
+        logger.info(f"{table}: reloaded {len(reloaded)} changed (season, week) partitions, skipped {skipped} unchanged")
+        return reloaded[['season', 'week']]
+    if REPLACE_MODE and UPSERT_MODE != "merge":
+        delete_seasons(engine, table, years)
+        logger.info(f"Cleared {table} for seasons {min(years)}-{max(years)}")
+    upsert(engine, df)
+    return parts
+
+def _players_and_rows(weekly: pd.DataFrame, ctx: RunContext) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Resolve player ids and apply the roster filter; returns (weekly, dim_player)."""
+    weekly['player_id'] = resolve_player_ids(weekly, build_player_id_resolver(YEARS, ctx))
+    weekly, dim_player = filter_to_current_roster(weekly, ctx)
     logger.info(f"Weekly data after roster filter: {weekly.shape} (CURRENT_ROSTER_ONLY={CURRENT_ROSTER_ONLY})")
+    return weekly, dim_player
 
-    # upsert dim_player
-    if not dim_player.empty:
-        with engine.begin() as con:
-            rows = dim_player.to_dict(orient='records')
-            sql = f"""
-                INSERT INTO {DB_SCHEMA}.dim_player (player_id, player_name, primary_position, last_team)
-                VALUES (:player_id, :player_name, :primary_position, :last_team)
-                ON CONFLICT (player_id) DO UPDATE SET
-                    player_name = EXCLUDED.player_name,
-                    primary_position = EXCLUDED.primary_position,
-                    last_team = EXCLUDED.last_team;
-            """
-            for i in range(0, len(rows), 1000):
-                con.execute(text(sql), rows[i:i+1000])
-
+def _fact_rows(weekly: pd.DataFrame) -> pd.DataFrame:
     fact = build_fact_all(weekly)
     fact['current_roster_only'] = CURRENT_ROSTER_ONLY
     logger.info(f"Fact (pre-clean) shape: {fact.shape}")
 
-    pk_cols = ['game_id','season','week','team_abbr','opponent_abbr','time_slot','player_id','position']
     before = len(fact)
-    fact = fact.drop_duplicates(subset=pk_cols, keep='last')
-    after = len(fact)
-    logger.info(f"Deduped fact rows on PK: {before:,} -> {after:,}")
+    fact = fact.drop_duplicates(subset=FACT_KEY, keep='last')
+    logger.info(f"Deduped fact rows on PK: {before:,} -> {len(fact):,}")
     logger.info(f"Rows with NULL player_id (should be 0): {fact['player_id'].isna().sum()}")
-
-    schedule = nfl.import_schedules(YEARS)
-    schedule['game_date'] = schedule['gameday'] if 'gameday' in schedule.columns else schedule.get('game_date')
-    schedule['game_date'] = pd.to_datetime(schedule['game_date'], errors='coerce', utc=True)
-    schedule['game_id'] = schedule.apply(lambda r: mk_game_id(r['season'], r['week'], r['home_team'], r['away_team']), axis=1)
-
-    lines = load_vegas_lines(YEARS, schedule)
-    logger.info(f"Lines shape: {lines.shape if isinstance(lines, pd.DataFrame) else (0,0)}")
-
-    if REPLACE_MODE:
-        delete_fact_and_lines_for_seasons(engine, YEARS)
-        logger.info(f"Cleared facts & lines for seasons {min(YEARS)}-{max(YEARS)}")
-
-    upsert_fact(engine, fact)
-    upsert_lines(engine, lines)
-    add_indexes(engine)
-
-    backfill_legacy_ids(engine, YEARS)
-
-    props_df = fetch_player_props_from_theodds(YEARS, schedule)
-    logger.info(f"Props shape: {props_df.shape}")
-    upsert_player_props(engine, props_df)
-
-    logger.info(f"Inserted {len(fact):,} fact rows across {fact['season'].nunique()} seasons, {fact['team_abbr'].nunique()} teams.")
-    logger.info(f"Inserted/updated {0 if lines is None or lines.empty else len(lines)} vegas line rows.")
-    logger.info("Load complete.")
+    return fact
+
+def _upsert_players(engine, dim_player: pd.DataFrame) -> int:
+    written = bulk_upsert(engine, dim_player, "dim_player", ["player_id"],
+                          ["player_name", "primary_position", "last_team"])
+    logger.info(f"dim_player: {written:,} of {len(dim_player):,} players new or changed")
+    return len(dim_player)
+
+def build_stages(engine, ctx: RunContext, stream: bool = False) -> list[Stage]:
+    def schema():
+        migrate(engine)
+        ensure_season_partitions(engine, YEARS)
+        return {"schema": True}
+
+    def dims(schema):
+        upsert_dim_timeslot(engine)
+        teams_all, dim_team = load_reference(ctx)
+        upsert_dim_team(engine, dim_team)
+
+    def weekly():
+        weekly = load_weekly_with_timeslot(YEARS, ctx)
+        telemetry.add(rows_in=len(weekly))
+
+        if DAILY_MODE and not weekly.empty:
+            max_season = weekly['season'].max()
+            wks = weekly.loc[weekly['season'].eq(max_season), 'week']
+            if not wks.empty:
+                cutoff = max(int(wks.max()) - RECENT_WEEKS + 1, int(wks.min()))
+                weekly = weekly.query("season == @max_season and week >= @cutoff").copy()
+
+        logger.info(f"Weekly data after time slot join: {weekly.shape}")
+
+        weekly, dim_player = _players_and_rows(weekly, ctx)
+        return {"weekly": weekly, "dim_player": dim_player}
+
+    def players(schema, dim_player):
+        n = _upsert_players(engine, dim_player)
+        telemetry.add(rows_out=n)
+        return {"players_loaded": n}
+
+    def facts(weekly):
+        return {"fact": _fact_rows(weekly)}
+
+    def fact_load(schema, fact):
+        stored = []
+        parts = _load_table(engine, "fact_player_timeslot", fact, upsert_fact,
+                            before=lambda changed: stored.append(stored_players(engine, changed)))
+        telemetry.add(rows_out=len(fact))
+        logger.info(f"Inserted {len(fact):,} fact rows across {fact['season'].nunique()} seasons, {fact['team_abbr'].nunique()} teams.")
+        return {"fact_loaded": len(fact), "legacy_seasons": legacy_seasons(fact, parts), "touched_players": touched_players(fact, parts, stored),
+                "features_from": features_from(parts)}
+
+    def season_stream(schema):
+        # fetch season N+1 (iter_weekly_seasons) || transform season N (here) || load season N-1 (writer)
+        def load(season, fact, dim_player):
+            _upsert_players(engine, dim_player)
+            stored = []
+            parts = _load_table(engine, "fact_player_timeslot", fact, upsert_fact, [season],
+                                before=lambda changed: stored.append(stored_players(engine, changed)))
+            logger.info(f"Season {season}: {len(fact):,} fact rows loaded")
+            telemetry.add(rows_out=len(fact))
+            return len(fact), len(dim_player), legacy_seasons(fact, parts), touched_players(fact, parts, stored), features_from(parts)
+
+        loaded = players = 0
+        legacy, touched, since = [], [], None
+        def collect(result):
+            nonlocal loaded, players, since
+            n_fact, n_players, seasons, t, first = result
+            loaded, players = loaded + n_fact, players + n_players
+            legacy.extend(seasons)
+            touched.append(t)
+            since = min(filter(None, [since, first]), default=None)
+
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            for season, weekly in iter_weekly_seasons(YEARS, ctx):
+                telemetry.add(rows_in=len(weekly))
+                weekly, dim_player = _players_and_rows(weekly, ctx)
+                fact = _fact_rows(weekly)
+                del weekly
+                if pending is not None:
+                    collect(pending.result())
+                pending = writer.submit(telemetry.carry(load), season, fact, dim_player)
+            if pending is not None:
+                collect(pending.result())
+        touched = pd.concat(touched, ignore_index=True) if touched else pd.DataFrame(columns=["player_id", "season"])
+        return {"fact_loaded": loaded, "players_loaded": players, "legacy_seasons": legacy, "touched_players": touched,
+                "features_from": since}
+
+    def lines(schema):
+        lines = load_vegas_lines(YEARS, ctx.games)
+        logger.info(f"Lines shape: {lines.shape}")
+        _load_table(engine, "dim_vegas_lines", lines, upsert_lines)
+        telemetry.add(rows_in=len(lines), rows_out=len(lines))
+        logger.info(f"Inserted/updated {len(lines)} vegas line rows.")
+        return {"lines_loaded": len(lines)}
+
+    def backfill(legacy_seasons, players_loaded):
+        if not legacy_seasons:
+            logger.info("Backfill: no legacy player ids in this load, skipping")
+            return {"rekeyed_players": pd.DataFrame(columns=["player_id", "season"])}
+        updated, rekeyed = backfill_legacy_ids(engine, legacy_seasons, ctx)
+        telemetry.add(rows_out=updated)
+        return {"rekeyed_players": rekeyed}
+
+    def rollups(touched_players, rekeyed_players):
+        touched = pd.concat([touched_players, rekeyed_players], ignore_index=True)
+        telemetry.add(rows_out=refresh_rollups(engine, touched))
+
+    def features(features_from, rekeyed_players):
+        since = features_from
+        if not rekeyed_players.empty:
+            # re-keyed legacy rows move to other player ids from the start of their season
+            since = min(filter(None, [since, (int(rekeyed_players['season'].min()), 0)]))
+        telemetry.add(rows_out=refresh_features(engine, since))
+
+    def props(schema):
+        props_df = fetch_player_props_from_theodds(YEARS, ctx.games, ctx)
+        logger.info(f"Props shape: {props_df.shape}")
+        if REPLACE_MODE and not INCREMENTAL_LOAD:
+            delete_seasons(engine, "fact_player_prop_lines", YEARS)
+        inserted = upsert_player_props(engine, props_df)
+        telemetry.add(rows_in=len(props_df), rows_out=inserted)
+        logger.info(f"Props: stored {inserted:,} changed lines, skipped {len(props_df) - inserted:,} unchanged")
+        return {"props_batch": props_df}
+
+    def pricing(props_batch):
+        # projections come from whatever facts are stored, so pricing a props poll never reloads facts
+        telemetry.add(rows_out=refresh_prop_pricing(engine, props_batch, ctx.rosters))
+
+    if stream:
+        fact_stages = [
+            Stage("season_stream", season_stream, ("schema",),             ("fact_loaded", "players_loaded", "legacy_seasons", "touched_players", "features_from")),
+        ]
+    else:
+        fact_stages = [
+            Stage("weekly",    weekly,    (),                              ("weekly", "dim_player")),
+            Stage("players",   players,   ("schema", "dim_player"),        ("players_loaded",)),
+            Stage("facts",     facts,     ("weekly",),                     ("fact",)),
+            Stage("fact_load", fact_load, ("schema", "fact"),              ("fact_loaded", "legacy_seasons", "touched_players", "features_from")),
+        ]
+    return [
+        Stage("schema",    schema,    (),                                  ("schema",)),
+        Stage("dims",      dims,      ("schema",)),
+        *fact_stages,
+        Stage("lines",     lines,     ("schema",),                         ("lines_loaded",)),
+        Stage("backfill",  backfill,  ("legacy_seasons", "players_loaded"),  ("rekeyed_players",)),
+        Stage("rollups",   rollups,   ("touched_players", "rekeyed_players")),
+        Stage("features",  features,  ("features_from", "rekeyed_players")),
+        Stage("props",     props,     ("schema",),                         ("props_batch",)),
+        Stage("pricing",   pricing,   ("props_batch",)),
+    ]
+
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="Load NFL stats, lines and props into Postgres.")
+    ap.add_argument("--stages", help="comma-separated stages to run (their dependencies are added); default: all")
+    ap.add_argument("--workers", type=int, default=PIPELINE_WORKERS, help="stages allowed to run at the same time")
+    ap.add_argument("--stream", action=argparse.BooleanOptionalAction, default=STREAM_SEASONS,
+                    help="load facts one season at a time (bounded memory, seasons visible as they commit)")
+    ap.add_argument("--list", action="store_true", help="print the stages and their dependencies, then exit")
+    args = ap.parse_args(argv)
+    if args.stream and DAILY_MODE:
+        logger.info("DAILY_MODE already loads only recent weeks; ignoring --stream")
+        args.stream = False
+
+    ctx = RunContext(YEARS)
+    engine = None if args.list else get_engine()
+    stages = build_stages(engine, ctx, stream=args.stream)
+    if args.list:
+        for s in stages:
+            print(f"{s.name:<13} needs: {', '.join(s.inputs) or '-'}")
+        return
+
+    wanted = [s.strip() for s in args.stages.split(",") if s.strip()] if args.stages else None
+    stages = select_stages(stages, wanted)
+    logger.info(f"Loading seasons {min(YEARS)}-{max(YEARS)} | roster filter={CURRENT_ROSTER_ONLY} | replace={REPLACE_MODE} (incremental={INCREMENTAL_LOAD}) | daily={DAILY_MODE} (last {RECENT_WEEKS} weeks) | stream={args.stream}")
+    workers = args.workers
+    if PROFILE_STAGES and workers > 1:
+        logger.info("PROFILE_STAGES is on: running stages one at a time (cProfile allows one active profiler)")
+        workers = 1
+    logger.info(f"Stages: {', '.join(s.name for s in stages)} | workers={workers}")
+
+    run = telemetry.Run()
+    telemetry.instrument(engine)
+    try:
+        run_stages(stages, workers=workers, telemetry=run)
+    finally:
+        run.save(engine)
+    logger.info(f"Load complete (run {run.run_id}).")
 
 if __name__ == "__main__":
     main()
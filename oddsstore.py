@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+import datetime as dt
+from pathlib import Path
+from config import ODDS_STORE_MODE, ODDS_STORE_DIR, ODDS_STORE_TTL_MIN, ODDS_REPLAY_AT
+
+# Raw TheOdds JSON payloads on disk, one file per call:
+#   <dir>/<endpoint>/<event_id>/<markets>/<UTC timestamp>.json
+# ODDS_STORE_MODE:
+#   off    - always call the API, store nothing (default)
+#   record - call the API and keep every payload
+#   replay - never call the API; serve the latest stored payload (or the
+#            latest at/before ODDS_REPLAY_AT), fail if none exists
+#   ttl    - serve a stored payload younger than ODDS_STORE_TTL_MIN minutes,
+#            otherwise call the API and store the result
+
+_TS_FMT = "%Y%m%dT%H%M%S%fZ"
+
+def _root() -> Path:
+    return Path(ODDS_STORE_DIR) if ODDS_STORE_DIR else Path(__file__).resolve().parent / "cache" / "theodds"
+
+def _dir(endpoint: str, event_id: str | None, markets: list[str] | None) -> Path:
+    return _root() / endpoint / (event_id or "_") / ("+".join(sorted(markets)) if markets else "_")
+
+def _stamp(path: Path) -> dt.datetime:
+    return dt.datetime.strptime(path.stem, _TS_FMT).replace(tzinfo=dt.timezone.utc)
+
+def _latest(d: Path, at: dt.datetime | None = None) -> Path | None:
+    if not d.is_dir():
+        return None
+    snaps = sorted(d.glob("*.json"))  # timestamp names sort chronologically
+    if at is not None:
+        snaps = [p for p in snaps if _stamp(p) <= at]
+    return snaps[-1] if snaps else None
+
+def _save(d: Path, payload, now: dt.datetime) -> None:
+    d.mkdir(parents=True, exist_ok=True)
+    path = d / f"{now.strftime(_TS_FMT)}.json"
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(payload))
+    os.replace(tmp, path)
+
+def _replay_at() -> dt.datetime | None:
+    if not ODDS_REPLAY_AT:
+        return None
+    at = dt.datetime.fromisoformat(ODDS_REPLAY_AT.replace("Z", "+00:00"))
+    return at if at.tzinfo else at.replace(tzinfo=dt.timezone.utc)
+
+def fetch(endpoint: str, live, event_id: str | None = None, markets: list[str] | None = None):
+    """Return the payload for one TheOdds call, going to ``live()`` only when the mode requires it."""
+    if ODDS_STORE_MODE == "off":
+        return live()
+    d = _dir(endpoint, event_id, markets)
+    now = dt.datetime.now(dt.timezone.utc)
+    if ODDS_STORE_MODE == "replay":
+        snap = _latest(d, _replay_at())
+        if snap is None:
+            raise FileNotFoundError(f"no stored TheOdds payload for {endpoint}/{event_id or '_'} (ODDS_STORE_MODE=replay)")
+        return json.loads(snap.read_text())
+    if ODDS_STORE_MODE == "ttl":
+        snap = _latest(d)
+        if snap is not None and now - _stamp(snap) < dt.timedelta(minutes=ODDS_STORE_TTL_MIN):
+            return json.loads(snap.read_text())
+    payload = live()
+    _save(d, payload, now)
+    return payload
@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable
+import time
+from logutil import get_logger
+from telemetry import Run, rows
+
+logger = get_logger()
+
+@dataclass(frozen=True)
+class Stage:
+    """A named pipeline step.
+
+    ``fn`` is called with one keyword argument per name in ``inputs`` and must
+    return a dict with a value for every name in ``outputs`` (or None when
+    it declares no outputs).
+    """
+    name: str
+    fn: Callable[..., dict | None]
+    inputs: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+
+def select_stages(stages: list[Stage], wanted: list[str] | None) -> list[Stage]:
+    """``wanted`` plus every stage they transitively depend on, in declaration order."""
+    if not wanted:
+        return list(stages)
+    by_name = {s.name: s for s in stages}
+    unknown = [w for w in wanted if w not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(by_name)}")
+    producer = {o: s for s in stages for o in s.outputs}
+    keep, todo = set(), list(wanted)
+    while todo:
+        name = todo.pop()
+        if name in keep:
+            continue
+        keep.add(name)
+        todo.extend(producer[i].name for i in by_name[name].inputs)
+    return [s for s in stages if s.name in keep]
+
+def run_stages(stages: list[Stage], workers: int = 1, telemetry: Run | None = None) -> dict:
+    """Run ``stages`` as soon as their inputs exist, up to ``workers`` at a time.
+
+    Returns every produced output by name. The first failing stage cancels
+    everything not yet started and its exception is re-raised. With
+    ``telemetry`` every stage is measured (see telemetry.py).
+    """
+    producer = {o: s.name for s in stages for o in s.outputs}
+    missing = {i for s in stages for i in s.inputs if i not in producer}
+    if missing:
+        raise ValueError(f"No stage produces: {', '.join(sorted(missing))}")
+
+    results: dict = {}
+    done: set[str] = set()
+    pending = list(stages)
+
+    def call(stage: Stage):
+        t0 = time.perf_counter()
+        inputs = {i: results[i] for i in stage.inputs}
+        if telemetry is None:
+            out = stage.fn(**inputs) or {}
+        else:
+            with telemetry.stage(stage.name, inputs) as st:
+                out = stage.fn(**inputs) or {}
+                st.rows_out += rows(out.values())
+        logger.info(f"Stage {stage.name} finished in {time.perf_counter() - t0:.1f}s")
+        return out
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        running = {}
+        while pending or running:
+            ready = [s for s in pending if all(producer[i] in done for i in s.inputs)]
+            for s in ready:
+                pending.remove(s)
+                running[pool.submit(call, s)] = s
+            if not running:
+                raise ValueError(f"Stage dependencies contain a cycle: {', '.join(s.name for s in pending)}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                stage = running.pop(fut)
+                try:
+                    out = fut.result()
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    logger.error(f"Stage {stage.name} failed")
+                    raise
+                results.update({o: out[o] for o in stage.outputs})
+                done.add(stage.name)
+    return results
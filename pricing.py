@@ -0,0 +1,151 @@
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from config import DB_SCHEMA
+from db import copy_from_dataframe
+from logutil import get_logger
+
+logger = get_logger()
+
+# Prices a batch of prop lines in one pass: implied probabilities from the
+# American odds, the vig removed per (book, player, market, line), the best
+# price across books for each side, and the edge of the player's projection
+# (mean of his last PROJECTION_GAMES games) over the line. prop_pricing holds
+# the latest priced batch of every game.
+
+PROJECTION_GAMES = 5
+MARKET_STATS = {
+    "player_pass_yds": "passing_yards",
+    "player_pass_tds": "passing_tds",
+    "player_pass_attempts": "attempts",
+    "player_pass_completions": "completions",
+    "player_pass_interceptions": "interceptions",
+    "player_rush_yds": "rushing_yards",
+    "player_rush_attempts": "carries",
+    "player_rec_yds": "receiving_yards",
+    "player_reception_yds": "receiving_yards",
+    "player_receptions": "receptions",
+}
+LINE_KEY = ['game_id', 'player_name', 'market', 'line_value']
+_SUFFIX = r"\s+(?:jr|sr|ii|iii|iv|v)$"
+
+def name_key(names: pd.Series) -> pd.Series:
+    """Player names reduced for matching sportsbook names to nflverse ones: lowercase, no punctuation or Jr./III suffix."""
+    return (names.astype(str).str.lower().str.replace(r"[.,'’]", "", regex=True)
+                 .str.split().str.join(" ").str.replace(_SUFFIX, "", regex=True))
+
+def match_players(keys: set[str], known: pd.DataFrame) -> pd.DataFrame:
+    """Candidate (name_key, player_id) pairs for the prop name ``keys`` among ``known`` (player_id, player_name)."""
+    known = known[['player_id', 'player_name']].dropna()
+    cand = known.assign(name_key=name_key(known['player_name']))
+    return cand.loc[cand['name_key'].isin(keys), ['name_key', 'player_id']].drop_duplicates().reset_index(drop=True)
+
+def implied_prob(odds) -> np.ndarray:
+    """American odds -> implied probability; NaN where the price is missing or not valid American odds."""
+    o = np.asarray(odds, dtype=float)
+    valid = np.abs(o) >= 100
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = np.where(o < 0, -o / (100 - o), 100 / (o + 100))
+    return np.where(valid, p, np.nan)
+
+def decimal_odds(odds) -> np.ndarray:
+    """American odds -> decimal payout per unit staked (higher is better for the bettor)."""
+    return 1 / implied_prob(odds)
+
+def _best(df: pd.DataFrame, side: str) -> pd.DataFrame:
+    """Best ``side`` price and its book for every line in LINE_KEY."""
+    ranked = df.assign(_dec=decimal_odds(df[f'{side}_odds'])).dropna(subset=['_dec'])
+    best = ranked.sort_values('_dec', ascending=False, kind='stable').drop_duplicates(LINE_KEY)
+    return best[LINE_KEY + [f'{side}_odds', 'book']].rename(
+        columns={f'{side}_odds': f'best_{side}_odds', 'book': f'best_{side}_book'})
+
+def price_props(props: pd.DataFrame, projections: pd.DataFrame) -> pd.DataFrame:
+    """Price every row of ``props``.
+
+    ``projections`` has one row per player: name_key (see name_key),
+    player_id and a projected value per stat of MARKET_STATS.
+    """
+    df = props.copy()
+    df['line_value'] = pd.to_numeric(df['line_value'], errors='coerce')
+    over, under = implied_prob(df['over_odds']), implied_prob(df['under_odds'])
+    overround = over + under  # NaN unless both sides are quoted: no vig-free price from one side
+    df['over_implied'], df['under_implied'] = over, under
+    df['vig'] = overround - 1
+    df['over_fair'], df['under_fair'] = over / overround, under / overround
+    df['consensus_over_fair'] = df.groupby(LINE_KEY, dropna=False)['over_fair'].transform('mean')
+    df = df.merge(_best(df, 'over'), on=LINE_KEY, how='left').merge(_best(df, 'under'), on=LINE_KEY, how='left')
+
+    df['name_key'] = name_key(df['player_name'])
+    df['stat'] = df['market'].map(MARKET_STATS)
+    stats = sorted(set(MARKET_STATS.values()) & set(projections.columns))
+    proj = projections.melt(id_vars=['name_key', 'player_id'], value_vars=stats, var_name='stat', value_name='projection')
+    df = df.drop(columns=['player_id'], errors='ignore').merge(proj, on=['name_key', 'stat'], how='left')
+
+    line = df['line_value'].to_numpy(dtype=float)
+    edge = df['projection'].to_numpy(dtype=float) - line
+    df['edge'] = edge
+    with np.errstate(invalid='ignore', divide='ignore'):
+        df['edge_pct'] = np.where(line != 0, edge / np.abs(line), np.nan)
+    # one-sided quotes and unmatched best prices turn odds columns into floats; COPY into int needs -110, not -110.0
+    odds = ['over_odds', 'under_odds', 'best_over_odds', 'best_under_odds']
+    df[odds] = df[odds].apply(pd.to_numeric, errors='coerce').round().astype('Int64')
+    cols = ['game_id', 'season', 'week', 'book', 'player_id', 'player_name', 'market', 'line_value',
+            'over_odds', 'under_odds', 'over_implied', 'under_implied', 'vig', 'over_fair', 'under_fair',
+            'consensus_over_fair', 'best_over_odds', 'best_over_book', 'best_under_odds', 'best_under_book',
+            'projection', 'edge', 'edge_pct', 'ts']
+    return df[cols]
+
+def load_projections(con, keys: set[str], rosters: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Per prop name key: the matching player_id and his last-PROJECTION_GAMES mean of every priced stat.
+
+    Names are matched on name_key against dim_player and ``rosters``
+    (player_id, player_name): weekly stats often carry the short "P.Mahomes"
+    form while books and rosters use full names. When several players share
+    a name the one who played most recently wins.
+    """
+    stats = sorted(set(MARKET_STATS.values()))
+    known = pd.DataFrame(con.execute(text(f"SELECT player_id, player_name FROM {DB_SCHEMA}.dim_player;")).fetchall(),
+                         columns=['player_id', 'player_name'])
+    if rosters is not None:
+        known = pd.concat([known, rosters[['player_id', 'player_name']]], ignore_index=True)
+    cand = match_players(keys, known)
+    rows = con.execute(text(f"""
+        WITH p AS (
+            SELECT DISTINCT ON (c.name_key) c.name_key, c.player_id
+            FROM unnest(CAST(:k AS text[]), CAST(:p AS text[])) c(name_key, player_id)
+            LEFT JOIN LATERAL (
+                SELECT f.season, f.week FROM {DB_SCHEMA}.fact_player_timeslot f
+                WHERE f.player_id = c.player_id ORDER BY f.season DESC, f.week DESC LIMIT 1
+            ) last ON true
+            ORDER BY c.name_key, last.season DESC NULLS LAST, last.week DESC NULLS LAST
+        ), recent AS (
+            -- a player's fact rows can split a game by slot/position: sum them back to one row per week
+            SELECT f.player_id, {", ".join(f"sum(f.{c}_avg * f.games_played) AS {c}" for c in stats)},
+                   row_number() OVER (PARTITION BY f.player_id ORDER BY f.season DESC, f.week DESC) AS rn
+            FROM {DB_SCHEMA}.fact_player_timeslot f JOIN p ON p.player_id = f.player_id
+            GROUP BY f.player_id, f.season, f.week
+        )
+        SELECT p.name_key, p.player_id, {", ".join(f"avg(r.{c})::float8" for c in stats)}
+        FROM p LEFT JOIN recent r ON r.player_id = p.player_id AND r.rn <= :n
+        GROUP BY p.name_key, p.player_id;
+    """), {"k": cand['name_key'].tolist(), "p": cand['player_id'].astype(str).tolist(), "n": PROJECTION_GAMES}).fetchall()
+    return pd.DataFrame(rows, columns=['name_key', 'player_id'] + stats)
+
+def refresh_prop_pricing(engine, props_df: pd.DataFrame, rosters: pd.DataFrame | None = None) -> int:
+    """Price ``props_df`` and replace the prop_pricing rows of its games; returns rows written.
+
+    ``rosters`` (player_id, player_name) adds full names to match prop players against.
+    """
+    if props_df.empty:
+        return 0
+    t0 = time.perf_counter()
+    games = sorted(props_df['game_id'].dropna().unique().tolist())
+    with engine.begin() as con:
+        projections = load_projections(con, set(name_key(props_df['player_name'].dropna())), rosters)
+        priced = price_props(props_df, projections)
+        con.execute(text(f"DELETE FROM {DB_SCHEMA}.prop_pricing WHERE game_id = ANY(:g);"), {"g": games})
+        copy_from_dataframe(con, priced, f"{DB_SCHEMA}.prop_pricing")
+    logger.info(f"Pricing: {len(priced):,} prop lines across {len(games)} games priced, "
+                f"{priced['projection'].notna().sum():,} with a projection, in {time.perf_counter() - t0:.2f}s")
+    return len(priced)
@@ -1,92 +1,193 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlencode
 from sqlalchemy import text
 from config import THEODDS_API_KEY, PROPS_BOOKS, PROPS_MARKETS, SPORT_KEY, DB_SCHEMA
+from config import PROPS_MAX_WORKERS, PROPS_MAX_RETRIES, PROPS_QUOTA_RESERVE, ODDS_STORE_MODE
 from teams import team_alias_map
-from utils import mk_game_id
-from db import copy_from_dataframe
+from context import RunContext
+from games import GameIndex
+from db import copy_from_dataframe, parallel_write, PROPS_KEY
+import oddsstore
+import telemetry
+from logutil import get_logger
 
-def _theodds_events(api_key:str) -> list[dict]:
+logger = get_logger()
+
+_SESSION: requests.Session | None = None
+_SESSION_LOCK = threading.Lock()
+
+def _session() -> requests.Session:
+    """Keep-alive session shared by every TheOdds call; its pool fits PROPS_MAX_WORKERS connections."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = requests.Session()
+            _SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, PROPS_MAX_WORKERS)))
+        return _SESSION
+
+class QuotaExhausted(RuntimeError):
+    pass
+
+class _Quota:
+    """TheOdds credit budget, tracked from the x-requests-remaining/-used headers."""
+
+    def __init__(self, reserve: int | None = None):
+        self.reserve = PROPS_QUOTA_RESERVE if reserve is None else reserve
+        self.remaining: int | None = None
+        self.used: int | None = None
+        self._lock = threading.Lock()
+
+    def update(self, headers) -> None:
+        with self._lock:
+            for attr, header in (("remaining", "x-requests-remaining"), ("used", "x-requests-used")):
+                try:
+                    setattr(self, attr, int(float(headers.get(header))))
+                except (TypeError, ValueError):
+                    pass
+
+    def take(self, cost: int) -> bool:
+        """Reserve ``cost`` credits for a request; False once the budget would drop below the reserve."""
+        with self._lock:
+            if self.remaining is None:
+                return True
+            if self.remaining - cost < self.reserve:
+                return False
+            self.remaining -= cost
+            return True
+
+def _retry_delay(r: requests.Response, attempt: int) -> float:
+    try:
+        return max(0.0, float(r.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return 2.0 ** attempt
+
+def _get(url: str, quota: _Quota | None = None) -> requests.Response:
+    for attempt in range(PROPS_MAX_RETRIES + 1):
+        r = _session().get(url, timeout=30)
+        if quota is not None:
+            quota.update(r.headers)
+        if (r.status_code == 429 or r.status_code >= 500) and attempt < PROPS_MAX_RETRIES:
+            time.sleep(_retry_delay(r, attempt))
+            continue
+        r.raise_for_status()
+        return r
+
+def _theodds_events(api_key:str, quota: _Quota | None = None) -> list[dict]:
     url = f"https://api.the-odds-api.com/v4/sports/{SPORT_KEY}/events/?{urlencode({'apiKey': api_key, 'regions':'us'})}"
-    r = requests.get(url, timeout=30); r.raise_for_status()
-    return r.json()
+    return oddsstore.fetch("events", lambda: _get(url, quota).json())
 
-def _theodds_event_props(api_key:str, event_id:str, markets:list[str]) -> dict:
+def _theodds_event_props(api_key:str, event_id:str, markets:list[str], quota: _Quota | None = None) -> dict:
     params = {'apiKey': api_key, 'regions':'us', 'markets':','.join(markets), 'oddsFormat':'american'}
     url = f"https://api.the-odds-api.com/v4/sports/{SPORT_KEY}/events/{event_id}/odds/?{urlencode(params)}"
-    r = requests.get(url, timeout=30); r.raise_for_status()
-    return r.json()
 
-def fetch_player_props_from_theodds(years: list[int], schedule: pd.DataFrame) -> pd.DataFrame:
-    if not THEODDS_API_KEY:
+    def live():
+        # one credit per market per region; stored payloads cost nothing
+        if quota is not None and not quota.take(max(1, len(markets))):
+            raise QuotaExhausted(f"quota remaining={quota.remaining} (reserve {quota.reserve})")
+        return _get(url, quota).json()
+    return oddsstore.fetch("event_odds", live, event_id, markets)
+
+def _fetch_event_props(event_ids: list[str], markets: list[str], quota: _Quota) -> list[dict | None]:
+    """Fetch odds for ``event_ids`` on a bounded thread pool; results keep the input order.
+
+    An event is skipped (None) when its request fails or when the remaining
+    quota cannot cover it.
+    """
+    def one(event_id):
+        t0 = time.perf_counter()
+        try:
+            ev_odds = _theodds_event_props(THEODDS_API_KEY, event_id, markets, quota)
+        except QuotaExhausted as e:
+            logger.warning(f"props event {event_id}: skipped, {e}")
+            return None
+        except Exception as e:
+            logger.warning(f"props event {event_id}: failed after {time.perf_counter() - t0:.2f}s: {e}")
+            return None
+        logger.info(f"props event {event_id}: {time.perf_counter() - t0:.2f}s, "
+                    f"{len(ev_odds.get('bookmakers', []))} books | quota used={quota.used} remaining={quota.remaining}")
+        return ev_odds
+
+    with ThreadPoolExecutor(max_workers=max(1, PROPS_MAX_WORKERS)) as pool:
+        return list(pool.map(one, event_ids))
+
+def _event_rows(ev_odds: dict, game_id, season: int, week: int, ts: pd.Timestamp) -> list[dict]:
+    rows = []
+    for bk in ev_odds.get('bookmakers', []):
+        book_name = (bk.get('title') or "").strip()
+        if PROPS_BOOKS and book_name.lower() not in PROPS_BOOKS:
+            continue
+        for m in bk.get('markets', []):
+            market_key = m.get('key')
+            # Some APIs provide separate Over/Under rows under outcomes
+            pool = {}
+            for out in m.get('outcomes', []):
+                player_name = out.get('description') or out.get('name') or ""
+                line_value  = out.get('point')
+                price       = out.get('price')
+                side        = (out.get('name') or "").lower()
+                d = pool.setdefault((player_name, line_value), {"over":None,"under":None})
+                if 'over' in side:  d["over"]  = price
+                if 'under' in side: d["under"] = price
+            for (player_name, line_value), both in pool.items():
+                rows.append({
+                    "game_id": game_id, "season": season, "week": week,
+                    "book": book_name, "player_name": player_name,
+                    "market": market_key, "line_value": line_value,
+                    "over_odds": both["over"], "under_odds": both["under"],
+                    "ts": ts
+                })
+    return rows
+
+def fetch_player_props_from_theodds(years: list[int], games: GameIndex, ctx: RunContext | None = None,
+                                    events: list[dict] | None = None, team_map: dict[str, str] | None = None) -> pd.DataFrame:
+    """Player prop lines for ``events`` (default: every listed event) matched to scheduled games."""
+    if not THEODDS_API_KEY and ODDS_STORE_MODE != "replay":
         return pd.DataFrame()
 
-    team_map = team_alias_map()
-    events = _theodds_events(THEODDS_API_KEY)
+    team_map = team_map or team_alias_map(ctx)
+    quota = _Quota()
+    if events is None:
+        with telemetry.timed("fetch"):
+            events = _theodds_events(THEODDS_API_KEY, quota)
     if not events:
         return pd.DataFrame()
 
-    rows = []
-    sched = schedule[['season','week','home_team','away_team','game_date']].copy()
-    sched['game_id'] = schedule['game_id']
-
+    targets = []
     for ev in events:
-        event_id = ev.get('id')
-        commence = pd.to_datetime(ev.get('commence_time'), errors='coerce', utc=True)
         home_name = (ev.get('home_team') or "").strip().lower()
         away_name = (ev.get('away_team') or "").strip().lower()
         home = team_map.get(home_name); away = team_map.get(away_name)
         if not home or not away:
             continue
-
-        # try to locate the scheduled game row
-        date_key = commence.date() if pd.notna(commence) else None
-        cand = schedule[(schedule['home_team']==home)&(schedule['away_team']==away)]
-        if date_key:
-            lo = date_key - pd.Timedelta(days=2)
-            hi = date_key + pd.Timedelta(days=2)
-            cand = cand[(cand['game_date'].dt.date >= lo) & (cand['game_date'].dt.date <= hi)]
-        if cand.empty:
-            cand = schedule[(schedule['home_team']==home)&(schedule['away_team']==away)]
-        if cand.empty:
+        game = games.nearest(home, away, ev.get('commence_time'))
+        if game is None:
             continue
+        season, week, game_id = game
+        targets.append((ev.get('id'), game_id, season, week))
 
-        season = int(cand.iloc[0]['season']); week = int(cand.iloc[0]['week'])
-        game_id = cand.iloc[0]['game_id']
-
-        try:
-            ev_odds = _theodds_event_props(THEODDS_API_KEY, event_id, PROPS_MARKETS)
-        except Exception:
-            continue
+    t0 = time.perf_counter()
+    with telemetry.timed("fetch"):
+        odds = _fetch_event_props([t[0] for t in targets], PROPS_MARKETS, quota)
+    logger.info(f"Fetched props for {sum(o is not None for o in odds)}/{len(targets)} events in {time.perf_counter() - t0:.2f}s "
+                f"| quota used={quota.used} remaining={quota.remaining}")
 
-        for bk in ev_odds.get('bookmakers', []):
-            book_name = (bk.get('title') or "").strip()
-            if PROPS_BOOKS and book_name.lower() not in PROPS_BOOKS:
-                continue
-            for m in bk.get('markets', []):
-                market_key = m.get('key')
-                # Some APIs provide separate Over/Under rows under outcomes
-                pool = {}
-                for out in m.get('outcomes', []):
-                    player_name = out.get('description') or out.get('name') or ""
-                    line_value  = out.get('point')
-                    price       = out.get('price')
-                    side        = (out.get('name') or "").lower()
-                    d = pool.setdefault((player_name, line_value), {"over":None,"under":None})
-                    if 'over' in side:  d["over"]  = price
-                    if 'under' in side: d["under"] = price
-                for (player_name, line_value), both in pool.items():
-                    rows.append({
-                        "game_id": game_id, "season": season, "week": week,
-                        "book": book_name, "player_name": player_name,
-                        "market": market_key, "line_value": line_value,
-                        "over_odds": both["over"], "under_odds": both["under"],
-                        "ts": pd.Timestamp.utcnow()
-                    })
+    # one snapshot timestamp per fetch, so unchanged lines can be recognised on insert
+    fetch_ts = pd.Timestamp.now(tz="UTC")
+    rows = []
+    for (event_id, game_id, season, week), ev_odds in zip(targets, odds):
+        if ev_odds is not None:
+            rows.extend(_event_rows(ev_odds, game_id, season, week, fetch_ts))
 
     df = pd.DataFrame(rows)
     if df.empty: return df
+    # a book can list several (alternate) lines for one player/market; each is kept as its own history.
+    # Outcomes without a point are yes/no markets with no over/under price.
+    df = df[df['line_value'].notna()]
 
     # seasonweek for easier slicing in BI
     df['seasonweek'] = df['season']*100 + df['week']
@@ -95,9 +196,41 @@ def fetch_player_props_from_theodds(years: list[int], schedule: pd.DataFrame) ->
         if c not in df.columns: df[c] = None
     return df[cols]
 
-def upsert_player_props(engine, props_df: pd.DataFrame):
+PROP_GROUP = ['game_id','book','player_name','market']
+_LINE = ['line_value','over_odds','under_odds']
+
+def changed_lines(fetched: pd.DataFrame, latest: pd.DataFrame) -> pd.Series:
+    """Mask of the ``fetched`` rows to store.
+
+    ``latest`` holds the most recent stored snapshot of each (game, book,
+    player, market). A group is stored whole, so every snapshot is the
+    complete set of lines quoted at that time, whenever its lines or odds
+    differ from that snapshot: a new line, a line that went away, moved
+    odds, or a line moving back to an earlier value.
+    """
+    def norm(df):
+        return df[PROP_GROUP].assign(**{c: pd.to_numeric(df[c], errors='coerce').astype(float) for c in _LINE})
+    f, last = norm(fetched), norm(latest).drop_duplicates(PROP_GROUP + _LINE)
+    stored = f.merge(last.assign(_stored=True), on=PROP_GROUP + _LINE, how='left')['_stored'].notna().to_numpy()
+    n_fetched = f.groupby(PROP_GROUP)['line_value'].transform('size').to_numpy()
+    n_last = f[PROP_GROUP].merge(last.groupby(PROP_GROUP).size().rename('_n').reset_index(),
+                                 on=PROP_GROUP, how='left')['_n'].fillna(0).to_numpy()
+    same = pd.Series(stored & (n_fetched == n_last), index=fetched.index)
+    return ~same.groupby([fetched[c] for c in PROP_GROUP]).transform('all')
+
+def upsert_player_props(engine, props_df: pd.DataFrame) -> int:
+    """Insert a snapshot only for (game_id, book, player_name, market) groups that moved.
+
+    Each group is compared with its latest stored snapshot (see
+    changed_lines); unchanged groups are skipped, so repeated polls do not
+    grow the table. Returns the number of rows inserted.
+    """
     if props_df.empty:
-        return
+        return 0
+    # shard on the change-detection group so each (game, book, player, market) history stays on one connection
+    return sum(parallel_write(engine, props_df, _write_props, PROP_GROUP, "fact_player_prop_lines"))
+
+def _write_props(engine, props_df: pd.DataFrame) -> int:
     cols = list(props_df.columns)
     tmp = "tmp_prop_lines"
     with engine.begin() as con:
@@ -107,10 +240,29 @@ def upsert_player_props(engine, props_df: pd.DataFrame):
               book text, player_id text, player_name text,
               market text, line_value numeric, over_odds numeric, under_odds numeric, ts timestamptz
             ) ON COMMIT DROP;
+            CREATE TEMP TABLE {tmp}_groups (game_id text, book text, player_name text, market text, season int) ON COMMIT DROP;
         """))
-        copy_from_dataframe(con, props_df[cols], tmp)
-        con.execute(text(f"""
+        copy_from_dataframe(con, props_df[PROP_GROUP + ['season']].drop_duplicates(), f"{tmp}_groups")
+        # PROPS_KEY leads with the group then ts, so max(ts) and its rows are index lookups
+        latest = pd.DataFrame(con.execute(text(f"""
+            SELECT p.game_id, p.book, p.player_name, p.market, p.line_value, p.over_odds, p.under_odds
+            FROM {tmp}_groups g
+            CROSS JOIN LATERAL (
+                SELECT max(p.ts) AS ts FROM {DB_SCHEMA}.fact_player_prop_lines p
+                WHERE p.game_id = g.game_id AND p.book = g.book AND p.player_name = g.player_name
+                  AND p.market = g.market AND p.season = g.season
+            ) s
+            JOIN {DB_SCHEMA}.fact_player_prop_lines p
+              ON p.game_id = g.game_id AND p.book = g.book AND p.player_name = g.player_name
+             AND p.market = g.market AND p.ts = s.ts AND p.season = g.season;
+        """)).fetchall(), columns=PROP_GROUP + _LINE)
+        changed = props_df[changed_lines(props_df, latest).to_numpy()]
+        if changed.empty:
+            return 0
+        copy_from_dataframe(con, changed[cols], tmp)
+        res = con.execute(text(f"""
             INSERT INTO {DB_SCHEMA}.fact_player_prop_lines ({",".join(cols)})
-            SELECT {",".join(cols)} FROM {tmp}
-            ON CONFLICT (game_id, book, player_name, market, ts) DO NOTHING;
+            SELECT {",".join("t." + c for c in cols)} FROM {tmp} t
+            ON CONFLICT ({",".join(PROPS_KEY)}) DO NOTHING;
         """))
+    return res.rowcount
@@ -0,0 +1,102 @@
+import argparse
+import signal
+import threading
+import pandas as pd
+from logutil import get_logger
+from config import CURRENT_SEASON, THEODDS_API_KEY, PROPS_POLL_CADENCE
+from db import get_engine, migrate, ensure_season_partitions
+from context import RunContext
+from teams import team_alias_map
+from props import _theodds_events, fetch_player_props_from_theodds, upsert_player_props
+from pricing import refresh_prop_pricing
+
+logger = get_logger()
+
+# Props-only refresher. Loads the current season's schedule and the team alias
+# map once, then polls each upcoming event on a cadence that tightens as its
+# kickoff approaches. Started/finished events are never polled, and start-up
+# cost does not depend on YEARS.
+
+def parse_cadence(s: str) -> list[tuple[float, float]]:
+    """'2:300,24:1800,*:3600' -> [(2.0, 300.0), (24.0, 1800.0), (inf, 3600.0)]"""
+    steps = []
+    for part in s.split(","):
+        if not part.strip():
+            continue
+        hours, secs = part.split(":")
+        steps.append((float("inf") if hours.strip() == "*" else float(hours), float(secs)))
+    if not steps or steps[-1][0] != float("inf"):
+        raise ValueError(f"PROPS_POLL_CADENCE must end with a '*:<seconds>' step: {s!r}")
+    return sorted(steps)
+
+def poll_interval(hours_to_kickoff: float, cadence: list[tuple[float, float]]) -> float:
+    for max_hours, secs in cadence:
+        if hours_to_kickoff <= max_hours:
+            return secs
+    return cadence[-1][1]
+
+def due_events(events: list[dict], next_due: dict[str, pd.Timestamp], now: pd.Timestamp) -> list[dict]:
+    """Events that have not kicked off and whose next poll time has arrived."""
+    out = []
+    for ev in events:
+        kickoff = pd.to_datetime(ev.get('commence_time'), errors='coerce', utc=True)
+        if pd.isna(kickoff) or kickoff <= now:
+            continue
+        if next_due.get(ev.get('id'), now) <= now:
+            out.append(ev)
+    return out
+
+def run(once: bool = False):
+    if not THEODDS_API_KEY:
+        raise SystemExit("THEODDS_API_KEY is not set")
+    cadence = parse_cadence(PROPS_POLL_CADENCE)
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    engine = get_engine()
+    migrate(engine)
+    ensure_season_partitions(engine, [CURRENT_SEASON])
+
+    ctx = RunContext([CURRENT_SEASON])
+    games, team_map = ctx.games, team_alias_map(ctx)
+    logger.info(f"Props daemon started for season {CURRENT_SEASON} | cadence={cadence}")
+
+    next_due: dict[str, pd.Timestamp] = {}
+    while not stop.is_set():
+        now = pd.Timestamp.now(tz="UTC")
+        wait = cadence[-1][1]
+        try:
+            events = _theodds_events(THEODDS_API_KEY)
+            due = due_events(events, next_due, now)
+            due_ids = {ev.get('id') for ev in due}
+            if due:
+                df = fetch_player_props_from_theodds([CURRENT_SEASON], games, ctx, events=due, team_map=team_map)
+                inserted = upsert_player_props(engine, df)
+                logger.info(f"Props cycle: {len(due)} due of {len(events)} events | {len(df):,} lines, {inserted:,} changed")
+                refresh_prop_pricing(engine, df, ctx.rosters)
+            live = set()
+            for ev in events:
+                kickoff = pd.to_datetime(ev.get('commence_time'), errors='coerce', utc=True)
+                if pd.isna(kickoff) or kickoff <= now:
+                    continue
+                live.add(ev.get('id'))
+                if ev.get('id') in due_ids:
+                    secs = poll_interval((kickoff - now).total_seconds() / 3600, cadence)
+                    next_due[ev.get('id')] = now + pd.Timedelta(seconds=secs)
+            for event_id in list(next_due):
+                if event_id not in live:
+                    del next_due[event_id]
+            if next_due:
+                wait = min(wait, max(1.0, (min(next_due.values()) - pd.Timestamp.now(tz="UTC")).total_seconds()))
+        except Exception:
+            logger.exception("Props cycle failed; retrying after the idle interval")
+        if once:
+            break
+        stop.wait(wait)
+    logger.info("Props daemon stopped.")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Poll TheOdds player props for upcoming games.")
+    ap.add_argument("--once", action="store_true", help="run a single polling cycle and exit")
+    run(once=ap.parse_args().once)
@@ -0,0 +1,80 @@
+import time
+import pandas as pd
+from sqlalchemy import text
+from config import DB_SCHEMA
+from db import copy_from_dataframe, ROLLUPS, ROLLUP_STATS
+from loadstate import in_partitions
+from logutil import get_logger
+
+logger = get_logger()
+
+# Player split rollups (db.ROLLUPS) for dashboards: one row per player, season
+# and split with game counts, sums and real per-game averages, rebuilt from
+# fact_player_timeslot for just the (player_id, season) pairs a load touched.
+
+def touched_players(fact: pd.DataFrame, parts: pd.DataFrame, stored: list[pd.DataFrame] = ()) -> pd.DataFrame:
+    """Distinct (player_id, season) pairs refresh_rollups needs to rebuild after a load.
+
+    These are the players of ``fact`` in the (season, week) partitions
+    ``parts`` the load rewrote, plus ``stored``: who those partitions held
+    before (see stored_players), so players whose rows were deleted are
+    rebuilt too.
+    """
+    frames = [fact.loc[in_partitions(fact, parts), ['player_id', 'season']], *stored]
+    out = pd.concat(frames, ignore_index=True)
+    return out.astype({'season': 'int64'}).drop_duplicates().reset_index(drop=True)
+
+def stored_players(engine, parts: pd.DataFrame) -> pd.DataFrame:
+    """(player_id, season) pairs fact_player_timeslot currently holds in the (season, week) partitions ``parts``."""
+    with engine.begin() as con:
+        rows = con.execute(text(f"""
+            SELECT DISTINCT f.player_id, f.season
+            FROM {DB_SCHEMA}.fact_player_timeslot f
+            JOIN unnest(CAST(:s AS int[]), CAST(:w AS int[])) AS p(season, week)
+              ON f.season = p.season AND f.week = p.week;
+        """), {"s": [int(x) for x in parts['season']], "w": [int(x) for x in parts['week']]}).fetchall()
+    return pd.DataFrame(rows, columns=['player_id', 'season'])
+
+def _refresh_sql(table: str, split: list[str]) -> str:
+    keys = ", ".join(f"f.{c}" for c in split)
+    # fact stats are per-game values; weight by games_played so multi-game rows still average correctly
+    sums = ", ".join(f"sum(f.{c}_avg * f.games_played)" for c in ROLLUP_STATS)
+    avgs = ", ".join(f"sum(f.{c}_avg * f.games_played) / nullif(sum(f.games_played), 0)" for c in ROLLUP_STATS)
+    return f"""
+        DELETE FROM {DB_SCHEMA}.{table} r USING tmp_rollup_touched t
+        WHERE r.player_id = t.player_id AND r.season = t.season;
+        DELETE FROM {DB_SCHEMA}.{table} r
+        WHERE r.season = ANY(:seasons)
+          AND NOT EXISTS (SELECT 1 FROM {DB_SCHEMA}.fact_player_timeslot f
+                          WHERE f.player_id = r.player_id AND f.season = r.season);
+        INSERT INTO {DB_SCHEMA}.{table} (player_id, season, {", ".join(split)}, player_name, position, games,
+            {", ".join(f"{c}_sum" for c in ROLLUP_STATS)}, {", ".join(f"{c}_avg" for c in ROLLUP_STATS)}, season_range)
+        SELECT f.player_id, f.season, {keys}, max(f.player_name), max(f.position), sum(f.games_played),
+            {sums}, {avgs}, max(f.season_range)
+        FROM {DB_SCHEMA}.fact_player_timeslot f
+        JOIN tmp_rollup_touched t ON t.player_id = f.player_id AND t.season = f.season
+        GROUP BY f.player_id, f.season, {keys};
+    """
+
+def refresh_rollups(engine, touched: pd.DataFrame) -> int:
+    """Rebuild every rollup for the (player_id, season) pairs in ``touched``, in one transaction.
+
+    Rows of players that no longer have facts in a touched season (e.g. a
+    legacy id the backfill replaced) are dropped. Returns rollup rows written.
+    """
+    if touched.empty:
+        return 0
+    t0 = time.perf_counter()
+    touched = touched[['player_id', 'season']].drop_duplicates()
+    seasons = sorted(int(s) for s in touched['season'].unique())
+    written = 0
+    with engine.begin() as con:
+        con.execute(text("CREATE TEMP TABLE tmp_rollup_touched (player_id text, season int, PRIMARY KEY (player_id, season)) ON COMMIT DROP;"))
+        copy_from_dataframe(con, touched, "tmp_rollup_touched")
+        con.execute(text("ANALYZE tmp_rollup_touched;"))
+        for table, split in ROLLUPS.items():
+            # rowcount is the last statement's: the INSERT
+            written += con.execute(text(_refresh_sql(table, split)), {"seasons": seasons}).rowcount
+    logger.info(f"Rollups: rebuilt {written:,} rows for {len(touched):,} player-seasons in {seasons} "
+                f"in {time.perf_counter() - t0:.2f}s")
+    return written
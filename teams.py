@@ -1,42 +1,27 @@
 import pandas as pd
-import nfl_data_py as nfl
-from sqlalchemy import text
-from config import DB_SCHEMA
+from db import bulk_upsert
+from cache import load_team_desc
+from context import RunContext
 
-def load_reference():
-    teams = nfl.import_team_desc()
+def load_reference(ctx: RunContext | None = None):
+    teams = ctx.team_desc if ctx else load_team_desc()
     upsert = teams[['team_abbr','team_name']].drop_duplicates()
     return teams, upsert
 
 def upsert_dim_team(engine, teams_df: pd.DataFrame):
-    if teams_df.empty:
-        return
-    with engine.begin() as con:
-        rows = teams_df[['team_abbr','team_name']].drop_duplicates().to_dict(orient='records')
-        sql = f"""
-        INSERT INTO {DB_SCHEMA}.dim_team (team_abbr, team_name)
-        VALUES (:team_abbr, :team_name)
-        ON CONFLICT (team_abbr) DO UPDATE SET team_name = EXCLUDED.team_name;
-        """
-        for i in range(0, len(rows), 1000):
-            con.execute(text(sql), rows[i:i+1000])
+    bulk_upsert(engine, teams_df, "dim_team", ["team_abbr"], ["team_name"])
+
+TIMESLOTS = pd.DataFrame({
+    "timeslot_key": [1, 2, 3, 4, 5, 6],
+    "time_slot": ["Thursday", "Monday", "Sunday Morning", "Sunday Early Window", "Sunday Late Window", "Sunday Night"],
+})
 
 def upsert_dim_timeslot(engine):
-    with engine.begin() as con:
-        con.execute(text(f"""
-            INSERT INTO {DB_SCHEMA}.dim_timeslot (timeslot_key, time_slot) VALUES
-            (1,'Thursday'),
-            (2,'Monday'),
-            (3,'Sunday Morning'),
-            (4,'Sunday Early Window'),
-            (5,'Sunday Late Window'),
-            (6,'Sunday Night')
-            ON CONFLICT (timeslot_key) DO UPDATE SET time_slot = EXCLUDED.time_slot;
-        """))
+    bulk_upsert(engine, TIMESLOTS, "dim_timeslot", ["timeslot_key"], ["time_slot"])
 
-def team_alias_map() -> dict[str,str]:
+def team_alias_map(ctx: RunContext | None = None) -> dict[str,str]:
     try:
-        teams = nfl.import_team_desc()
+        teams = ctx.team_desc if ctx else load_team_desc()
     except Exception:
         teams = pd.DataFrame(columns=['team_abbr','team_name'])
 
@@ -0,0 +1,151 @@
+import cProfile
+import contextvars
+import json
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import pandas as pd
+from sqlalchemy import text
+from config import DB_SCHEMA, PROFILE_STAGES, PROFILE_DIR
+from logutil import get_logger, get_telemetry_logger
+
+logger = get_logger()
+
+# Per-stage load telemetry. run_stages opens a StageStats for each stage on the
+# thread running it; code underneath attributes time to it with timed("fetch")
+# (upstream pulls) and the engine listeners from instrument() (database), and
+# bumps counters with add(). Whatever is left of the wall time is pandas work.
+# Records go to logs/telemetry.jsonl as they finish and to load_audit at the end.
+# Helper threads started by a stage keep reporting to it when their work is
+# submitted through carry(); overlapped work can then add up to more than wall.
+
+_current: contextvars.ContextVar["StageStats | None"] = contextvars.ContextVar("telemetry_stage", default=None)
+_bump_lock = threading.Lock()
+
+@dataclass
+class StageStats:
+    run_id: str
+    stage: str
+    started_at: str
+    status: str = "ok"
+    wall_s: float = 0.0
+    fetch_s: float = 0.0
+    db_s: float = 0.0
+    pandas_s: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    copy_bytes: int = 0
+    rss_delta_mb: float = 0.0   # growth of the process peak RSS; shared by stages running concurrently
+    error: str | None = None
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+def rows(values) -> int:
+    """Total rows across the DataFrames in ``values``."""
+    return sum(len(v) for v in values if isinstance(v, pd.DataFrame))
+
+def _bump(field: str, amount) -> None:
+    st = _current.get()
+    if st is not None:
+        with _bump_lock:
+            setattr(st, field, getattr(st, field) + amount)
+
+def carry(fn):
+    """``fn`` bound to the calling thread's stage, for handing to another thread."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+def add(**counters) -> None:
+    """Add to counters (rows_out, copy_bytes, ...) of the stage running on this thread."""
+    for field, amount in counters.items():
+        _bump(field, amount)
+
+@contextmanager
+def timed(kind: str):
+    """Attribute the enclosed block to ``kind`` ("fetch" or "db") of the current stage."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _bump(f"{kind}_s", time.perf_counter() - t0)
+
+def instrument(engine) -> None:
+    """Count every statement ``engine`` executes as database time."""
+    from sqlalchemy import event
+    if event.contains(engine, "after_cursor_execute", _after_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["telemetry_t0"] = time.perf_counter()
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    t0 = conn.info.pop("telemetry_t0", None)
+    if t0 is not None:
+        _bump("db_s", time.perf_counter() - t0)
+
+class Run:
+    """Telemetry for one load; pass to ``run_stages`` and ``save`` it afterwards."""
+
+    def __init__(self):
+        self.run_id = pd.Timestamp.now(tz="UTC").strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+        self.stages: list[StageStats] = []
+        self._lock = threading.Lock()
+        self._json = get_telemetry_logger()
+
+    @contextmanager
+    def stage(self, name: str, inputs: dict):
+        st = StageStats(self.run_id, name, pd.Timestamp.now(tz="UTC").isoformat(), rows_in=rows(inputs.values()))
+        prof = cProfile.Profile() if PROFILE_STAGES else None
+        rss0 = _peak_rss_mb()
+        token = _current.set(st)
+        t0 = time.perf_counter()
+        if prof:
+            prof.enable()
+        try:
+            yield st
+        except BaseException as e:
+            st.status, st.error = "failed", f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            if prof:
+                prof.disable()
+                self._dump(prof, name)
+            _current.reset(token)
+            st.wall_s = time.perf_counter() - t0
+            st.pandas_s = max(st.wall_s - st.fetch_s - st.db_s, 0.0)
+            st.rss_delta_mb = _peak_rss_mb() - rss0
+            with self._lock:
+                self.stages.append(st)
+            self._json.info(json.dumps(asdict(st)))
+
+    def _dump(self, prof: cProfile.Profile, name: str) -> None:
+        out = Path(PROFILE_DIR) if PROFILE_DIR else Path(__file__).resolve().parent / "logs" / "profiles"
+        out.mkdir(parents=True, exist_ok=True)
+        path = out / f"{self.run_id}-{name}.prof"
+        prof.dump_stats(path)
+        logger.info(f"Profile for stage {name} written to {path} (inspect with: python -m pstats {path})")
+
+    def save(self, engine) -> None:
+        """Append this run's stage records to load_audit. Failures are logged, never raised."""
+        if not self.stages:
+            return
+        sql = f"""
+            INSERT INTO {DB_SCHEMA}.load_audit
+                (run_id, stage, started_at, status, wall_s, fetch_s, db_s, pandas_s,
+                 rows_in, rows_out, copy_bytes, rss_delta_mb, error)
+            VALUES (:run_id, :stage, :started_at, :status, :wall_s, :fetch_s, :db_s, :pandas_s,
+                    :rows_in, :rows_out, :copy_bytes, :rss_delta_mb, :error)
+            ON CONFLICT (run_id, stage) DO NOTHING;
+        """
+        try:
+            with engine.begin() as con:
+                con.execute(text(sql), [asdict(s) for s in self.stages])
+        except Exception as e:
+            logger.warning(f"Could not write load_audit for run {self.run_id}: {e}")
@@ -11,7 +11,7 @@ if str(ROOT) not in sys.path:
 # provide a lightweight stub for nfl_data_py to satisfy imports during tests
 fake_nfl = types.SimpleNamespace(
     import_team_desc=lambda: pd.DataFrame(columns=["team_abbr","team_name"]),
-    import_weekly_data=lambda years: pd.DataFrame(),
+    import_weekly_data=lambda years, columns=None: pd.DataFrame(columns=columns or []),
     import_schedules=lambda years: pd.DataFrame(),
     import_seasonal_rosters=lambda years, columns=None: pd.DataFrame(columns=columns or []),
     import_betting_lines=lambda years: pd.DataFrame(),
@@ -26,5 +26,7 @@ def _create_engine(*args, **kwargs):
         def connect(self):
             raise RuntimeError("stub")
     return Dummy()
-fake_sqlalchemy = types.SimpleNamespace(text=_sqlalchemy_text, create_engine=_create_engine)
+fake_exc = types.SimpleNamespace(ProgrammingError=type("ProgrammingError", (Exception,), {}))
+fake_sqlalchemy = types.SimpleNamespace(text=_sqlalchemy_text, create_engine=_create_engine, exc=fake_exc)
 sys.modules.setdefault("sqlalchemy", fake_sqlalchemy)
+sys.modules.setdefault("sqlalchemy.exc", fake_exc)
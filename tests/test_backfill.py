@@ -0,0 +1,23 @@
+import pandas as pd
+from backfill import backfill_legacy_ids, legacy_seasons
+
+def test_legacy_seasons_lists_only_rewritten_seasons_with_legacy_ids():
+    fact = pd.DataFrame({
+        "season": [2022, 2023, 2023, 2024],
+        "week": [1, 1, 2, 1],
+        "player_id": ["00-1", "legacy_ab", "00-2", "legacy_cd"],
+    })
+    everything = fact[["season", "week"]]
+    assert legacy_seasons(fact, everything) == [2023, 2024]
+    assert legacy_seasons(fact.iloc[[0, 2]], everything) == []
+    assert legacy_seasons(fact.iloc[0:0], everything) == []
+    assert legacy_seasons(fact, pd.DataFrame({"season": [2023, 2024], "week": [2, 1]})) == [2024]
+    # an unchanged incremental run rewrites no partitions
+    assert legacy_seasons(fact, everything.iloc[0:0]) == []
+
+def test_backfill_without_seasons_does_not_touch_the_database():
+    class NoEngine:
+        def begin(self):
+            raise AssertionError("backfill should not connect")
+    updated, rekeyed = backfill_legacy_ids(NoEngine(), [])
+    assert updated == 0 and rekeyed.empty
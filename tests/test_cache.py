@@ -0,0 +1,45 @@
+import os
+import pandas as pd
+import pytest
+import cache
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "NFL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "NFL_CACHE_MODE", "on")
+    monkeypatch.setattr(cache, "CURRENT_SEASON", 2024)
+    return tmp_path
+
+def _fetcher(calls):
+    def fetch(years, columns):
+        calls.append(list(years))
+        return pd.DataFrame({"season": [y for y in years for _ in range(2)], "x": range(2 * len(years)), "y": 1})
+    return fetch
+
+def test_past_seasons_are_immutable(cache_dir, monkeypatch):
+    monkeypatch.setattr(cache, "NFL_CACHE_TTL_HOURS", 0)
+    calls = []
+    first = cache._by_season("weekly", [2022, 2023, 2024], _fetcher(calls))
+    again = cache._by_season("weekly", [2022, 2023, 2024], _fetcher(calls), columns=["season", "x"])
+    assert calls == [[2022, 2023, 2024], [2024]]  # only the live season is refetched once stale
+    assert len(first) == len(again) == 6
+    assert list(again.columns) == ["season", "x"]
+
+def test_past_season_cached_before_it_ended_still_expires(cache_dir, monkeypatch):
+    monkeypatch.setattr(cache, "NFL_CACHE_TTL_HOURS", 0)
+    calls = []
+    cache._by_season("weekly", [2023], _fetcher(calls))
+    written = cache._season_end(2023) - 86400  # cached in February, before corrections landed
+    os.utime(cache._path("weekly", 2023), (written, written))
+    cache._by_season("weekly", [2023], _fetcher(calls))
+    cache._by_season("weekly", [2023], _fetcher(calls))
+    assert calls == [[2023], [2023]]  # refetched once, then immutable
+
+def test_cache_only_mode(cache_dir, monkeypatch):
+    calls = []
+    cache._by_season("weekly", [2023], _fetcher(calls))
+    monkeypatch.setattr(cache, "NFL_CACHE_MODE", "only")
+    assert len(cache._by_season("weekly", [2023], _fetcher(calls))) == 2
+    with pytest.raises(FileNotFoundError):
+        cache._by_season("weekly", [2022], _fetcher(calls))
+    assert calls == [[2023]]
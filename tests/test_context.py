@@ -0,0 +1,20 @@
+import pandas as pd
+import context
+
+def test_rosters_loaded_once_and_shared(monkeypatch):
+    calls = []
+    def fake_rosters(years, columns=None):
+        calls.append(list(years))
+        return pd.DataFrame({
+            "player_id": ["p1", "p1", "p2", None],
+            "player_name": [" Pat Mahomes", "Pat Mahomes", "Travis Kelce", "Nobody"],
+            "team": ["KC", "KC", "KC", "KC"],
+            "position": ["QB", "QB", None, "WR"],
+            "season": [2023, 2024, 2024, 2024],
+        })
+    monkeypatch.setattr(context, "load_seasonal_rosters", fake_rosters)
+    ctx = context.RunContext([2024, 2023])
+    assert ctx.resolver == {"pat mahomes|KC|QB": "p1", "travis kelce|KC|": "p2"}
+    assert list(ctx.roster_key_map.columns) == ["k", "player_id"]
+    assert len(ctx.rosters) == 3
+    assert calls == [[2023, 2024]]
@@ -9,3 +9,141 @@ def test_database_connection():
         con.execute("SELECT 1")
     ensure_schema(engine)
     create_tables(engine)
+
+def test_copy_from_dataframe_streams_in_chunks():
+    import pandas as pd
+    from db import copy_from_dataframe
+
+    df = pd.DataFrame({
+        "player_id": [f"p{i}" for i in range(7)],
+        "player_name": ["A, Jr.", 'B "Bo"', None, "Ü", "E", "F", "G"],
+        "yards": [1.5, None, 3.0, 4.0, 5.0, 6.0, 7.0],
+        "current_roster_only": [True, False, True, False, True, False, True],
+    })
+    expected = df.assign(current_roster_only=df["current_roster_only"].map({True: "t", False: "f"})) \
+                 .to_csv(index=False, header=False, na_rep="\\N").encode("utf-8")
+    seen = {}
+
+    class Cursor:
+        def __enter__(self): return self
+        def __exit__(self, *exc): pass
+        def copy_expert(self, sql, f, size=8192):
+            seen["sql"], chunks = sql, []
+            while data := f.read(5):
+                chunks.append(data)
+            seen["data"] = b"".join(chunks)
+
+    conn = type("Conn", (), {"connection": type("Raw", (), {"cursor": lambda self: Cursor()})()})()
+    sent = copy_from_dataframe(conn, df, "tmp_x", chunk_rows=3)
+    assert seen["data"] == expected
+    assert sent == len(expected)
+    assert seen["sql"].startswith("COPY tmp_x (player_id,player_name,yards,current_roster_only) FROM STDIN")
+    assert df["current_roster_only"].dtype == bool  # caller's frame is left untouched
+
+def test_shard_frame_keeps_keys_together():
+    import pandas as pd
+    import db
+    df = pd.DataFrame({"season": [2020] * 5 + [2021] * 3 + [2022] * 2, "k": range(10)})
+    by_season = db.shard_frame(df, 2, ["season", "k"])
+    assert sorted(len(s) for s in by_season) == [5, 5]  # 2020 | 2021+2022
+    assert not set(by_season[0]["season"]) & set(by_season[1]["season"])
+
+    one_season = pd.DataFrame({"season": 2024, "k": list(range(100)) * 2})
+    shards = db.shard_frame(one_season, 4, ["season", "k"])
+    assert sum(map(len, shards)) == 200 and len(shards) <= 4
+    keys = [set(s["k"]) for s in shards]
+    assert all(not (a & b) for i, a in enumerate(keys) for b in keys[i + 1:])
+
+def test_parallel_write_only_splits_large_frames():
+    import pandas as pd
+    import db
+    calls = []
+    write = lambda engine, shard: calls.append(len(shard)) or len(shard)
+    df = pd.DataFrame({"season": [2021, 2022, 2023, 2024] * 25, "k": range(100)})
+    assert db.parallel_write(None, df, write, ["k"], "t", workers=4, min_rows=60) == [100]
+    calls.clear()
+    assert sum(db.parallel_write(None, df, write, ["k"], "t", workers=4, min_rows=25)) == 100
+    assert sorted(calls) == [25, 25, 25, 25]
+
+class _Result:
+    def __init__(self, row=None, rowcount=0):
+        self._row, self.rowcount = row, rowcount
+    def one(self):
+        return self._row
+
+class _RecordingCon:
+    def __init__(self, row, deleted=0):
+        self.sql, self._row, self._deleted = [], row, deleted
+    def execute(self, sql, params=None):
+        self.sql.append(str(sql))
+        return _Result(self._row) if len(self.sql) == 1 else _Result(rowcount=self._deleted)
+
+def test_merge_from_temp_counts_and_only_rewrites_changed_rows():
+    import db
+    con = _RecordingCon((7, 5, 10))  # 7 keys already stored, 5 rows written, 10 in the batch
+    counts = db.merge_from_temp(con, "fact_player_timeslot", "tmp_f", ["k", "season", "week", "v"], ["k", "season", "week"])
+    assert counts == {"inserted": 3, "updated": 2, "unchanged": 5, "deleted": 0}
+    assert len(con.sql) == 1
+    assert "md5(ROW(t.v)::text)::uuid" in con.sql[0]
+    assert "WHERE d.row_hash IS DISTINCT FROM EXCLUDED.row_hash" in con.sql[0]
+
+    con = _RecordingCon((10, 0, 10), deleted=4)
+    counts = db.merge_from_temp(con, "fact_player_timeslot", "tmp_f", ["k", "season", "week", "v"], ["k", "season", "week"],
+                                delete_missing=True)
+    assert counts == {"inserted": 0, "updated": 0, "unchanged": 10, "deleted": 4}
+    assert con.sql[1].lstrip().startswith("DELETE") and "SELECT DISTINCT season, week FROM tmp_f" in con.sql[1]
+
+def test_bulk_upsert_copies_deduped_rows_and_skips_unchanged(monkeypatch):
+    import contextlib
+    import pandas as pd
+    import db
+    copied, sql = [], []
+    class Con:
+        def execute(self, stmt, params=None):
+            sql.append(str(stmt))
+            return type("R", (), {"scalar": lambda self: 2})()
+    class Engine:
+        @contextlib.contextmanager
+        def begin(self):
+            yield Con()
+    monkeypatch.setattr(db, "copy_from_dataframe", lambda con, df, table: copied.append((table, df)))
+    df = pd.DataFrame({"team_name": ["old", "Chiefs", "Bills"], "team_abbr": ["KC", "KC", "BUF"], "extra": 1})
+    assert db.bulk_upsert(Engine(), df, "dim_team", ["team_abbr"], ["team_name"]) == 2
+    table, sent = copied[0]
+    assert table == "tmp_dim_team" and list(sent.columns) == ["team_abbr", "team_name"]
+    assert sent.values.tolist() == [["KC", "Chiefs"], ["BUF", "Bills"]]
+    assert "WHERE (d.team_name) IS DISTINCT FROM (EXCLUDED.team_name)" in " ".join(sql[1].split())
+    assert db.bulk_upsert(Engine(), df.iloc[0:0], "dim_team", ["team_abbr"], ["team_name"]) == 0 and len(sql) == 2
+
+def test_migrate_is_a_single_query_when_up_to_date():
+    import contextlib
+    import db
+    sql = []
+    class Con:
+        def execute(self, stmt, params=None):
+            sql.append(str(stmt))
+            return type("R", (), {"scalar": lambda self: db.MIGRATIONS[-1][0]})()
+    class Engine:
+        @contextlib.contextmanager
+        def connect(self):
+            yield Con()
+    assert db.migrate(Engine()) == 0
+    assert len(sql) == 1 and "schema_version" in sql[0]
+    versions = [m[0] for m in db.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+    assert {m[1] for m in db.MIGRATIONS if m[3]} == {f"index {name}" for name in db.INDEXES}
+
+def test_migration_1_is_frozen_at_its_released_layout():
+    import db
+    sql = []
+    class Con:
+        def execute(self, stmt, params=None):
+            sql.append(str(stmt))
+    step = next(m for m in db.MIGRATIONS if m[0] == 1)[2]
+    step(Con())
+    ddl = " ".join(sql[0].split())
+    # the props key has since gained line_value (migration 13); migration 1 must not follow _tables_ddl()
+    assert "PRIMARY KEY (game_id, book, player_name, market, ts)" in ddl or \
+           "PRIMARY KEY (game_id, book, player_name, market, ts, season)" in ddl
+    assert "line_value" not in ddl.split("fact_player_prop_lines")[1].split("PRIMARY KEY")[1].split(")")[0]
+    assert f"CREATE TABLE IF NOT EXISTS {db.DB_SCHEMA}.load_audit" in ddl
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import features
+from db import FEATURE_STATS
+
+def _history():
+    games = [("a", 2023, w, "KC", "BUF" if w % 2 else "LV", "WR", y) for w, y in zip(range(1, 7), [10, 20, 30, 40, 50, 60])]
+    games += [("b", 2023, w, "BUF", "KC", "WR", 5.0 * w) for w in range(1, 4)]
+    games += [("a", 2024, 1, "KC", "LV", "WR", 100)]
+    h = pd.DataFrame(games, columns=["player_id", "season", "week", "team_abbr", "opponent_abbr", "position", "receiving_yards"])
+    h["game_id"] = "g"
+    for c in FEATURE_STATS:
+        if c != "receiving_yards":
+            h[c] = 0.0
+    h["receiving_yards"] = h["receiving_yards"].astype(float)
+    return h.sample(frac=1, random_state=0)  # build_features sorts itself
+
+def _allowed(h):
+    return h.groupby(["season", "week", "opponent_abbr", "position"], as_index=False)[FEATURE_STATS].sum()
+
+def test_rolling_season_and_ewm_features_use_only_earlier_games():
+    h = _history()
+    f = features.build_features(h, _allowed(h), (2023, 1)).set_index(["player_id", "season", "week"])
+    a = f.loc["a"]
+    assert np.isnan(a.loc[(2023, 1), "receiving_yards_l3"])
+    assert a.loc[(2023, 4), "receiving_yards_l3"] == 20.0          # games 1-3
+    assert a.loc[(2023, 6), "receiving_yards_l5"] == 30.0          # games 1-5
+    assert a.loc[(2024, 1), "receiving_yards_l3"] == 50.0          # rolls across seasons
+    assert np.isnan(a.loc[(2024, 1), "receiving_yards_season_avg"]) # season-to-date restarts
+    assert a.loc[(2023, 3), "receiving_yards_season_avg"] == 15.0
+    expected_ewm = pd.Series([10, 20, 30, 40, 50, 60.0]).ewm(span=features.EWM_SPAN).mean().iloc[-1]
+    assert np.isclose(a.loc[(2024, 1), "receiving_yards_ewm"], expected_ewm)
+    assert list(a["games_prior"]) == list(range(7))
+
+def test_changing_a_game_never_changes_features_of_that_game_or_earlier():
+    h = _history()
+    base = features.build_features(h, _allowed(h), (2023, 1))
+    h2 = h.copy()
+    h2.loc[(h2["player_id"] == "a") & (h2["week"] == 4) & (h2["season"] == 2023), "receiving_yards"] = 999.0
+    moved = features.build_features(h2, _allowed(h2), (2023, 1))
+    upto = (base["season"] == 2023) & (base["week"] <= 4)
+    pd.testing.assert_frame_equal(base[upto], moved[upto])
+    assert not base[~upto & (base["player_id"] == "a")].equals(moved[~upto & (moved["player_id"] == "a")])
+
+def test_opponent_allowed_is_season_to_date_for_the_defense_faced():
+    h = _history()
+    f = features.build_features(h, _allowed(h), (2023, 1)).set_index(["player_id", "season", "week"])
+    # a faced LV in weeks 2, 4, 6: LV had allowed 20 then (20 + 40) / 2 to WRs before weeks 4 and 6
+    assert np.isnan(f.loc[("a", 2023, 2), "receiving_yards_opp_allowed"])
+    assert f.loc[("a", 2023, 4), "receiving_yards_opp_allowed"] == 20.0
+    assert f.loc[("a", 2023, 6), "receiving_yards_opp_allowed"] == 30.0
+    # b faced KC every week; nobody else did
+    assert f.loc[("b", 2023, 3), "receiving_yards_opp_allowed"] == 7.5
+
+def test_only_rows_from_since_are_returned():
+    h = _history()
+    f = features.build_features(h, _allowed(h), (2023, 5))
+    assert sorted(zip(f["season"], f["week"])) == [(2023, 5), (2023, 6), (2024, 1)]
+    assert f.loc[f["week"] == 6, "receiving_yards_l3"].item() == 40.0  # history before since still counts
+    parts = pd.DataFrame({"season": [2024, 2023, 2023], "week": [1, 6, 4]})  # partitions a load rewrote
+    assert features.features_from(parts) == (2023, 4)
+    assert features.features_from(parts.iloc[0:0]) is None
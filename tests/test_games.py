@@ -0,0 +1,27 @@
+import pandas as pd
+from games import GameIndex
+
+def _index():
+    return GameIndex(pd.DataFrame({
+        "season": [2023, 2023, 2024, 2024],
+        "week": [1, 12, 3, 9],
+        "home_team": ["KC", "KC", "KC", "LV"],
+        "away_team": ["LV", "LV", "LV", "KC"],
+        "game_date": pd.to_datetime(["2023-09-10", "2023-11-26", "2024-09-22", "2024-11-03"], utc=True),
+        "game_id": ["2023_01_KC_LV", "2023_12_KC_LV", "2024_03_KC_LV", "2024_09_LV_KC"],
+    }))
+
+def test_team_games_has_both_sides():
+    idx = _index()
+    assert len(idx.team_games) == 8
+    assert set(idx.team_games.loc[idx.team_games["game_id"] == "2024_09_LV_KC", "team"]) == {"KC", "LV"}
+
+def test_nearest_matchup_by_date():
+    idx = _index()
+    assert idx.nearest("KC", "LV", "2024-09-23T00:20:00Z") == (2024, 3, "2024_03_KC_LV")
+    assert idx.nearest("KC", "LV", "2023-11-25T18:00:00Z") == (2023, 12, "2023_12_KC_LV")
+    assert idx.nearest("KC", "LV", "2030-01-01") is None          # not on the schedule
+    assert idx.nearest("KC", "LV", "2024-09-27") is None          # too far from any kickoff
+    assert idx.nearest("KC", "LV", "2024-09-27", max_days=7) == (2024, 3, "2024_03_KC_LV")
+    assert idx.nearest("KC", "LV", None) == (2023, 1, "2023_01_KC_LV")
+    assert idx.nearest("LV", "DEN", "2024-09-22") is None
@@ -5,3 +5,16 @@ def test_normalize_book_name():
     assert _normalize_book_name("Fan duel") == "FanDuel"
     assert _normalize_book_name("Fanatics Sportsbook") == "Fanatics"
     assert _normalize_book_name("Other") == "Other"
+
+def test_lines_stage_skips_an_empty_fetch(monkeypatch):
+    import types
+    import pandas as pd
+    import main
+    written = []
+    monkeypatch.setattr(main, "load_vegas_lines", lambda years, games: pd.DataFrame())
+    monkeypatch.setattr(main, "upsert_lines", lambda engine, df, **kw: written.append(df))
+    monkeypatch.setattr(main, "delete_seasons", lambda *a: written.append(a))
+    ctx = types.SimpleNamespace(games=None)
+    stage = next(s for s in main.build_stages(None, ctx) if s.name == "lines")
+    assert stage.fn(schema=True) == {"lines_loaded": 0}
+    assert written == []
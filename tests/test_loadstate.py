@@ -0,0 +1,25 @@
+import pandas as pd
+from loadstate import partition_hashes
+
+def _frame():
+    return pd.DataFrame({
+        "season": [2023, 2023, 2024, 2024],
+        "week": [1, 1, 1, 2],
+        "player_id": ["a", "b", "a", "a"],
+        "yards": [10.0, 20.0, None, 5.0],
+    })
+
+def test_partition_hashes_are_order_independent():
+    df = _frame()
+    a = partition_hashes(df)
+    b = partition_hashes(df.iloc[::-1].reset_index(drop=True))
+    assert a[["season", "week"]].values.tolist() == [[2023, 1], [2024, 1], [2024, 2]]
+    assert a["row_count"].tolist() == [2, 1, 1]
+    pd.testing.assert_frame_equal(a, b)
+
+def test_partition_hashes_only_change_for_edited_partition():
+    df = _frame()
+    edited = df.copy()
+    edited.loc[3, "yards"] = 6.0
+    a, b = partition_hashes(df), partition_hashes(edited)
+    assert (a["content_hash"] == b["content_hash"]).tolist() == [True, True, False]
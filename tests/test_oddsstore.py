@@ -0,0 +1,38 @@
+import pytest
+import oddsstore
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(oddsstore, "ODDS_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(oddsstore, "ODDS_REPLAY_AT", "")
+    return tmp_path
+
+def _live(calls, payload):
+    def live():
+        calls.append(payload)
+        return payload
+    return live
+
+def test_record_then_replay(store, monkeypatch):
+    calls = []
+    monkeypatch.setattr(oddsstore, "ODDS_STORE_MODE", "record")
+    oddsstore.fetch("event_odds", _live(calls, {"v": 1}), "e1", ["b", "a"])
+    oddsstore.fetch("event_odds", _live(calls, {"v": 2}), "e1", ["a", "b"])
+    monkeypatch.setattr(oddsstore, "ODDS_STORE_MODE", "replay")
+    assert oddsstore.fetch("event_odds", _live(calls, {"v": 3}), "e1", ["a", "b"]) == {"v": 2}
+    assert len(calls) == 2
+    with pytest.raises(FileNotFoundError):
+        oddsstore.fetch("event_odds", _live(calls, {"v": 3}), "e2", ["a", "b"])
+    monkeypatch.setattr(oddsstore, "ODDS_REPLAY_AT", "2000-01-01T00:00:00Z")
+    with pytest.raises(FileNotFoundError):
+        oddsstore.fetch("event_odds", _live(calls, {"v": 3}), "e1", ["a", "b"])
+
+def test_ttl_serves_fresh_snapshot(store, monkeypatch):
+    calls = []
+    monkeypatch.setattr(oddsstore, "ODDS_STORE_MODE", "ttl")
+    monkeypatch.setattr(oddsstore, "ODDS_STORE_TTL_MIN", 10)
+    assert oddsstore.fetch("events", _live(calls, [1])) == [1]
+    assert oddsstore.fetch("events", _live(calls, [2])) == [1]
+    monkeypatch.setattr(oddsstore, "ODDS_STORE_TTL_MIN", 0)
+    assert oddsstore.fetch("events", _live(calls, [3])) == [3]
+    assert calls == [[1], [3]]
@@ -0,0 +1,39 @@
+import threading
+import pytest
+from pipeline import Stage, select_stages, run_stages
+
+def _stages(log, barrier=None):
+    def step(name, outputs=()):
+        def fn(**inputs):
+            if barrier is not None and name in ("lines", "weekly"):
+                barrier.wait(timeout=5)  # only passes if both run at the same time
+            log.append(name)
+            return {o: f"{name}:{o}" for o in outputs}
+        return fn
+    return [
+        Stage("schema", step("schema", ("schema",)), (), ("schema",)),
+        Stage("weekly", step("weekly", ("weekly",)), (), ("weekly",)),
+        Stage("facts", step("facts", ("fact",)), ("weekly",), ("fact",)),
+        Stage("fact_load", step("fact_load"), ("schema", "fact")),
+        Stage("lines", step("lines"), ("schema",)),
+    ]
+
+def test_select_stages_adds_dependencies():
+    names = [s.name for s in select_stages(_stages([]), ["fact_load"])]
+    assert names == ["schema", "weekly", "facts", "fact_load"]
+    assert [s.name for s in select_stages(_stages([]), ["lines"])] == ["schema", "lines"]
+    with pytest.raises(ValueError):
+        select_stages(_stages([]), ["nope"])
+
+def test_independent_stages_overlap_and_respect_dependencies():
+    log = []
+    results = run_stages(_stages(log, threading.Barrier(2)), workers=3)
+    assert results["fact"] == "facts:fact"
+    assert log.index("weekly") < log.index("facts") < log.index("fact_load")
+    assert log.index("schema") < log.index("lines")
+
+def test_failure_propagates():
+    def boom():
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        run_stages([Stage("a", boom, (), ("x",)), Stage("b", lambda x: None, ("x",))], workers=2)
@@ -0,0 +1,87 @@
+import csv
+import io
+import numpy as np
+import pandas as pd
+import pricing
+from db import CsvCopyStream
+
+def _props():
+    rows = [
+        ("g1", "DK", "Travis Kelce", "player_rec_yds", 60.5, -110, -110),
+        ("g1", "FD", "Travis Kelce", "player_rec_yds", 60.5, +105, -125),
+        ("g1", "MGM", "Travis Kelce", "player_rec_yds", 62.5, -115, -105),
+        ("g1", "DK", "Nobody Known", "player_receptions", 4.5, -120, None),
+    ]
+    df = pd.DataFrame(rows, columns=["game_id", "book", "player_name", "market", "line_value", "over_odds", "under_odds"])
+    df["season"], df["week"], df["player_id"], df["ts"] = 2024, 1, None, pd.Timestamp("2024-09-08", tz="UTC")
+    return df
+
+def _projections():
+    return pd.DataFrame({"name_key": ["travis kelce"], "player_id": ["00-1"], "receiving_yards": [70.5], "receptions": [6.0]})
+
+def test_implied_probabilities_from_american_odds():
+    p = pricing.implied_prob([-110, 150, 100, np.nan, 50])
+    assert np.allclose(p[:3], [110 / 210, 0.4, 0.5])
+    assert np.isnan(p[3]) and np.isnan(p[4])  # missing / not American odds
+    assert np.isclose(pricing.decimal_odds([150])[0], 2.5)
+
+def test_vig_is_removed_per_book_line():
+    out = pricing.price_props(_props(), _projections())
+    dk = out.iloc[0]
+    assert np.isclose(dk["vig"], 2 * 110 / 210 - 1)
+    assert np.isclose(dk["over_fair"], 0.5) and np.isclose(dk["over_fair"] + dk["under_fair"], 1.0)
+    fd = out.iloc[1]
+    assert np.isclose(fd["over_fair"] + fd["under_fair"], 1.0) and fd["over_fair"] < 0.5
+    # consensus only averages books quoting the same line
+    assert np.isclose(dk["consensus_over_fair"], (dk["over_fair"] + fd["over_fair"]) / 2)
+    assert np.isclose(out.iloc[2]["consensus_over_fair"], out.iloc[2]["over_fair"])
+    # one-sided quotes have implied probabilities but no fair price
+    one_sided = out.iloc[3]
+    assert not np.isnan(one_sided["over_implied"]) and np.isnan(one_sided["over_fair"])
+
+def test_best_price_across_books_and_projection_edge():
+    out = pricing.price_props(_props(), _projections())
+    kelce = out[out["line_value"] == 60.5]
+    assert set(kelce["best_over_book"]) == {"FD"} and set(kelce["best_over_odds"]) == {105}
+    assert set(kelce["best_under_book"]) == {"DK"} and set(kelce["best_under_odds"]) == {-110}
+    assert (kelce["player_id"] == "00-1").all()
+    assert np.allclose(kelce["edge"], 10.0) and np.allclose(kelce["edge_pct"], 10.0 / 60.5)
+    unknown = out.iloc[3]
+    assert np.isnan(unknown["projection"]) and np.isnan(unknown["edge"])
+    assert len(out) == len(_props())
+
+def test_priced_odds_encode_as_integers_for_copy():
+    out = pricing.price_props(_props(), _projections())  # includes a one-sided quote
+    assert out["under_odds"].isna().any()
+    rows = list(csv.reader(io.StringIO(CsvCopyStream(out).read().decode("utf-8"))))
+    for c in ["over_odds", "under_odds", "best_over_odds", "best_under_odds"]:
+        values = [r[out.columns.get_loc(c)] for r in rows]
+        assert all(v == "\\N" or v.lstrip("-").isdigit() for v in values), (c, values)
+    assert [r[out.columns.get_loc("under_odds")] for r in rows] == ["-110", "-125", "-105", "\\N"]
+
+def test_pricing_stage_does_not_pull_in_the_fact_load():
+    import types
+    import main
+    from pipeline import select_stages
+    stages = main.build_stages(None, types.SimpleNamespace(games=None))
+    assert [s.name for s in select_stages(stages, ["props", "pricing"])] == ["schema", "props", "pricing"]
+
+def test_short_dim_player_names_match_full_prop_names_through_rosters():
+    class Con:
+        def __init__(self):
+            self.params = []
+        def execute(self, sql, params=None):
+            self.params.append(params)
+            rows = [("00-0033873", "P.Mahomes")] if params is None else [(k, p, *[10.0] * len(set(pricing.MARKET_STATS.values()))) for k, p in zip(params["k"], params["p"])]
+            return type("R", (), {"fetchall": lambda _: rows})()
+    rosters = pd.DataFrame({"player_id": ["00-0033873", "00-0039999"], "player_name": ["Patrick Mahomes", "Marvin Harrison Jr."]})
+    props = _props().assign(player_name=["Patrick Mahomes", "Patrick Mahomes", "Marvin Harrison", "Nobody Known"],
+                            market=["player_pass_yds"] * 3 + ["player_receptions"])
+    con = Con()
+    proj = pricing.load_projections(con, set(pricing.name_key(props["player_name"])), rosters)
+    assert dict(zip(proj["name_key"], proj["player_id"])) == {"patrick mahomes": "00-0033873", "marvin harrison": "00-0039999"}
+    # without the roster's full name the short weekly name never matches
+    assert pricing.load_projections(Con(), {"patrick mahomes"}).empty
+    out = pricing.price_props(props, proj)
+    assert out["player_id"].tolist()[:3] == ["00-0033873", "00-0033873", "00-0039999"] and pd.isna(out["player_id"].iloc[3])
+    assert out["projection"].notna().tolist() == [True, True, True, False]
@@ -0,0 +1,103 @@
+import pandas as pd
+import props
+from games import GameIndex
+
+class _Resp:
+    def __init__(self, payload, status=200, headers=None):
+        self._payload, self.status_code, self.headers = payload, status, headers or {}
+    def json(self):
+        return self._payload
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+def _event_odds(event_id):
+    return {"bookmakers": [{"title": "DraftKings", "markets": [{"key": "player_pass_yds", "outcomes": [
+        {"name": "Over", "description": f"QB {event_id}", "point": 250.5, "price": -110},
+        {"name": "Under", "description": f"QB {event_id}", "point": 250.5, "price": -120},
+    ]}]}]}
+
+def _setup(monkeypatch, workers, remaining=100, flaky=()):
+    monkeypatch.setattr(props, "THEODDS_API_KEY", "k")
+    monkeypatch.setattr(props, "PROPS_BOOKS", ["draftkings"])
+    monkeypatch.setattr(props, "PROPS_MARKETS", ["player_pass_yds"])
+    monkeypatch.setattr(props, "PROPS_MAX_WORKERS", workers)
+    monkeypatch.setattr(props.time, "sleep", lambda s: None)
+    teams = [("kansas city chiefs", "KC"), ("las vegas raiders", "LV"), ("buffalo bills", "BUF")]
+    monkeypatch.setattr(props, "team_alias_map", lambda ctx=None: dict(teams))
+    events = [{"id": "e1", "home_team": "Kansas City Chiefs", "away_team": "Las Vegas Raiders", "commence_time": "2024-09-08T17:00:00Z"},
+              {"id": "e2", "home_team": "Buffalo Bills", "away_team": "Kansas City Chiefs", "commence_time": "2024-09-09T00:20:00Z"},
+              {"id": "e3", "home_team": "Las Vegas Raiders", "away_team": "Buffalo Bills", "commence_time": "2024-09-09T20:00:00Z"}]
+    state = {"remaining": remaining, "calls": []}
+
+    def fake_get(url, timeout):
+        if "/events/?" in url:
+            return _Resp(events, headers={"x-requests-remaining": str(state["remaining"])})
+        event_id = url.split("/events/")[1].split("/")[0]
+        state["calls"].append(event_id)
+        if event_id in flaky and state["calls"].count(event_id) == 1:
+            return _Resp({}, status=429)
+        state["remaining"] -= 1
+        return _Resp(state.get("odds", _event_odds)(event_id), headers={"x-requests-remaining": str(state["remaining"]), "x-requests-used": "7"})
+
+    monkeypatch.setattr(props, "_session", lambda: type("S", (), {"get": staticmethod(fake_get)})())
+    sched = pd.DataFrame({"season": [2024] * 3, "week": [1] * 3, "home_team": ["KC", "BUF", "LV"], "away_team": ["LV", "KC", "BUF"],
+                          "game_date": pd.to_datetime(["2024-09-08", "2024-09-08", "2024-09-09"], utc=True),
+                          "game_id": ["g1", "g2", "g3"]})
+    return GameIndex(sched), state
+
+def test_concurrent_fetch_matches_serial(monkeypatch):
+    sched, _ = _setup(monkeypatch, workers=1)
+    serial = props.fetch_player_props_from_theodds([2024], sched).drop(columns="ts")
+    sched, state = _setup(monkeypatch, workers=3, flaky=("e2",))
+    concurrent = props.fetch_player_props_from_theodds([2024], sched).drop(columns="ts")
+    pd.testing.assert_frame_equal(serial, concurrent)
+    assert concurrent["game_id"].tolist() == ["g1", "g2", "g3"]
+    assert concurrent["over_odds"].tolist() == [-110] * 3
+    assert state["calls"].count("e2") == 2  # retried after the 429
+    assert props.fetch_player_props_from_theodds([2024], sched)["ts"].nunique() == 1
+
+def test_fetch_stops_at_quota_reserve(monkeypatch):
+    sched, state = _setup(monkeypatch, workers=1, remaining=3)
+    monkeypatch.setattr(props, "PROPS_QUOTA_RESERVE", 1)
+    df = props.fetch_player_props_from_theodds([2024], sched)
+    assert df["game_id"].tolist() == ["g1", "g2"]
+    assert state["calls"] == ["e1", "e2"] and state["remaining"] == 1
+
+def test_alternate_lines_are_all_kept(monkeypatch):
+    def alt_odds(event_id, order=1):
+        outcomes = [{"name": side, "description": "QB", "point": point, "price": price}
+                    for point, prices in [(250.5, (-110, -120)), (270.5, (150, -180))]
+                    for side, price in zip(["Over", "Under"], prices)]
+        outcomes.append({"name": "Yes", "description": "QB", "price": 300})  # no point: yes/no market
+        return {"bookmakers": [{"title": "DraftKings", "markets": [{"key": "player_pass_yds", "outcomes": outcomes[::order]}]}]}
+    sched, state = _setup(monkeypatch, workers=1)
+    state["odds"] = alt_odds
+    first = props.fetch_player_props_from_theodds([2024], sched)
+    state["odds"] = lambda e: alt_odds(e, order=-1)  # the book returns its outcomes in another order
+    flipped = props.fetch_player_props_from_theodds([2024], sched)
+    key = ["game_id", "line_value", "over_odds", "under_odds"]
+    assert sorted(first[key].itertuples(index=False)) == sorted(flipped[key].itertuples(index=False))
+    assert first.loc[first["game_id"] == "g1", "line_value"].tolist() == [250.5, 270.5]
+
+def _poll(*lines):
+    return pd.DataFrame([("g1", "DK", "QB", "player_pass_yds", lv, o, u) for lv, o, u in lines],
+                        columns=["game_id", "book", "player_name", "market", "line_value", "over_odds", "under_odds"])
+
+def test_a_line_moving_back_is_stored():
+    stored = _poll((48.5, -110, -110))
+    moved = _poll((49.5, -110, -110))
+    assert props.changed_lines(moved, stored).all()
+    back = _poll((48.5, -110, -110))
+    assert props.changed_lines(back, moved).all()  # compared with the 49.5 snapshot, not the old 48.5 row
+    assert not props.changed_lines(back, stored).any()
+
+def test_groups_are_stored_whole_when_any_line_changes():
+    stored = _poll((48.5, -110, -110), (52.5, 150, -180))
+    assert not props.changed_lines(_poll((52.5, 150, -180), (48.5, -110, -110)), stored).any()  # order does not matter
+    assert props.changed_lines(_poll((48.5, -110, -110), (52.5, 145, -175)), stored).all()      # odds moved on one line
+    assert props.changed_lines(_poll((48.5, -110, -110)), stored).all()                         # alternate line pulled
+    assert props.changed_lines(_poll((48.5, -110, None)), _poll((48.5, -110, -110))).all()      # one side pulled
+    other = _poll((10.5, -110, -110)).assign(player_name="WR")
+    mask = props.changed_lines(pd.concat([_poll((48.5, -110, -110), (52.5, 150, -180)), other], ignore_index=True), stored)
+    assert mask.tolist() == [False, False, True]
@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+from props_daemon import parse_cadence, poll_interval, due_events
+
+def test_cadence_tightens_toward_kickoff():
+    cadence = parse_cadence("24:1800,2:300,*:3600")
+    assert [poll_interval(h, cadence) for h in (0.5, 2, 3, 24, 72)] == [300, 300, 1800, 1800, 3600]
+    with pytest.raises(ValueError):
+        parse_cadence("2:300")
+
+def test_due_events_skip_started_and_not_yet_due():
+    now = pd.Timestamp("2024-09-08T16:00:00Z")
+    events = [{"id": "started", "commence_time": "2024-09-08T15:00:00Z"},
+              {"id": "waiting", "commence_time": "2024-09-08T17:00:00Z"},
+              {"id": "due", "commence_time": "2024-09-08T20:00:00Z"},
+              {"id": "new", "commence_time": "2024-09-15T17:00:00Z"}]
+    next_due = {"waiting": now + pd.Timedelta(minutes=1), "due": now - pd.Timedelta(seconds=1)}
+    assert [e["id"] for e in due_events(events, next_due, now)] == ["due", "new"]
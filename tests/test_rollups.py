@@ -0,0 +1,28 @@
+import pandas as pd
+import rollups
+from db import ROLLUPS, ROLLUP_STATS
+
+def test_touched_players_only_covers_rewritten_partitions_and_their_previous_players():
+    fact = pd.DataFrame({
+        "player_id": ["a", "a", "a", "b", "c"],
+        "season": [2023, 2023, 2024, 2023, 2023],
+        "week": [1, 1, 1, 2, 3],
+        "time_slot": ["Thursday", "Monday", "Monday", "Monday", "Monday"],
+    })
+    parts = pd.DataFrame({"season": [2023, 2024], "week": [1, 1]})
+    assert rollups.touched_players(fact, parts).values.tolist() == [["a", 2023], ["a", 2024]]
+    # "d" had a row in a rewritten partition that the reload deleted
+    stored = [pd.DataFrame({"player_id": ["a", "d"], "season": [2023, 2023]})]
+    assert rollups.touched_players(fact, parts, stored).values.tolist() == [["a", 2023], ["a", 2024], ["d", 2023]]
+    assert rollups.touched_players(fact, parts.iloc[0:0]).empty
+
+def test_refresh_sql_rebuilds_only_touched_players_with_weighted_averages():
+    for table, split in ROLLUPS.items():
+        sql = " ".join(rollups._refresh_sql(table, split).split())
+        assert f"GROUP BY f.player_id, f.season, {', '.join('f.' + c for c in split)}" in sql
+        assert "JOIN tmp_rollup_touched t ON t.player_id = f.player_id AND t.season = f.season" in sql
+        for c in ROLLUP_STATS:
+            assert f"sum(f.{c}_avg * f.games_played) / nullif(sum(f.games_played), 0)" in sql
+
+def test_refresh_rollups_without_touched_players_does_nothing():
+    assert rollups.refresh_rollups(None, pd.DataFrame(columns=["player_id", "season"])) == 0
@@ -0,0 +1,56 @@
+import json
+import time
+import pandas as pd
+import pytest
+import telemetry
+from pipeline import Stage, run_stages
+
+def test_stage_records_split_rows_and_json(monkeypatch):
+    lines = []
+    run = telemetry.Run()
+    monkeypatch.setattr(run._json, "info", lines.append)
+
+    def load():
+        with telemetry.timed("fetch"):
+            time.sleep(0.02)
+        with telemetry.timed("db"):
+            time.sleep(0.01)
+        telemetry.add(copy_bytes=123)
+        return {"df": pd.DataFrame({"a": range(5)})}
+
+    def shrink(df):
+        return {"small": df.head(2)}
+
+    run_stages([Stage("load", load, (), ("df",)), Stage("shrink", shrink, ("df",), ("small",))],
+               workers=2, telemetry=run)
+
+    by = {s.stage: s for s in run.stages}
+    assert by["load"].fetch_s >= 0.02 and by["load"].db_s >= 0.01
+    assert by["load"].wall_s >= by["load"].fetch_s + by["load"].db_s
+    assert by["load"].copy_bytes == 123 and by["load"].rows_out == 5
+    assert (by["shrink"].rows_in, by["shrink"].rows_out) == (5, 2)
+    rec = [json.loads(l) for l in lines]
+    assert {r["stage"] for r in rec} == {"load", "shrink"}
+    assert all(r["run_id"] == run.run_id for r in rec)
+
+def test_failed_stage_is_recorded(monkeypatch):
+    run = telemetry.Run()
+    monkeypatch.setattr(run._json, "info", lambda msg: None)
+    def boom():
+        raise RuntimeError("bad data")
+    with pytest.raises(RuntimeError):
+        run_stages([Stage("boom", boom)], telemetry=run)
+    assert run.stages[0].status == "failed" and "bad data" in run.stages[0].error
+
+def test_counters_outside_a_stage_are_ignored():
+    telemetry.add(rows_out=10)
+    with telemetry.timed("db"):
+        pass
+
+def test_profile_dump(monkeypatch, tmp_path):
+    monkeypatch.setattr(telemetry, "PROFILE_STAGES", True)
+    monkeypatch.setattr(telemetry, "PROFILE_DIR", str(tmp_path))
+    run = telemetry.Run()
+    monkeypatch.setattr(run._json, "info", lambda msg: None)
+    run_stages([Stage("work", lambda: sum(range(1000)) and None)], telemetry=run)
+    assert (tmp_path / f"{run.run_id}-work.prof").exists()
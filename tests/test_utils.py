@@ -1,6 +1,6 @@
 import math
 import pandas as pd
-from utils import mk_game_id, time_slot, coerce_numeric
+from utils import mk_game_id, mk_game_ids, time_slot, time_slots, coerce_numeric
 
 def test_mk_game_id():
     assert mk_game_id(2024, 1, "KC", "LV") == "2024_01_KC_LV"
@@ -20,3 +20,15 @@ def test_coerce_numeric():
     coerce_numeric(df, ["a"])
     assert df["a"].iloc[0] == 1.0
     assert math.isnan(df["a"].iloc[1])
+
+def test_mk_game_ids_matches_scalar():
+    sched = pd.DataFrame({"season": [2024, 2015], "week": [1, 17], "home": ["KC", "NE"], "away": ["LV", "NYJ"]})
+    got = mk_game_ids(sched["season"], sched["week"], sched["home"], sched["away"])
+    assert got.tolist() == [mk_game_id(*r) for r in sched.itertuples(index=False)]
+
+def test_time_slots_matches_scalar():
+    days = ["Sunday"] * 26 + ["Monday", "Thursday", "Saturday", "Wednesday", None, "Sunday", "Monday"]
+    hours = list(range(24)) + [12.5, 13.9] + [20, 20, 16, 12, 13, None, float("nan")]
+    got = time_slots(pd.Series(days, dtype=object), pd.Series(hours, dtype=float))
+    assert isinstance(got.dtype, pd.CategoricalDtype)
+    assert got.astype(str).tolist() == [time_slot(d, h) for d, h in zip(days, hours)]
@@ -0,0 +1,91 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from weekly import resolve_player_ids
+
+def _reference(row, resolver):
+    # the original row-wise resolver from main.py; ids must not drift from it
+    pid = row.get('player_id')
+    if pd.notna(pid) and str(pid).strip() not in ("", "None", "nan"):
+        return str(pid)
+    name = str(row.get('player_name','')).lower().strip()
+    team = str(row.get('team','') or row.get('team_abbr',''))
+    pos  = str(row.get('position','') or '')
+    k = f"{name}|{team}|{pos}"
+    if resolver and k in resolver and pd.notna(resolver[k]):
+        return str(resolver[k])
+    basis = f"{row.get('player_name','unknown')}|{row.get('season')}|{row.get('week')}|{team}|{row.get('opponent')}"
+    return "legacy_" + hashlib.sha1(basis.encode("utf-8")).hexdigest()[:16]
+
+def test_resolve_player_ids_matches_rowwise():
+    wk = pd.DataFrame({
+        "player_id":   ["00-1", None, "", "nan", np.nan, " None ", None, None],
+        "player_name": ["A", " Pat Mahomes ", "Travis Kelce", "X", None, "Y", "Z", "Pat Mahomes"],
+        "team":        ["KC", "KC", "KC", None, "LV", np.nan, "", "KC"],
+        "position":    ["QB", "QB", None, "WR", np.nan, "TE", "RB", "RB"],
+        "opponent":    ["LV", "LV", "LV", "DEN", None, "SF", "BUF", "LV"],
+        "season":      [2024, 2024, 2024, 2023, 2023, 2022, 2022, 2024],
+        "week":        [1, 1, 1, 2, 3, 4, 5, 1],
+        "fantasy":     [1.5, 2.0, 0.0, np.nan, 3.0, 1.0, 2.0, 1.0],
+    })
+    resolver = {"pat mahomes|KC|QB": "00-2", "travis kelce|KC|": "00-3", "y|nan|TE": float("nan")}
+    expected = wk.apply(lambda r: _reference(r, resolver), axis=1).astype(str)
+    got = resolve_player_ids(wk, resolver)
+    assert got.tolist() == expected.tolist()
+    assert got.tolist()[:2] == ["00-1", "00-2"]
+
+def test_load_weekly_with_timeslot_is_projected_and_typed(monkeypatch):
+    import weekly
+    from context import RunContext
+    from games import GameIndex
+    requested = []
+    def fake_load_weekly(years, columns=None):
+        requested.append(columns)
+        return pd.DataFrame({
+            "season": [2024, 2024], "week": [1, 1], "player_id": ["00-1", None],
+            "player_name": ["P.Mahomes", "T.Kelce"], "position": ["QB", "TE"],
+            "recent_team": ["KC", "KC"], "opponent_team": ["BAL", "BAL"],
+            "passing_yards": [291.0, 0.0], "receiving_tds": [0.0, 1.0], "headshot_url": ["u", "v"],
+        })
+    monkeypatch.setattr(weekly, "load_weekly", fake_load_weekly)
+    ctx = RunContext([2024])
+    ctx.__dict__["games"] = GameIndex(pd.DataFrame({
+        "season": [2024], "week": [1], "home_team": ["KC"], "away_team": ["BAL"],
+        "game_date": [pd.Timestamp("2024-09-05 20:20", tz="UTC")], "game_id": ["2024_01_KC_BAL"],
+    }))
+
+    wk = weekly.load_weekly_with_timeslot([2024], ctx)
+    assert requested == [weekly.WEEKLY_COLUMNS]
+    assert "headshot_url" not in wk.columns
+    assert (wk["season"].dtype, wk["week"].dtype) == ("int16", "int8")
+    for c in ["team", "opponent", "position", "player_name", "time_slot"]:
+        assert isinstance(wk[c].dtype, pd.CategoricalDtype), c
+    assert wk["time_slot"].tolist() == ["Thursday", "Thursday"]
+    assert wk["total_touchdowns"].tolist() == [0.0, 1.0]
+
+def test_iter_weekly_seasons_yields_in_order_with_bounded_prefetch(monkeypatch):
+    import threading
+    import time
+    import weekly
+    fetched, in_flight, peak = [], [0], [0]
+    lock = threading.Lock()
+    def fake_load_weekly(years, columns=None):
+        with lock:
+            fetched.append(years[0])
+            if years[0] == 2022:
+                return pd.DataFrame()  # empty seasons are dropped, never transformed
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        return pd.DataFrame({"season": years, "week": [1]})
+    def fake_with_timeslot(raw, ctx):
+        time.sleep(0.02)  # slow transform: an unbounded prefetch would run ahead meanwhile
+        with lock:
+            in_flight[0] -= 1
+        return raw
+    monkeypatch.setattr(weekly, "load_weekly", fake_load_weekly)
+    monkeypatch.setattr(weekly, "with_timeslot", fake_with_timeslot)
+
+    got = [s for s, _ in weekly.iter_weekly_seasons([2024, 2021, 2022, 2023], ctx=object())]
+    assert got == [2021, 2023, 2024]  # oldest first, empty seasons skipped
+    assert sorted(fetched) == [2021, 2022, 2023, 2024]
+    assert peak[0] <= 2  # current season + one prefetched
@@ -1,9 +1,17 @@
 import pandas as pd
 import numpy as np
 
+TIME_SLOTS = ["Thursday", "Monday", "Sunday Morning", "Sunday Early Window",
+              "Sunday Late Window", "Sunday Night", "Unknown"]
+
 def mk_game_id(season: int, week: int, home: str, away: str) -> str:
     return f"{int(season):04d}_{int(week):02d}_{home}_{away}"
 
+def mk_game_ids(season: pd.Series, week: pd.Series, home: pd.Series, away: pd.Series) -> pd.Series:
+    """Column-wise mk_game_id."""
+    return (season.astype(int).astype(str).str.zfill(4) + "_" + week.astype(int).astype(str).str.zfill(2)
+            + "_" + home.astype(str) + "_" + away.astype(str))
+
 def time_slot(day: str, hr: float | int | None) -> str:
     if day is None or pd.isna(hr):
         return "Unknown"
@@ -17,6 +25,17 @@ def time_slot(day: str, hr: float | int | None) -> str:
         if h >= 19:      return "Sunday Night"
     return "Unknown"
 
+def time_slots(day: pd.Series, hr: pd.Series) -> pd.Series:
+    """Column-wise time_slot, returned as a categorical over TIME_SLOTS."""
+    known = (day.notna() & hr.notna()).to_numpy()
+    h = np.trunc(pd.to_numeric(hr, errors="coerce").to_numpy(dtype=float))
+    sun = known & (day == "Sunday").to_numpy()
+    codes = np.select(
+        [known & (day == "Thursday").to_numpy(), known & (day == "Monday").to_numpy(),
+         sun & (h < 12), sun & (h == 13), sun & ((h == 15) | (h == 16)), sun & (h >= 19)],
+        [0, 1, 2, 3, 4, 5], default=6)
+    return pd.Series(pd.Categorical.from_codes(codes, TIME_SLOTS), index=day.index)
+
 def downcast_floats(df: pd.DataFrame) -> pd.DataFrame:
     fcols = df.select_dtypes(include="float").columns
     if len(fcols):
@@ -1,12 +1,60 @@
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 import pandas as pd
 import numpy as np
-import nfl_data_py as nfl
-from config import YEARS, CURRENT_YEAR, CURRENT_ROSTER_ONLY
-from utils import time_slot, mk_game_id, downcast_floats
+from config import CURRENT_ROSTER_ONLY
+from utils import time_slots, downcast_floats
+from cache import load_weekly
+from context import RunContext
+import telemetry
 
-def load_weekly_with_timeslot(years: list[int]) -> pd.DataFrame:
-    weekly = nfl.import_weekly_data(years)
+# the stats build_fact_all averages
+WEEKLY_STATS = ['passing_yards','passing_tds','interceptions','attempts','completions',
+                'rushing_yards','rushing_tds','carries','receptions','receiving_yards','receiving_tds',
+                'sacks','fumbles_recovered']
+# requested from upstream: keys under every name the feed has used, plus WEEKLY_STATS
+WEEKLY_COLUMNS = ['season','week','player_id','player_name','player_display_name','player','position',
+                  'team','recent_team','player_team','opponent','opponent_team'] + WEEKLY_STATS
+WEEKLY_CATEGORIES = ['team','opponent','position','player_name','game_id']
 
+def _typed(weekly: pd.DataFrame) -> pd.DataFrame:
+    """Small ints for season/week, categoricals for the repeated keys, float32 stats."""
+    weekly['season'] = weekly['season'].astype('int16')
+    weekly['week'] = weekly['week'].astype('int8')
+    for c in WEEKLY_CATEGORIES:
+        if c in weekly.columns:
+            weekly[c] = weekly[c].astype('category')
+    return downcast_floats(weekly)
+
+def load_weekly_with_timeslot(years: list[int], ctx: RunContext | None = None) -> pd.DataFrame:
+    return with_timeslot(load_weekly(years, WEEKLY_COLUMNS), ctx or RunContext(years))
+
+def iter_weekly_seasons(years: list[int], ctx: RunContext | None = None, prefetch: int = 1) -> Iterator[tuple[int, pd.DataFrame]]:
+    """Yield ``(season, weekly)`` one season at a time, oldest first.
+
+    The next ``prefetch`` seasons are fetched in the background while the
+    caller works on the current one, so at most ``prefetch + 1`` raw seasons
+    are held at once.
+    """
+    years = sorted({int(y) for y in years})
+    ctx = ctx or RunContext(years)
+    fetch = telemetry.carry(lambda y: load_weekly([y], WEEKLY_COLUMNS))
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        queued = deque((y, pool.submit(fetch, y)) for y in years[:prefetch + 1])
+        todo = deque(years[prefetch + 1:])
+        while queued:
+            season, fut = queued.popleft()
+            if todo:
+                y = todo.popleft()
+                queued.append((y, pool.submit(fetch, y)))
+            raw = fut.result()
+            if not raw.empty:
+                yield season, with_timeslot(raw, ctx)
+
+def with_timeslot(weekly: pd.DataFrame, ctx: RunContext) -> pd.DataFrame:
+    """Normalise raw weekly columns, attach game_id/game_date and the time slot, and type the frame."""
     if 'team' not in weekly.columns:
         if 'recent_team' in weekly.columns: weekly = weekly.rename(columns={'recent_team':'team'})
         elif 'player_team' in weekly.columns: weekly = weekly.rename(columns={'player_team':'team'})
@@ -23,39 +71,72 @@ def load_weekly_with_timeslot(years: list[int]) -> pd.DataFrame:
     else:
         raise KeyError("No player name column in weekly data.")
 
-    schedule = nfl.import_schedules(years)
-    if 'gameday' in schedule.columns: schedule['game_date'] = schedule['gameday']
-    elif 'game_date' not in schedule.columns: schedule['game_date'] = pd.NaT
+    keep = ['season','week','player_id','player_name','position','team','opponent'] + WEEKLY_STATS
+    weekly = weekly[[c for c in keep if c in weekly.columns]]
+    weekly = weekly.merge(ctx.games.team_games, on=['season','week','team'], how='left')
+
+    kickoff = pd.to_datetime(weekly['game_date'], errors='coerce')
+    weekly['time_slot'] = time_slots(kickoff.dt.day_name(), kickoff.dt.hour)
 
-    schedule['game_id'] = schedule.apply(lambda r: mk_game_id(r['season'], r['week'], r['home_team'], r['away_team']), axis=1)
+    weekly = weekly[weekly['time_slot'] != "Unknown"].copy()
+    weekly['total_touchdowns'] = weekly.reindex(columns=['receiving_tds','rushing_tds'], fill_value=0.0).fillna(0).sum(axis=1)
 
-    sched_home = schedule[['season','week','home_team','game_date','game_id']].rename(columns={'home_team':'team'})
-    sched_away = schedule[['season','week','away_team','game_date','game_id']].rename(columns={'away_team':'team'})
-    sched_long = pd.concat([sched_home, sched_away], ignore_index=True)
+    return _typed(weekly)
 
-    weekly = weekly.merge(sched_long, on=['season','week','team'], how='left')
+def build_player_id_resolver(years: list[int], ctx: RunContext | None = None) -> dict[str, str]:
+    return (ctx or RunContext(years)).resolver
 
-    weekly['game_datetime'] = pd.to_datetime(weekly['game_date'], errors='coerce')
-    weekly['day_of_week'] = weekly['game_datetime'].dt.day_name()
-    weekly['hour'] = weekly['game_datetime'].dt.hour
-    weekly['time_slot'] = np.vectorize(time_slot)(weekly['day_of_week'], weekly['hour'])
+def _map_distinct(s: pd.Series, fn) -> np.ndarray:
+    """Apply ``fn`` once per distinct value of ``s`` instead of once per row.
 
-    weekly = weekly[weekly['time_slot'] != "Unknown"].copy()
-    weekly['total_touchdowns'] = weekly.get('receiving_tds', 0).fillna(0) + weekly.get('rushing_tds', 0).fillna(0)
+    Missing values are converted one by one so None and NaN keep their own
+    string forms ('None' vs 'nan'), exactly as a row-wise ``str()`` would.
+    """
+    codes, uniques = pd.factorize(s)
+    out = np.array([fn(u) for u in uniques] + [None], dtype=object)[codes]
+    miss = codes == -1
+    if miss.any():
+        out[miss] = [fn(v) for v in s.to_numpy(dtype=object)[miss]]
+    return out
 
-    return downcast_floats(weekly)
+def _column(df: pd.DataFrame, col: str, default) -> pd.Series:
+    return df[col] if col in df.columns else pd.Series(default, index=df.index, dtype=object)
+
+def resolve_player_ids(weekly: pd.DataFrame, resolver: dict[str, str]) -> pd.Series:
+    """Fill missing player_ids from the roster ``name|team|pos`` map, else a stable ``legacy_`` hash.
+
+    Keys are built column-wise and hashes are computed only for rows the
+    resolver cannot place; the ids match the historical row-by-row rules
+    byte for byte.
+    """
+    pid = _column(weekly, 'player_id', None)
+    pid_str = _map_distinct(pid, str)
+    keep = pid.notna().to_numpy() & ~np.isin(pd.Series(pid_str, dtype=object).str.strip().to_numpy(), ["", "None", "nan"])
+
+    name = pd.Series(_map_distinct(_column(weekly, 'player_name', ''), str), dtype=object).str.lower().str.strip().to_numpy()
+    team = _map_distinct(_column(weekly, 'team', ''), lambda v: str(v) if v else None)
+    no_team = pd.isna(team)
+    if no_team.any():
+        team[no_team] = _map_distinct(_column(weekly, 'team_abbr', '')[no_team], str)
+    pos = _map_distinct(_column(weekly, 'position', ''), lambda v: str(v or ''))
+    keys = name + '|' + team + '|' + pos
+
+    found = pd.Series(keys, dtype=object).map(resolver or {})
+    use_map = ~keep & found.notna().to_numpy()
+    out = np.where(keep, pid_str, None)
+    out[use_map] = _map_distinct(found[use_map], str)
 
-def build_player_id_resolver(years: list[int]) -> dict[str, str]:
-    rost = nfl.import_seasonal_rosters(years, columns=['player_id','player_name','team','position'])
-    rost = rost.dropna(subset=['player_id','player_name','team'])
-    rost['k'] = rost['player_name'].str.lower().str.strip() + '|' + rost['team'] + '|' + rost['position'].fillna('')
-    return (rost.groupby('k')['player_id']
-                .agg(lambda s: s.mode().iat[0] if not s.mode().empty else s.iloc[0])
-                .to_dict())
+    todo = np.flatnonzero(~keep & ~use_map)
+    if len(todo):
+        cols = [_column(weekly, c, d).to_numpy(dtype=object)[todo]
+                for c, d in [('player_name', 'unknown'), ('season', None), ('week', None), ('opponent', None)]]
+        out[todo] = ["legacy_" + hashlib.sha1(f"{n}|{s}|{w}|{t}|{o}".encode("utf-8")).hexdigest()[:16]
+                     for n, s, w, t, o in zip(cols[0], cols[1], cols[2], team[todo], cols[3])]
+    return pd.Series(out, index=weekly.index, dtype=object)
 
-def filter_to_current_roster(weekly: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+def filter_to_current_roster(weekly: pd.DataFrame, ctx: RunContext | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
     if CURRENT_ROSTER_ONLY:
-        rost = nfl.import_seasonal_rosters([CURRENT_YEAR], columns=['player_id','player_name','team','position'])
+        rost = (ctx or RunContext()).current_rosters
         keep_ids = set(rost['player_id'].dropna().astype(str).unique())
         wk = weekly[weekly['player_id'].astype(str).isin(keep_ids)].copy()
         dim_player = (rost.rename(columns={'position':'primary_position','team':'last_team'})
@@ -68,5 +149,6 @@ def filter_to_current_roster(weekly: pd.DataFrame) -> tuple[pd.DataFrame, pd.Dat
     snap = wk[have].dropna(subset=['player_id']).copy()
     snap = snap.sort_values(['player_id','season','week']).drop_duplicates('player_id', keep='last')
     snap = snap.rename(columns={'position':'primary_position','team':'last_team'})
-    dim_player = snap[['player_id','player_name','primary_position','last_team']].fillna({"player_name":"Unknown"})
+    dim_player = (snap[['player_id','player_name','primary_position','last_team']]
+                     .astype(object).fillna({"player_name":"Unknown"}))
     return wk, dim_player